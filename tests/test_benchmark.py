@@ -0,0 +1,32 @@
+import pytest
+
+from posts import benchmark
+
+VIEWS = (
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:follow_index',
+)
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert benchmark.percentile(values, 0.50) == 50
+    assert benchmark.percentile(values, 0.95) == 95
+    assert benchmark.percentile(values, 0.99) == 99
+    assert benchmark.percentile([], 0.5) == 0.0
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db(transaction=True)
+def test_benchmark_report():
+    benchmark.seed(500)
+    report = benchmark.run(requests=5)
+    assert report['posts'] == 500
+    assert set(report['views']) == set(VIEWS)
+    for name, summary in report['views'].items():
+        assert summary['requests'] == 5, name
+        assert summary['p50_ms'] <= summary['p95_ms'] <= summary['p99_ms'], name
+        assert summary['queries'] > 0, name
@@ -0,0 +1,120 @@
+"""Сериализаторы JSON API с выбором полей.
+
+Каждое поле знает, какие колонки и связи ему нужны, поэтому
+?fields=id,text сужает сам запрос через only(), а не только ответ.
+"""
+from posts import groups
+
+
+class InvalidFields(ValueError):
+    pass
+
+
+class Field:
+    """Поле ответа: колонки для only(), связи и способ достать значение."""
+
+    def __init__(self, get, only=(), select=(), prefetch=()):
+        self.get = get
+        self.only = only
+        self.select = select
+        self.prefetch = prefetch
+
+
+def _isoformat(name):
+    return lambda obj: getattr(obj, name).isoformat()
+
+
+def _column(name):
+    return Field(lambda obj: getattr(obj, name), only=(name,))
+
+
+def _group(post):
+    group = groups.by_id(post.group_id)
+    if group is None:
+        return None
+    return {'slug': group.slug, 'title': group.title}
+
+
+def _author(obj):
+    return obj.author_card.username
+
+
+class Serializer:
+    fields = {}
+    # Поля, без которых не построить курсор следующей страницы.
+    required = ('id',)
+
+    def __init__(self, requested=None):
+        if not requested:
+            self.names = list(self.fields)
+            return
+        self.names = [name.strip() for name in requested.split(',')]
+        unknown = [name for name in self.names if name not in self.fields]
+        if unknown:
+            raise InvalidFields(
+                'Неизвестные поля: {0}. Доступны: {1}.'.format(
+                    ', '.join(unknown), ', '.join(self.fields)
+                )
+            )
+
+    def project(self, queryset):
+        """Оставляет в запросе только то, что нужно выбранным полям.
+
+        Связи исходного queryset сбрасываются: for_feed и for_post
+        присоединяют их под полный набор полей.
+        """
+        only, select, prefetch = list(self.required), [], []
+        for name in self.names:
+            field = self.fields[name]
+            only.extend(field.only)
+            select.extend(field.select)
+            prefetch.extend(field.prefetch)
+        queryset = queryset.select_related(None).prefetch_related(None)
+        queryset = queryset.only(*only)
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        return queryset
+
+    def to_dict(self, obj):
+        return {name: self.fields[name].get(obj) for name in self.names}
+
+
+class PostSerializer(Serializer):
+    required = ('id', 'pub_date')
+    fields = {
+        'id': _column('id'),
+        'text': _column('text'),
+        'pub_date': Field(_isoformat('pub_date'), only=('pub_date',)),
+        # Имена авторов берутся из карточек (posts.authors): JOIN
+        # с auth_user сбивает SQLite с индекса pub_date.
+        'author': Field(_author, only=('author_id',)),
+        # Группы — из реестра (posts.groups), без JOIN.
+        'group': Field(_group, only=('group_id',)),
+        'image': Field(
+            lambda post: post.image.url if post.image else None,
+            only=('image',),
+        ),
+        'comments_count': _column('comments_count'),
+    }
+
+
+class CommentSerializer(Serializer):
+    required = ('id', 'created')
+    fields = {
+        'id': _column('id'),
+        'post': _column('post_id'),
+        'author': Field(_author, only=('author_id',)),
+        'text': _column('text'),
+        'created': Field(_isoformat('created'), only=('created',)),
+    }
+
+
+class GroupSerializer(Serializer):
+    fields = {
+        'id': _column('id'),
+        'title': _column('title'),
+        'slug': _column('slug'),
+        'description': _column('description'),
+    }
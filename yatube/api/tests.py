@@ -0,0 +1,170 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+POSTS: int = 7
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.other = User.objects.create_user(username='Other')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост {i}', author=cls.author, group=cls.group
+            )
+            for i in range(POSTS)
+        ]
+        cls.foreign = Post.objects.create(text='Чужой', author=cls.other)
+        for i in range(3):
+            Comment.objects.create(
+                post=cls.posts[0], author=cls.reader, text=f'Коммент {i}'
+            )
+        Follow.objects.create(user=cls.reader, author=cls.other)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def get(self, name, *args, client=None, **params):
+        response = (client or self.client).get(
+            reverse(f'api:{name}', args=args), params
+        )
+        if response.streaming:
+            response.data = json.loads(b''.join(response.streaming_content))
+        elif response['Content-Type'] == 'application/json':
+            response.data = response.json()
+        return response
+
+    def test_sparse_fields(self):
+        """?fields= сужает и ответ, и сам запрос."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get('posts', fields='id,text')
+        self.assertTrue(response.streaming)
+        post = response.data['results'][0]
+        self.assertEqual(set(post), {'id', 'text'})
+        sql = ' '.join(query['sql'] for query in queries)
+        self.assertNotIn('"image"', sql)
+        self.assertNotIn('auth_user', sql)
+
+    def test_all_fields(self):
+        """Без ?fields= отдаются все поля, автор и группа — с данными."""
+        post = self.get('posts').data['results'][0]
+        self.assertEqual(post['author'], 'Other')
+        self.assertIsNone(post['group'])
+        self.assertEqual(post['id'], self.foreign.pk)
+        grouped = self.get('posts', group='group').data['results'][0]
+        self.assertEqual(
+            grouped['group'], {'slug': 'group', 'title': 'Группа'}
+        )
+
+    def test_unknown_field(self):
+        """Неизвестное поле — 400 со списком доступных."""
+        response = self.get('posts', fields='id,password')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', response.data['error'])
+
+    def test_cursor_walks_all_posts(self):
+        """Курсор ?after= проходит все посты без повторов."""
+        seen, after = [], None
+        while True:
+            params = {'fields': 'id', 'limit': 3}
+            if after:
+                params['after'] = after
+            data = self.get('posts', **params).data
+            seen.extend(post['id'] for post in data['results'])
+            after = data['next']
+            if not after:
+                break
+        expected = list(Post.objects.order_by('-pub_date', '-pk').values_list(
+            'pk', flat=True
+        ))
+        self.assertEqual(seen, expected)
+
+    def test_filters(self):
+        """?group= и ?author= сужают ленту, неизвестные — 404."""
+        by_author = self.get('posts', author='Other', fields='id').data
+        self.assertEqual(by_author['results'], [{'id': self.foreign.pk}])
+        by_group = self.get('posts', group='group', limit=100).data
+        self.assertEqual(len(by_group['results']), POSTS)
+        self.assertEqual(self.get('posts', group='none').status_code, 404)
+        self.assertEqual(self.get('posts', author='none').status_code, 404)
+
+    def test_post_detail(self):
+        response = self.get('post_detail', self.foreign.pk, fields='text')
+        self.assertEqual(response.data, {'text': 'Чужой'})
+        data = self.get('post_detail', self.foreign.pk).data
+        self.assertEqual(data['author'], 'Other')
+        self.assertEqual(data['text'], 'Чужой')
+        self.assertEqual(
+            self.get('post_detail', self.foreign.pk, fields='author').data,
+            {'author': 'Other'},
+        )
+        self.assertEqual(self.get('post_detail', 10 ** 6).status_code, 404)
+
+    def test_comments(self):
+        data = self.get('comments', self.posts[0].pk, limit=2).data
+        self.assertEqual(len(data['results']), 2)
+        self.assertEqual(data['results'][0]['author'], 'Reader')
+        rest = self.get(
+            'comments', self.posts[0].pk, after=data['next']
+        ).data
+        self.assertEqual(len(rest['results']), 1)
+        self.assertIsNone(rest['next'])
+        self.assertEqual(self.get('comments', 10 ** 6).status_code, 404)
+
+    def test_groups(self):
+        data = self.get('groups', fields='slug').data
+        self.assertEqual(data, {'results': [{'slug': 'group'}], 'next': None})
+
+    def test_follow_feed(self):
+        """Лента подписок только для авторизованных."""
+        self.assertEqual(self.get('follow').status_code, 401)
+        client = Client()
+        client.force_login(self.reader)
+        data = self.get('follow', client=client, fields='id,author').data
+        self.assertEqual(
+            data['results'], [{'id': self.foreign.pk, 'author': 'Other'}]
+        )
+
+    def test_conditional_get(self):
+        """Ответы кешируются по ETag: без изменений — 304."""
+        url = reverse('api:posts')
+        response = self.client.get(url, {'fields': 'id'})
+        again = self.client.get(
+            url, {'fields': 'id'}, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(again.status_code, 304)
+        Post.objects.create(text='Новый', author=self.author)
+        changed = self.client.get(
+            url, {'fields': 'id'}, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(changed.status_code, 200)
+
+    def test_comment_changes_list(self):
+        """Список постов отдаёт число комментариев: новый комментарий
+        меняет его ETag."""
+        url = reverse('api:posts')
+        response = self.client.get(url, {'fields': 'id,comments_count'})
+        Comment.objects.create(
+            post=self.posts[-1], author=self.reader, text='Новый'
+        )
+        changed = self.client.get(
+            url, {'fields': 'id,comments_count'},
+            HTTP_IF_NONE_MATCH=response['ETag'],
+        )
+        self.assertEqual(changed.status_code, 200)
@@ -0,0 +1,13 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'api'
+
+urlpatterns = [
+    path('posts/', views.posts, name='posts'),
+    path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path('posts/<int:post_id>/comments/', views.comments, name='comments'),
+    path('groups/', views.groups, name='groups'),
+    path('follow/', views.follow, name='follow'),
+]
@@ -0,0 +1,146 @@
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import condition, require_GET
+
+from posts import conditional
+from posts.models import Comment, Group, Post, User
+from posts.timeline import timeline_posts
+from posts.utils import KeysetPaginator
+
+from .serializers import (CommentSerializer, GroupSerializer,
+                          InvalidFields, PostSerializer)
+
+PAGE_SIZE: int = 20
+MAX_PAGE_SIZE: int = 100
+
+
+def error(message, status=400):
+    return JsonResponse({'error': message}, status=status)
+
+
+def page_size(request):
+    try:
+        size = int(request.GET.get('limit', PAGE_SIZE))
+    except ValueError:
+        return PAGE_SIZE
+    return min(max(size, 1), MAX_PAGE_SIZE)
+
+
+def stream(objects, serializer, next_cursor=None):
+    """Отдаёт ответ по объекту, не собирая весь JSON в памяти."""
+    yield '{"results": ['
+    for index, obj in enumerate(objects):
+        if index:
+            yield ', '
+        yield json.dumps(
+            serializer.to_dict(obj), cls=DjangoJSONEncoder,
+            ensure_ascii=False,
+        )
+    yield '], "next": {0}}}'.format(json.dumps(next_cursor))
+
+
+def listing(request, queryset, serializer_class, field=None):
+    """Список с выбором полей; с field — страница по курсору ?after=."""
+    try:
+        serializer = serializer_class(request.GET.get('fields'))
+    except InvalidFields as exc:
+        return error(str(exc))
+    queryset = serializer.project(queryset)
+    if field is None:
+        objects, next_cursor = list(queryset), None
+    else:
+        objects = KeysetPaginator(
+            queryset, page_size(request), field=field
+        ).get_page(after=request.GET.get('after'))
+        next_cursor = objects.next_cursor
+    return StreamingHttpResponse(
+        stream(objects, serializer, next_cursor),
+        content_type='application/json',
+    )
+
+
+@require_GET
+@condition(
+    etag_func=conditional.counted_feed_etag,
+    last_modified_func=conditional.counted_feed_last_modified,
+)
+def posts(request):
+    """Лента постов; ?group=<slug> и ?author=<username> сужают её до
+    группы или профиля."""
+    queryset = Post.objects.for_feed()
+    slug = request.GET.get('group')
+    if slug:
+        group_id = Group.objects.filter(slug=slug).values_list(
+            'pk', flat=True
+        ).first()
+        if group_id is None:
+            return error('Группа не найдена.', 404)
+        queryset = queryset.filter(group_id=group_id)
+    username = request.GET.get('author')
+    if username:
+        author_id = User.objects.filter(username=username).values_list(
+            'pk', flat=True
+        ).first()
+        if author_id is None:
+            return error('Автор не найден.', 404)
+        queryset = queryset.filter(author_id=author_id)
+    return listing(request, queryset, PostSerializer, 'pub_date')
+
+
+@require_GET
+@condition(
+    etag_func=conditional.post_etag,
+    last_modified_func=conditional.post_last_modified,
+)
+def post_detail(request, post_id):
+    try:
+        serializer = PostSerializer(request.GET.get('fields'))
+    except InvalidFields as exc:
+        return error(str(exc))
+    post = serializer.project(
+        Post.objects.with_author_cards().filter(pk=post_id)
+    ).first()
+    if post is None:
+        return error('Пост не найден.', 404)
+    return JsonResponse(serializer.to_dict(post))
+
+
+@require_GET
+@condition(
+    etag_func=conditional.post_etag,
+    last_modified_func=conditional.post_last_modified,
+)
+def comments(request, post_id):
+    if not Post.objects.filter(pk=post_id).exists():
+        return error('Пост не найден.', 404)
+    return listing(
+        request,
+        Comment.objects.filter(post_id=post_id).for_post(),
+        CommentSerializer,
+        'created',
+    )
+
+
+@require_GET
+@condition(
+    etag_func=conditional.feed_etag,
+    last_modified_func=conditional.feed_last_modified,
+)
+def groups(request):
+    """Все группы: их немного, поэтому без пагинации."""
+    return listing(
+        request, Group.objects.order_by('title', 'pk'), GroupSerializer
+    )
+
+
+@require_GET
+@condition(etag_func=conditional.counted_follow_etag)
+def follow(request):
+    """Лента подписок текущего пользователя."""
+    if not request.user.is_authenticated:
+        return error('Нужна авторизация.', 401)
+    return listing(
+        request, timeline_posts(request.user), PostSerializer, 'pub_date'
+    )
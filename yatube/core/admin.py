@@ -0,0 +1,20 @@
+from django.contrib import admin
+
+from .models import StoredFile, Task
+
+
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'name', 'status', 'attempts', 'run_at', 'finished')
+    list_filter = ('status', 'name')
+    search_fields = ('key',)
+
+
+admin.site.register(Task, TaskAdmin)
+
+
+class StoredFileAdmin(admin.ModelAdmin):
+    list_display = ('name', 'refs', 'created', 'released')
+    search_fields = ('name',)
+
+
+admin.site.register(StoredFile, StoredFileAdmin)
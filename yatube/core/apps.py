@@ -1,5 +1,16 @@
 from django.apps import AppConfig
+from django.core.signals import request_started
+from django.db.backends.signals import connection_created
+from django.utils.module_loading import autodiscover_modules
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from .cache import validate_local_caches
+        from .sqlite import configure_connection
+        request_started.connect(validate_local_caches)
+        connection_created.connect(configure_connection)
+        # Задачи регистрируются при импорте модулей tasks приложений.
+        autodiscover_modules('tasks')
@@ -0,0 +1,262 @@
+import pickle
+import re
+import threading
+import time
+from collections import OrderedDict
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+STAMP_KEY = 'two-tier:stamp:{}'
+# Пространство ключа — всё до последнего разделителя:
+# posts:post:12 -> posts:post, posts:feed -> posts.
+NAMESPACE = re.compile(r'^(.*)[:.|]')
+# Фрагменты шаблонов ключуются версиями данных и под одним ключом
+# не меняются: их запись никого не сбрасывает.
+IMMUTABLE_PREFIXES = ('template.cache.',)
+_MISSING = object()
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def namespace(key):
+    match = NAMESPACE.match(key)
+    return match.group(1) if match else ''
+
+
+class _LocalStore:
+    """LRU-хранилище процесса, общее для всех потоков."""
+
+    def __init__(self):
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+        # Метки пространств, с которыми сверены записи L1.
+        self.stamps = {}
+        self.stats = dict.fromkeys(
+            ('l1_hits', 'l1_misses', 'l2_hits', 'l2_misses'), 0
+        )
+
+    def drop(self, namespaces):
+        """Вызывается под lock: убирает из L1 записи пространств."""
+        for key in [
+            key for key, entry in self.data.items()
+            if entry[2] in namespaces
+        ]:
+            del self.data[key]
+
+
+class TwoTierCache(BaseCache):
+    """Кеш из двух уровней: LRU в памяти процесса (L1) перед общим
+    для всех воркеров бэкендом (L2), алиас которого задаёт LOCATION.
+
+    Метки версий ведутся по пространствам ключей (namespace): запись
+    в L2 меняет метку только своего пространства. В начале каждого
+    запроса воркер одним чтением сверяет метки пространств, которые
+    есть в его L1 (см. validate_local_caches), и сбрасывает лишь
+    разошедшиеся. Ключи с префиксами IMMUTABLE_PREFIXES уже несут
+    версию данных в имени, поэтому метку не меняют и не сверяются.
+    L1_TIMEOUT дополнительно ограничивает жизнь записи в L1.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._l2_alias = location
+        self._l1_max_entries = int(options.get('L1_MAX_ENTRIES', 1000))
+        self._l1_timeout = float(options.get('L1_TIMEOUT', 60))
+        self._immutable = tuple(
+            options.get('IMMUTABLE_PREFIXES', IMMUTABLE_PREFIXES)
+        )
+        with _stores_lock:
+            self._store = _stores.setdefault(location, _LocalStore())
+
+    @property
+    def l2(self):
+        return caches[self._l2_alias]
+
+    def _namespace(self, key):
+        """Пространство ключа или None для неизменяемых ключей."""
+        if key.startswith(self._immutable):
+            return None
+        return namespace(key)
+
+    def _count(self, name):
+        with self._store.lock:
+            self._store.stats[name] += 1
+
+    def _local_get(self, key):
+        store = self._store
+        with store.lock:
+            entry = store.data.get(key)
+            if entry is None:
+                return _MISSING
+            value, expires, _ = entry
+            if expires < time.monotonic():
+                del store.data[key]
+                return _MISSING
+            store.data.move_to_end(key)
+        return pickle.loads(value)
+
+    def _local_set(self, key, local_key, value, timeout=DEFAULT_TIMEOUT,
+                   stamp=_MISSING):
+        """Кладёт значение в L1. stamp — метка пространства, прочитанная
+        вместе со значением; без неё запись в ещё не сверенное
+        пространство в L1 не попадает."""
+        ttl = self._l1_timeout
+        timeout = self.get_backend_timeout(timeout)
+        if timeout is not None:
+            ttl = min(ttl, timeout - time.time())
+        value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        name = self._namespace(key)
+        store = self._store
+        with store.lock:
+            if name is not None and name not in store.stamps:
+                if stamp is _MISSING:
+                    return
+                store.stamps[name] = stamp
+            store.data[local_key] = (value, time.monotonic() + ttl, name)
+            store.data.move_to_end(local_key)
+            while len(store.data) > self._l1_max_entries:
+                store.data.popitem(last=False)
+
+    def _local_delete(self, key):
+        with self._store.lock:
+            self._store.data.pop(key, None)
+
+    def _remember_stamp(self, key, stamp):
+        """Запоминает метку пространства, прочитанную вместе с
+        промахом: запись, которая обычно за ним следует, попадёт в L1."""
+        name = self._namespace(key)
+        if name is None or stamp is _MISSING:
+            return
+        with self._store.lock:
+            self._store.stamps.setdefault(name, stamp)
+
+    def _bump_stamp(self, key):
+        """Меняет метку пространства ключа.
+
+        Свой L1 по этому пространству тоже сбрасывается: метку мог
+        только что сменить другой воркер, и принять новую метку
+        со старыми записями значило бы пропустить его запись.
+        """
+        name = self._namespace(key)
+        if name is None:
+            return
+        stamp = uuid4().hex
+        self.l2.set(STAMP_KEY.format(name), stamp, None)
+        store = self._store
+        with store.lock:
+            store.drop({name})
+            store.stamps[name] = stamp
+
+    def validate(self):
+        """Сбрасывает в L1 пространства, в которые другие воркеры
+        успели что-то записать."""
+        store = self._store
+        with store.lock:
+            names = list(store.stamps)
+        if not names:
+            return
+        keys = {name: STAMP_KEY.format(name) for name in names}
+        stamps = self.l2.get_many(list(keys.values()))
+        with store.lock:
+            changed = {
+                name for name, key in keys.items()
+                if store.stamps.get(name) != stamps.get(key)
+            }
+            store.drop(changed)
+            for name in changed:
+                store.stamps[name] = stamps.get(keys[name])
+
+    def get(self, key, default=None, version=None):
+        local_key = self.make_key(key, version)
+        self.validate_key(local_key)
+        value = self._local_get(local_key)
+        if value is not _MISSING:
+            self._count('l1_hits')
+            return value
+        self._count('l1_misses')
+        value, stamp = self._l2_get(key, version)
+        if value is _MISSING:
+            self._count('l2_misses')
+            self._remember_stamp(key, stamp)
+            return default
+        self._count('l2_hits')
+        self._local_set(key, local_key, value, stamp=stamp)
+        return value
+
+    def _l2_get(self, key, version):
+        """Значение из L2 и, если пространство ключа ещё не сверено,
+        его метка — одним запросом, чтобы они не разошлись."""
+        name = self._namespace(key)
+        with self._store.lock:
+            known = name is None or name in self._store.stamps
+        if known or version is not None:
+            return self.l2.get(key, _MISSING, version=version), _MISSING
+        stamp_key = STAMP_KEY.format(name)
+        found = self.l2.get_many([key, stamp_key])
+        return found.get(key, _MISSING), found.get(stamp_key)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.l2.set(key, value, timeout, version=version)
+        self._bump_stamp(key)
+        self._local_set(key, self.make_key(key, version), value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        """Как set, но метка каждого пространства меняется один раз."""
+        failed = self.l2.set_many(data, timeout, version=version)
+        bumped = set()
+        for key, value in data.items():
+            name = self._namespace(key)
+            if name not in bumped:
+                self._bump_stamp(key)
+                bumped.add(name)
+            self._local_set(key, self.make_key(key, version), value, timeout)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        if not self.l2.add(key, value, timeout, version=version):
+            return False
+        # Ключа в L2 не было, так что в чужих L1 может лежать только
+        # вытесненное значение, а оно живёт не дольше L1_TIMEOUT: метку
+        # менять незачем.
+        self._local_set(key, self.make_key(key, version), value, timeout)
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.l2.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self.l2.delete(key, version=version)
+        self._bump_stamp(key)
+        self._local_delete(self.make_key(key, version))
+
+    def has_key(self, key, version=None):
+        return self.get(key, _MISSING, version=version) is not _MISSING
+
+    def incr(self, key, delta=1, version=None):
+        value = self.l2.incr(key, delta, version=version)
+        self._bump_stamp(key)
+        self._local_delete(self.make_key(key, version))
+        return value
+
+    def clear(self):
+        self.l2.clear()
+        with self._store.lock:
+            self._store.data.clear()
+            self._store.stamps.clear()
+
+    def stats(self):
+        """Попадания и промахи по уровням для текущего процесса."""
+        with self._store.lock:
+            stats = dict(self._store.stats)
+            stats['l1_size'] = len(self._store.data)
+        return stats
+
+
+def validate_local_caches(**kwargs):
+    for alias, params in settings.CACHES.items():
+        if params['BACKEND'] == 'core.cache.TwoTierCache':
+            caches[alias].validate()
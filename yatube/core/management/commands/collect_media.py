@@ -0,0 +1,35 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from core.storage import GRACE, file_fields, recount_files
+
+
+class Command(BaseCommand):
+    help = ('Удаляет медиафайлы с адресацией по содержимому, на которые '
+            'больше не ссылается ни одна запись.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace', type=int, default=int(GRACE.total_seconds() // 60),
+            help='Сколько минут файл без ссылок ещё хранится.',
+        )
+        parser.add_argument(
+            '--recount', action='store_true',
+            help='Сначала пересчитать ссылки по таблицам моделей и '
+                 'удалить также файлы, о которых таблица не знает.',
+        )
+
+    def handle(self, *args, **options):
+        grace = timedelta(minutes=options['grace'])
+        if options['recount']:
+            for location, fixed in recount_files().items():
+                self.stdout.write(f'{location}: исправлено ссылок {fixed}')
+        for location, (storage, _) in file_fields().items():
+            # Файлы, о которых таблица не знает, удаляются только после
+            # пересчёта: без него так выглядят и файлы загруженных
+            # в обход сигналов записей.
+            deleted = storage.collect(grace, unknown=options['recount'])
+            self.stdout.write(self.style.SUCCESS(
+                f'{location}: удалено файлов {len(deleted)}'
+            ))
@@ -0,0 +1,48 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from core import taskqueue
+
+
+class Command(BaseCommand):
+    help = ('Выполняет фоновые задачи из базы: повторы после ошибок и '
+            'задачи, которые не успел выполнить веб-процесс.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument(
+            '--poll', type=float, default=1.0,
+            help='Пауза в секундах, когда задач нет.',
+        )
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить всё, что пора, и выйти (для cron).',
+        )
+
+    def handle(self, *args, **options):
+        # С одним потоком задачи выполняются в основном, без пула.
+        pool = None
+        execute = taskqueue.run
+        if options['threads'] > 1:
+            pool = ThreadPoolExecutor(
+                max_workers=options['threads'], thread_name_prefix='tasks'
+            )
+            execute = taskqueue.run_in_thread
+        done = 0
+        try:
+            while True:
+                pks = taskqueue.due(options['batch_size'])
+                done += sum((pool.map if pool else map)(execute, pks))
+                if pks:
+                    continue
+                taskqueue.purge()
+                if options['once']:
+                    break
+                time.sleep(options['poll'])
+        finally:
+            if pool:
+                pool.shutdown()
+        self.stdout.write(self.style.SUCCESS(f'Выполнено задач: {done}'))
@@ -0,0 +1,38 @@
+import sqlite3
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.routers import PRIMARY, REPLICA, replica_available
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную базу SQLite в файл реплики. Локально '
+            'заменяет репликацию: запуск раз в N секунд даёт реплику '
+            'с отставанием до N секунд.')
+
+    def handle(self, *args, **options):
+        if not replica_available():
+            raise CommandError('Реплика не настроена.')
+        primary, replica = connections[PRIMARY], connections[REPLICA]
+        if primary.vendor != 'sqlite' or replica.vendor != 'sqlite':
+            raise CommandError(
+                'Команда только для SQLite, на других базах настройте '
+                'репликацию средствами СУБД.'
+            )
+        replica.close()
+        primary.ensure_connection()
+        target = sqlite3.connect(replica.settings_dict['NAME'])
+        try:
+            point = target.execute('PRAGMA user_version').fetchone()[0] + 1
+            primary.connection.backup(target)
+            # Новая точка синхронизации меняет ключи кеша и ETag страниц,
+            # собранных с реплики (см. core.routers.read_point).
+            target.execute(f'PRAGMA user_version = {point}')
+            target.commit()
+        finally:
+            target.close()
+        self.stdout.write(self.style.SUCCESS(
+            f'Реплика обновлена: {replica.settings_dict["NAME"]}, '
+            f'точка {point}'
+        ))
@@ -0,0 +1,71 @@
+from django.conf import settings
+
+from . import routers
+from .profiling import check_budget, histogram, profile
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+PRIMARY_COOKIE = 'use_primary'
+
+
+class ProfilingMiddleware:
+    """Меряет каждый запрос: SQL, повторы запросов, рендер шаблонов и
+    общее время.
+
+    Итог уходит в заголовок Server-Timing, в скользящую гистограмму
+    по имени страницы (posts:index, posts:post_detail, ...) и
+    сверяется с бюджетом страницы из PROFILING_BUDGETS.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with profile() as sample:
+            response = self.get_response(request)
+        match = request.resolver_match
+        if match is None:
+            return response
+        metrics = sample.metrics()
+        response['Server-Timing'] = server_timing(metrics)
+        exceeded = check_budget(match.view_name, metrics)
+        histogram.add(match.view_name, metrics, exceeded)
+        return response
+
+
+def server_timing(metrics):
+    return ', '.join((
+        'sql;dur={0:.2f};desc="{1} queries, {2} duplicates"'.format(
+            metrics['sql_ms'], metrics['queries'], metrics['duplicates']
+        ),
+        'render;dur={0:.2f}'.format(metrics['render_ms']),
+        'total;dur={0:.2f}'.format(metrics['total_ms']),
+    ))
+
+
+class ReplicaRoutingMiddleware:
+    """Безопасные запросы читают с реплики, остальные — с основной базы.
+
+    Кто только что писал, получает куку и ещё REPLICA_STICKY_SECONDS
+    читает с основной базы: за это время реплика догонит его запись.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        routers.reset(
+            pinned=request.method not in SAFE_METHODS
+            or PRIMARY_COOKIE in request.COOKIES
+        )
+        try:
+            response = self.get_response(request)
+            if routers.wrote():
+                response.set_cookie(
+                    PRIMARY_COOKIE, '1',
+                    max_age=getattr(settings, 'REPLICA_STICKY_SECONDS', 10),
+                    httponly=True,
+                    samesite='Lax',
+                )
+            return response
+        finally:
+            routers.reset()
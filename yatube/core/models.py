@@ -0,0 +1,57 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Task(models.Model):
+    """Фоновая задача: строка в базе переживает перезапуск процесса."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'в очереди'),
+        (RUNNING, 'выполняется'),
+        (DONE, 'выполнена'),
+        (FAILED, 'не удалась'),
+    )
+
+    name = models.CharField(max_length=200)
+    payload = models.TextField(default='{}')
+    # Ключ идемпотентности: задача с тем же ключом ставится один раз.
+    key = models.CharField(max_length=200, unique=True, null=True, blank=True)
+    status = models.CharField(
+        max_length=10, choices=STATUSES, default=PENDING
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    finished = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk}: {self.status}'
+
+
+class StoredFile(models.Model):
+    """Файл хранилища с адресацией по содержимому (core.storage) и
+    число ссылок на него из моделей."""
+    name = models.CharField(max_length=255, primary_key=True)
+    refs = models.PositiveIntegerField(default=0)
+    created = models.DateTimeField(auto_now_add=True)
+    # Когда пропала последняя ссылка: после паузы файл удаляется.
+    released = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['refs', 'released']),
+        ]
+
+    def __str__(self):
+        return f'{self.name}: {self.refs}'
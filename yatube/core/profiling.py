@@ -0,0 +1,194 @@
+import logging
+import math
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.template.base import Template
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+_original_render = Template.render
+
+
+class Profile:
+    """Что успел сделать запрос: SQL, рендер шаблонов и общее время."""
+
+    def __init__(self):
+        self.queries = []
+        self.sql_time = 0.0
+        self.render_time = 0.0
+        self.total_time = 0.0
+        self._render_depth = 0
+
+    @property
+    def query_count(self):
+        return len(self.queries)
+
+    def metrics(self):
+        """Показатели запроса в миллисекундах, как их сверяют с бюджетом."""
+        ms = 1000
+        return {
+            'queries': self.query_count,
+            'duplicates': sum(self.duplicates().values()),
+            'sql_ms': self.sql_time * ms,
+            'render_ms': self.render_time * ms,
+            'total_ms': self.total_time * ms,
+        }
+
+    def duplicates(self):
+        """SQL, выполненные за запрос больше одного раза, с числом
+        повторов."""
+        seen = {}
+        for sql in self.queries:
+            seen[sql] = seen.get(sql, 0) + 1
+        return {sql: count for sql, count in seen.items() if count > 1}
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - started
+            self.queries.append(sql)
+
+
+def _timed_render(self, context):
+    profiles = getattr(_local, 'profiles', ())
+    if not profiles:
+        return _original_render(self, context)
+    # Вложенные шаблоны (include, extends) уже входят во внешний рендер.
+    for profile in profiles:
+        profile._render_depth += 1
+    started = time.perf_counter()
+    try:
+        return _original_render(self, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        for profile in profiles:
+            profile._render_depth -= 1
+            if not profile._render_depth:
+                profile.render_time += elapsed
+
+
+Template.render = _timed_render
+
+
+@contextmanager
+def profile():
+    """Собирает Profile для кода внутри блока в текущем потоке.
+
+    Блоки можно вкладывать: внешний замер видит всё, что видит
+    внутренний (так бенчмарк оборачивает запрос поверх middleware).
+    """
+    result = Profile()
+    previous = getattr(_local, 'profiles', ())
+    _local.profiles = previous + (result,)
+    started = time.perf_counter()
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(result.execute_wrapper)
+                )
+            yield result
+    finally:
+        result.total_time = time.perf_counter() - started
+        _local.profiles = previous
+
+
+def percentile(values, share):
+    """Перцентиль методом ближайшего ранга."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(math.ceil(share * len(ordered)), 1)
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class BudgetExceeded(Exception):
+    """Страница вышла за бюджет из PROFILING_BUDGETS."""
+
+
+def over_budget(view_name, metrics):
+    """Показатели, превысившие бюджет страницы: {имя: (факт, лимит)}."""
+    budget = getattr(settings, 'PROFILING_BUDGETS', {}).get(view_name, {})
+    return {
+        name: (metrics[name], limit)
+        for name, limit in budget.items()
+        if metrics[name] > limit
+    }
+
+
+def check_budget(view_name, metrics):
+    """Пишет в лог о превышении бюджета, а при PROFILING_BUDGET_ACTION
+    = 'raise' (так удобно в тестах) бросает BudgetExceeded."""
+    exceeded = over_budget(view_name, metrics)
+    if not exceeded:
+        return exceeded
+    message = '{0} вышла за бюджет: {1}'.format(view_name, ', '.join(
+        f'{name} {value:g} > {limit:g}'
+        for name, (value, limit) in exceeded.items()
+    ))
+    if getattr(settings, 'PROFILING_BUDGET_ACTION', 'log') == 'raise':
+        raise BudgetExceeded(message)
+    logger.warning(message)
+    return exceeded
+
+
+class Histogram:
+    """Скользящее окно последних замеров по каждой странице."""
+
+    def __init__(self, size):
+        self.size = size
+        self.lock = threading.Lock()
+        self.samples = {}
+        self.exceeded = {}
+
+    def add(self, view_name, metrics, exceeded=None):
+        with self.lock:
+            window = self.samples.get(view_name)
+            if window is None:
+                window = self.samples[view_name] = deque(maxlen=self.size)
+            window.append(metrics)
+            if exceeded:
+                self.exceeded[view_name] = (
+                    self.exceeded.get(view_name, 0) + 1
+                )
+
+    def clear(self):
+        with self.lock:
+            self.samples.clear()
+            self.exceeded.clear()
+
+    def snapshot(self):
+        """Сводка по окну: перцентили времени и средние по SQL и
+        рендеру."""
+        with self.lock:
+            samples = {name: list(window)
+                       for name, window in self.samples.items()}
+            exceeded = dict(self.exceeded)
+        report = {}
+        for name, window in sorted(samples.items()):
+            total = [sample['total_ms'] for sample in window]
+            report[name] = {
+                'requests': len(window),
+                'p50_ms': round(percentile(total, 0.50), 2),
+                'p95_ms': round(percentile(total, 0.95), 2),
+                'p99_ms': round(percentile(total, 0.99), 2),
+                'max_queries': max(s['queries'] for s in window),
+                'max_duplicates': max(s['duplicates'] for s in window),
+            }
+            for key in ('queries', 'sql_ms', 'render_ms'):
+                report[name][key] = round(
+                    sum(sample[key] for sample in window) / len(window), 2
+                )
+            report[name]['over_budget'] = exceeded.get(name, 0)
+        return report
+
+
+histogram = Histogram(getattr(settings, 'PROFILING_WINDOW', 1000))
@@ -0,0 +1,120 @@
+import os
+import threading
+
+from django.db import connections
+
+PRIMARY = 'default'
+REPLICA = 'replica'
+# Таблицы, которые нельзя читать с отстающей реплики: по устаревшим
+# версиям кеша и сессиям страницы разошлись бы с только что записанным,
+# а очередь задач выдала бы уже выполненную задачу.
+PRIMARY_ONLY_APPS = frozenset(('django_cache', 'sessions', 'core'))
+
+_UNKNOWN = object()
+
+_state = threading.local()
+
+
+def reset(pinned=True):
+    """Начинает отсчёт записей потока заново; pinned закрепляет все
+    его чтения за основной базой."""
+    _state.pinned = pinned
+    _state.wrote = False
+    _state.point = _UNKNOWN
+
+
+def is_pinned():
+    return getattr(_state, 'pinned', True) or wrote()
+
+
+def wrote():
+    """Была ли в потоке запись с последнего reset()."""
+    return getattr(_state, 'wrote', False)
+
+
+def replica_available():
+    """Реплика описана и это другая база, а не зеркало основной (как
+    в тестах, где TEST['MIRROR'] подменяет её настройки)."""
+    if REPLICA not in connections.databases:
+        return False
+    return (
+        connections[REPLICA].settings_dict['NAME']
+        != connections[PRIMARY].settings_dict['NAME']
+    )
+
+
+def replica_point():
+    """Точка синхронизации реплики или None, если её не узнать.
+
+    sync_replica после каждой копии увеличивает PRAGMA user_version
+    в файле реплики. Без точки (реплики нет, файл ещё не создан или
+    это не SQLite) реплика не читается: страницу с неё нельзя было бы
+    отличить в кеше и ETag от страницы с основной базы. Значение
+    читается раз за запрос.
+    """
+    point = getattr(_state, 'point', _UNKNOWN)
+    if point is _UNKNOWN:
+        point = _state.point = _read_replica_point()
+    return point
+
+
+def _read_replica_point():
+    if not replica_available():
+        return None
+    replica = connections[REPLICA]
+    if replica.vendor != 'sqlite' or not os.path.exists(
+        replica.settings_dict['NAME']
+    ):
+        return None
+    with replica.cursor() as cursor:
+        cursor.execute('PRAGMA user_version')
+        return cursor.fetchone()[0] or None
+
+
+def read_point():
+    """Откуда читает текущий запрос: основная база или реплика с её
+    точкой синхронизации.
+
+    Входит в ключи фрагментного кеша и в ETag: версии данных лежат в
+    кеше основной базы, и без точки страница, собранная с отстающей
+    реплики, закешировалась бы под версией уже сделанной записи и
+    пережила бы следующую синхронизацию.
+    """
+    if is_pinned():
+        return PRIMARY
+    point = replica_point()
+    return PRIMARY if point is None else f'{REPLICA}:{point}'
+
+
+class ReplicaRouter:
+    """Читает с реплики, пишет в основную базу.
+
+    На реплику идут только чтения безопасных запросов, которые открепил
+    ReplicaRoutingMiddleware, и только пока известна её точка
+    синхронизации (см. replica_point). Команды, миграции и фоновые
+    потоки читают с основной базы, чтобы не писать по устаревшим
+    данным. После первой записи в потоке чтения тоже идут в основную
+    базу, чтобы видеть свою запись; дальше прилипание продлевает кука
+    middleware.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (
+            model._meta.app_label in PRIMARY_ONLY_APPS
+            or is_pinned()
+            or replica_point() is None
+        ):
+            return PRIMARY
+        return REPLICA
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label != 'django_cache':
+            _state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема и данные приходят на реплику вместе с репликацией.
+        return db == PRIMARY
@@ -0,0 +1,89 @@
+import logging
+import random
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# Значения по умолчанию; SQLITE_PRAGMAS в настройках дополняет их.
+PRAGMAS = {
+    # Читатели не ждут писателя, а писатель — читателей.
+    'journal_mode': 'wal',
+    # В режиме WAL fsync нужен только при контрольной точке.
+    'synchronous': 'normal',
+    'mmap_size': 256 * 1024 * 1024,
+    # Отрицательное значение — размер в килобайтах, а не в страницах.
+    'cache_size': -64000,
+    # Сколько миллисекунд ждать блокировку, прежде чем вернуть ошибку.
+    'busy_timeout': 5000,
+}
+WRITE_RETRIES: int = 5
+RETRY_DELAY: float = 0.05
+
+
+def pragmas():
+    return {**PRAGMAS, **getattr(settings, 'SQLITE_PRAGMAS', {})}
+
+
+def configure_connection(sender, connection, **kwargs):
+    """Настраивает каждое новое соединение с SQLite (сигнал
+    connection_created)."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas().items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def is_locked(error):
+    """Ошибка из-за чужой блокировки, которую стоит повторить."""
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+
+def atomic_with_retry(using=DEFAULT_DB_ALIAS, retries=None, delay=None):
+    """Выполняет функцию в транзакции и повторяет её, если база занята.
+
+    busy_timeout не спасает транзакцию, которая начала с чтения: SQLite
+    не даёт ей поднять блокировку до записи, пока пишет другая, и сразу
+    отвечает «database is locked». Такую транзакцию остаётся откатить и
+    начать заново, выдержав паузу: она растёт вдвое с каждой попыткой,
+    а случайная добавка разводит столкнувшихся писателей.
+
+    Внутри чужой транзакции повторять нечего — откатится и внешняя, —
+    поэтому там функция выполняется один раз.
+
+    Оборачивать стоит только запись в базу: всё, что функция делает
+    помимо неё, повторится с каждой попыткой. Такие эффекты (смена
+    версий кеша, фоновые задачи) откладываются в transaction.on_commit.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            attempts = retries
+            if attempts is None:
+                attempts = getattr(
+                    settings, 'SQLITE_WRITE_RETRIES', WRITE_RETRIES
+                )
+            pause = delay
+            if pause is None:
+                pause = getattr(settings, 'SQLITE_RETRY_DELAY', RETRY_DELAY)
+            nested = connections[using].in_atomic_block
+            for attempt in range(attempts + 1):
+                try:
+                    with transaction.atomic(using=using):
+                        return func(*args, **kwargs)
+                except OperationalError as error:
+                    if nested or attempt == attempts or not is_locked(error):
+                        raise
+                    logger.warning(
+                        'База занята, повтор %s из %s: %s',
+                        attempt + 1, attempts, func.__qualname__,
+                    )
+                time.sleep(pause * 2 ** attempt * (1 + random.random()))
+        return wrapper
+    return decorator
@@ -0,0 +1,200 @@
+"""Хранилище медиафайлов с адресацией по содержимому.
+
+Файл называется SHA-256 своего содержимого и лежит в подкаталогах из
+первых знаков хеша: posts/ab/cd/abcd….jpg. Одинаковые загрузки разных
+пользователей хранятся один раз, а имя файла никогда не меняет смысла,
+поэтому его можно кешировать навсегда (см. core.views.media).
+
+Ссылки на файлы считаются в таблице StoredFile: модели вызывают
+retain и release, а файлы без ссылок удаляет команда collect_media
+после паузы, чтобы не задеть загрузку, ещё не дошедшую до коммита.
+Загрузки в обход сигналов (bulk_create) пересчитывают ссылки сами
+через recount_files.
+"""
+import hashlib
+import os
+import posixpath
+import re
+from collections import Counter
+from datetime import timedelta
+from uuid import uuid4
+
+from django.core.files.storage import FileSystemStorage
+from django.apps import apps
+from django.db import models
+from django.db.models import F
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+
+from .models import StoredFile
+
+CHUNK_SIZE: int = 64 * 1024
+# Уровни подкаталогов и число знаков хеша на уровень.
+SHARD_DEPTH: int = 2
+SHARD_WIDTH: int = 2
+GRACE = timedelta(hours=1)
+# Имён в одном запросе: SQLite принимает не больше 999 параметров.
+BATCH_SIZE: int = 500
+HASHED = re.compile(r'(?:^|/)(?:[0-9a-f]{2}/){2}[0-9a-f]{64}(?:\.\w+)?$')
+
+
+def file_digest(content):
+    """SHA-256 содержимого файла; позиция чтения возвращается в начало."""
+    digest = hashlib.sha256()
+    for chunk in content.chunks(CHUNK_SIZE):
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def is_hashed(name):
+    """Имя выдано этим хранилищем, и содержимое под ним не меняется."""
+    return bool(HASHED.search(name))
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def hashed_name(self, name, digest):
+        directory = posixpath.dirname(name)
+        extension = posixpath.splitext(name)[1].lower()
+        shards = [
+            digest[i * SHARD_WIDTH:(i + 1) * SHARD_WIDTH]
+            for i in range(SHARD_DEPTH)
+        ]
+        return posixpath.join(directory, *shards, digest + extension)
+
+    def _save(self, name, content):
+        name = self.hashed_name(name, file_digest(content))
+        if self.exists(name):
+            # Свежая отметка времени защищает файл от collect, пока
+            # ссылка на него не дошла до коммита.
+            os.utime(self.path(name))
+            return name
+        # Файл пишется под временным именем и переносится целиком:
+        # под настоящим именем недописанного файла не бывает, а если
+        # параллельный запрос успел раньше, замена ничего не меняет.
+        temporary = super()._save(f'{name}.{uuid4().hex}.part', content)
+        os.replace(self.path(temporary), self.path(name))
+        return name
+
+    def retain(self, name):
+        """Добавляет ссылку на файл."""
+        if not is_hashed(name):
+            return
+        StoredFile.objects.get_or_create(name=name)
+        StoredFile.objects.filter(name=name).update(
+            refs=F('refs') + 1, released=None
+        )
+
+    def release(self, name):
+        """Снимает ссылку; файл без ссылок удалит collect."""
+        if not is_hashed(name):
+            return
+        StoredFile.objects.filter(name=name, refs__gt=0).update(
+            refs=F('refs') - 1
+        )
+        StoredFile.objects.filter(name=name, refs=0).update(
+            released=timezone.now()
+        )
+
+    def recount(self, counts):
+        """Выставляет число ссылок по данным моделей ({имя: ссылок}) и
+        возвращает, сколько строк пришлось исправить."""
+        counts = {
+            name: refs for name, refs in counts.items() if is_hashed(name)
+        }
+        StoredFile.objects.bulk_create(
+            (StoredFile(name=name) for name in counts),
+            batch_size=BATCH_SIZE, ignore_conflicts=True,
+        )
+        fixed = 0
+        stored = StoredFile.objects.values_list('name', 'refs')
+        for name, refs in list(stored.iterator()):
+            actual = counts.get(name, 0)
+            if refs != actual:
+                fixed += StoredFile.objects.filter(name=name).update(
+                    refs=actual,
+                    released=None if actual else timezone.now(),
+                )
+        return fixed
+
+    def collect(self, grace=GRACE, unknown=False):
+        """Удаляет файлы без ссылок старше grace и возвращает их имена.
+
+        С unknown удаляются и файлы, о которых таблица не знает: их
+        записала транзакция, которая потом откатилась. Но так же
+        выглядят и файлы записей, загруженных в обход сигналов, поэтому
+        unknown можно передавать только сразу после recount.
+        """
+        cutoff = timezone.now() - grace
+        released = StoredFile.objects.filter(
+            refs=0, released__lt=cutoff
+        ).values_list('name', flat=True)
+        deleted = []
+        for name in list(released):
+            # Сначала строка и только при тех же условиях: если файл
+            # успели снова сохранить, retain вернул ему ссылку, и
+            # удалять нечего. Свежая отметка времени значит, что ссылка
+            # ещё не дошла до коммита, и файл остаётся.
+            removed, _ = StoredFile.objects.filter(
+                name=name, refs=0, released__lt=cutoff
+            ).delete()
+            if removed == 1 and self._stale(name, cutoff):
+                self.delete(name)
+                deleted.append(name)
+        if not unknown:
+            return deleted
+        known = set(StoredFile.objects.values_list('name', flat=True))
+        for name in self.hashed_files():
+            if name not in known and self._stale(name, cutoff):
+                self.delete(name)
+                deleted.append(name)
+        return deleted
+
+    def _stale(self, name, cutoff):
+        return (
+            not self.exists(name) or self.get_modified_time(name) < cutoff
+        )
+
+    def hashed_files(self):
+        """Имена всех файлов хранилища, выданных по содержимому."""
+        for root, _, files in os.walk(self.location):
+            directory = os.path.relpath(root, self.location)
+            for filename in files:
+                name = posixpath.normpath(
+                    posixpath.join(directory.replace(os.sep, '/'), filename)
+                )
+                if is_hashed(name):
+                    yield name
+
+
+def file_fields():
+    """Поля моделей с этим хранилищем по хранилищам:
+    {location: (storage, [(model, field_name), ...])}."""
+    found = {}
+    for model in apps.get_models():
+        for field in model._meta.get_fields():
+            if isinstance(field, models.FileField) and isinstance(
+                field.storage, ContentAddressedStorage
+            ):
+                storage = field.storage
+                found.setdefault(storage.location, (storage, []))[1].append(
+                    (model, field.name)
+                )
+    return found
+
+
+def recount_files():
+    """Пересчитывает ссылки всех хранилищ по таблицам моделей и
+    возвращает число исправленных строк: {location: исправлено}."""
+    fixed = {}
+    for location, (storage, fields) in file_fields().items():
+        counts = Counter()
+        for model, name in fields:
+            counts.update(
+                model._default_manager.exclude(
+                    **{name: ''}
+                ).values_list(name, flat=True).iterator()
+            )
+        fixed[location] = storage.recount(counts)
+    return fixed
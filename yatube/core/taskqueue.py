@@ -0,0 +1,191 @@
+"""Очередь фоновых задач на базе данных, без внешнего брокера.
+
+Задача — строка Task, записанная в той же транзакции, что и данные,
+ради которых она ставится. После коммита её сразу берёт пул потоков
+веб-процесса; всё, что он не успел (падение процесса, повтор после
+ошибки), подбирает команда run_tasks. Задачу берёт тот, чей UPDATE
+перевёл её из «в очереди» в «выполняется», поэтому пул и воркеры
+не выполнят её дважды.
+"""
+import json
+import logging
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import (IntegrityError, close_old_connections, connection,
+                       transaction)
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Task
+from .sqlite import atomic_with_retry
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS: int = 5
+# Пауза перед повтором в секундах, удваивается с каждой попыткой.
+RETRY_DELAY: int = 10
+# Задача, которая выполняется дольше, считается брошенной упавшим
+# процессом и возвращается в очередь.
+LOCK_TIMEOUT = timedelta(minutes=10)
+# Столько хранятся выполненные задачи, а значит, и их ключи.
+KEEP_DONE = timedelta(days=7)
+
+_registry = {}
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def task(name=None, max_attempts=MAX_ATTEMPTS):
+    """Регистрирует функцию как задачу и добавляет ей метод enqueue.
+
+    Аргументы задачи хранятся в JSON, поэтому передавать стоит id,
+    а не объекты моделей.
+    """
+    def decorator(func):
+        task_name = name or f'{func.__module__}.{func.__name__}'
+        _registry[task_name] = (func, max_attempts)
+        func.enqueue = partial(enqueue, task_name)
+        return func
+    return decorator
+
+
+def enqueue(name, *args, idempotency_key=None, **kwargs):
+    """Ставит задачу в очередь и возвращает её строку.
+
+    С idempotency_key повторная постановка возвращает уже существующую
+    задачу, даже выполненную: так повтор запроса или сигнала не
+    выполнит побочный эффект дважды.
+    """
+    if name not in _registry:
+        raise LookupError(f'Задача {name} не зарегистрирована.')
+    fields = {
+        'name': name,
+        'payload': json.dumps(
+            {'args': args, 'kwargs': kwargs}, cls=DjangoJSONEncoder
+        ),
+        'max_attempts': _registry[name][1],
+    }
+    if idempotency_key is None:
+        job = Task.objects.create(**fields)
+    else:
+        try:
+            with transaction.atomic():
+                job, created = Task.objects.get_or_create(
+                    key=idempotency_key, defaults=fields
+                )
+        except IntegrityError:
+            return Task.objects.get(key=idempotency_key)
+        if not created:
+            return job
+    _dispatch(job.pk)
+    return job
+
+
+def _inline():
+    """Потоки не видят базу SQLite в памяти основного потока (так
+    бывает в тестах), тогда задача выполняется сразу."""
+    return connection.vendor == 'sqlite' and connection.is_in_memory_db()
+
+
+def _pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'TASKS_WORKERS', 2) or 1,
+                thread_name_prefix='tasks',
+            )
+        return _executor
+
+
+def _dispatch(pk):
+    if _inline():
+        run(pk)
+    elif getattr(settings, 'TASKS_WORKERS', 2):
+        transaction.on_commit(lambda: _pool().submit(run_in_thread, pk))
+
+
+def run(pk):
+    """Выполняет задачу, если её ещё никто не взял; False — если
+    взял кто-то другой."""
+    claimed = Task.objects.filter(pk=pk, status=Task.PENDING).update(
+        status=Task.RUNNING,
+        locked_at=timezone.now(),
+        attempts=F('attempts') + 1,
+    )
+    if not claimed:
+        return False
+    job = Task.objects.get(pk=pk)
+    try:
+        func = _registry[job.name][0]
+        payload = json.loads(job.payload)
+        # Своя транзакция (или точка сохранения): ошибка задачи не
+        # ломает внешнюю, а занятая база — повод повторить сразу.
+        atomic_with_retry()(func)(*payload['args'], **payload['kwargs'])
+    except Exception:
+        _failed(job, traceback.format_exc())
+    else:
+        Task.objects.filter(pk=pk).update(
+            status=Task.DONE, finished=timezone.now(), error=''
+        )
+    return True
+
+
+def _failed(job, error):
+    now = timezone.now()
+    if job.attempts < job.max_attempts:
+        delay = RETRY_DELAY * 2 ** (job.attempts - 1)
+        logger.warning(
+            'Задача %s упала, попытка %s из %s, повтор через %s с',
+            job, job.attempts, job.max_attempts, delay,
+        )
+        Task.objects.filter(pk=job.pk).update(
+            status=Task.PENDING,
+            run_at=now + timedelta(seconds=delay),
+            error=error,
+        )
+    else:
+        logger.error('Задача %s не удалась:\n%s', job, error)
+        Task.objects.filter(pk=job.pk).update(
+            status=Task.FAILED, finished=now, error=error
+        )
+
+
+def run_in_thread(pk):
+    try:
+        return run(pk)
+    except Exception:
+        logger.exception('Не удалось выполнить задачу #%s', pk)
+        return False
+    finally:
+        close_old_connections()
+
+
+def due(limit):
+    """id задач, которые пора выполнить. Задачи, брошенные упавшим
+    процессом, возвращаются в очередь или, если попытки кончились,
+    считаются неудавшимися."""
+    now = timezone.now()
+    stale = Task.objects.filter(
+        status=Task.RUNNING, locked_at__lt=now - LOCK_TIMEOUT
+    )
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Task.FAILED, finished=now, error='Процесс не завершил задачу.'
+    )
+    stale.update(status=Task.PENDING, run_at=now)
+    return list(Task.objects.filter(
+        status=Task.PENDING, run_at__lte=now
+    ).order_by('run_at').values_list('pk', flat=True)[:limit])
+
+
+def purge():
+    """Удаляет давно выполненные задачи."""
+    return Task.objects.filter(
+        status=Task.DONE, finished__lt=timezone.now() - KEEP_DONE
+    ).delete()[0]
@@ -0,0 +1,642 @@
+import os
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache, caches
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import OperationalError, connections
+from django.http import HttpResponse
+from django.test import (RequestFactory, SimpleTestCase, TestCase,
+                         override_settings)
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from posts.models import Post
+
+from . import routers, taskqueue
+from .cache import STAMP_KEY, TwoTierCache, namespace
+from .middleware import PRIMARY_COOKIE, ReplicaRoutingMiddleware
+from .models import StoredFile, Task
+from .profiling import BudgetExceeded, histogram, profile
+from .sqlite import atomic_with_retry
+from .storage import ContentAddressedStorage, is_hashed
+from .views import IMMUTABLE_MAX_AGE, media
+
+User = get_user_model()
+STRESS_DB = 'stress'
+CALLS = []
+WRITERS: int = 8
+WRITES_PER_WRITER: int = 25
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@taskqueue.task(name='core.tests.record', max_attempts=2)
+def record(value):
+    CALLS.append(value)
+
+
+@taskqueue.task(name='core.tests.explode', max_attempts=2)
+def explode():
+    CALLS.append('boom')
+    Post.objects.create(text='Откатится', author=User.objects.first())
+    raise RuntimeError('boom')
+
+
+class TwoTierCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.shared = caches['shared']
+
+    def test_second_read_is_served_from_l1(self):
+        """Повторное чтение не идёт в общий кеш."""
+        self.shared.set('key', 'value')
+        before = cache.stats()
+        self.assertEqual(cache.get('key'), 'value')
+        self.assertEqual(cache.get('key'), 'value')
+        after = cache.stats()
+        self.assertEqual(after['l2_hits'] - before['l2_hits'], 1)
+        self.assertEqual(after['l1_hits'] - before['l1_hits'], 1)
+
+    def test_write_from_other_worker_resets_l1(self):
+        """Запись другого воркера сбрасывает L1 после сверки метки."""
+        cache.set('posts:key', 'old')
+        cache.validate()
+        self.shared.set('posts:key', 'new')
+        self.assertEqual(cache.get('posts:key'), 'old')
+        self.shared.set(STAMP_KEY.format('posts'), 'other-worker', None)
+        cache.validate()
+        self.assertEqual(cache.get('posts:key'), 'new')
+
+    def test_other_namespaces_stay_warm(self):
+        """Запись сбрасывает только своё пространство ключей."""
+        cache.set('posts:post:1', 'post')
+        cache.set('posts:feed', 'feed')
+        cache.validate()
+        self.shared.set(STAMP_KEY.format('posts:post'), 'other', None)
+        cache.validate()
+        before = cache.stats()
+        cache.get('posts:feed')
+        cache.get('posts:post:1')
+        after = cache.stats()
+        self.assertEqual(after['l1_hits'] - before['l1_hits'], 1)
+        self.assertEqual(after['l2_hits'] - before['l2_hits'], 1)
+
+    def test_fragment_write_keeps_stamps(self):
+        """Фрагменты ключуются версиями и меток не меняют."""
+        cache.set('posts:feed', 'feed')
+        cache.validate()
+        stamps = self.shared.get_many(
+            [STAMP_KEY.format('posts'), STAMP_KEY.format('template.cache')]
+        )
+        cache.set('template.cache.index_page.abc', '<html>')
+        self.assertEqual(self.shared.get_many(
+            [STAMP_KEY.format('posts'), STAMP_KEY.format('template.cache')]
+        ), stamps)
+        before = cache.stats()['l1_hits']
+        cache.validate()
+        cache.get('posts:feed')
+        self.assertEqual(cache.get('template.cache.index_page.abc'),
+                         '<html>')
+        self.assertEqual(cache.stats()['l1_hits'] - before, 2)
+
+    def test_add_after_miss_is_warm(self):
+        """Промах запоминает метку пространства: значение, записанное
+        следом через add, читается уже из L1."""
+        self.assertIsNone(cache.get('posts:feed'))
+        self.assertTrue(cache.add('posts:feed', 'feed'))
+        before = cache.stats()
+        self.assertEqual(cache.get('posts:feed'), 'feed')
+        self.assertEqual(cache.stats()['l1_hits'] - before['l1_hits'], 1)
+
+    def test_namespace(self):
+        self.assertEqual(namespace('posts:post:12'), 'posts:post')
+        self.assertEqual(namespace('posts:feed'), 'posts')
+        self.assertEqual(namespace('plain'), '')
+
+    def test_l1_is_bounded(self):
+        """L1 вытесняет давно не читанные ключи."""
+        small = TwoTierCache('shared', {'OPTIONS': {'L1_MAX_ENTRIES': 2}})
+        for key in ('a:1', 'b:1', 'c:1'):
+            small.set(key, key)
+        self.assertEqual(small.stats()['l1_size'], 2)
+        before = small.stats()['l2_hits']
+        self.assertEqual(small.get('a:1'), 'a:1')
+        self.assertEqual(small.stats()['l2_hits'] - before, 1)
+
+    def test_delete_and_incr(self):
+        """delete и incr проходят через оба уровня."""
+        cache.set('counter', 1)
+        self.assertEqual(cache.incr('counter'), 2)
+        self.assertEqual(cache.get('counter'), 2)
+        cache.delete('counter')
+        self.assertIsNone(cache.get('counter'))
+        self.assertFalse(cache.has_key('counter'))
+
+
+class ProfilingMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        histogram.clear()
+
+    def test_server_timing_header(self):
+        """Ответ несёт SQL, рендер и общее время в Server-Timing."""
+        response = self.client.get(reverse('posts:index'))
+        timing = response['Server-Timing']
+        for metric in ('sql;dur=', 'render;dur=', 'total;dur='):
+            self.assertIn(metric, timing)
+        self.assertIn('queries', timing)
+
+    def test_histogram_is_keyed_by_view_name(self):
+        """Замеры копятся по имени страницы."""
+        for _ in range(3):
+            self.client.get(reverse('posts:index'))
+        self.client.get(reverse('about:author'))
+        report = histogram.snapshot()
+        self.assertEqual(report['posts:index']['requests'], 3)
+        self.assertEqual(report['about:author']['requests'], 1)
+        self.assertGreater(report['posts:index']['queries'], 0)
+
+    @override_settings(
+        PROFILING_BUDGETS={'posts:index': {'queries': 0}},
+        PROFILING_BUDGET_ACTION='raise',
+    )
+    def test_budget_raises(self):
+        """В режиме raise превышение бюджета роняет запрос."""
+        with self.assertRaises(BudgetExceeded):
+            self.client.get(reverse('posts:index'))
+
+    @override_settings(PROFILING_BUDGETS={'posts:index': {'queries': 0}})
+    def test_budget_logs(self):
+        """По умолчанию превышение пишется в лог и считается."""
+        with self.assertLogs('core.profiling', 'WARNING'):
+            response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(histogram.snapshot()['posts:index']['over_budget'], 1)
+
+    def test_endpoint_is_staff_only(self):
+        """Гистограмму видит только персонал."""
+        url = reverse('core:profiling')
+        user = User.objects.create_user(username='reader')
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(url).status_code, 302)
+        user.is_staff = True
+        user.save()
+        self.client.get(reverse('posts:index'))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertIn('posts:index', data['views'])
+        self.assertIn('l1_hits', data['caches']['default'])
+
+
+class ProfileTests(TestCase):
+    def test_nested_profiles_both_measure(self):
+        """Внешний замер учитывает SQL и рендер внутреннего."""
+        with profile() as outer:
+            with profile() as inner:
+                self.client.get(reverse('posts:index'))
+        self.assertEqual(outer.query_count, inner.query_count)
+        self.assertGreater(inner.render_time, 0)
+        self.assertGreaterEqual(outer.render_time, inner.render_time)
+
+
+@mock.patch.object(routers, '_read_replica_point', lambda: 7)
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def tearDown(self):
+        routers.reset()
+
+    def route(self, request, write=False):
+        """Прогоняет запрос через middleware и возвращает ответ и базу,
+        с которой view читала бы посты."""
+        seen = {}
+
+        def view(request):
+            if write:
+                self.router.db_for_write(Post)
+            seen['db'] = self.router.db_for_read(Post)
+            return HttpResponse()
+
+        response = ReplicaRoutingMiddleware(view)(request)
+        return response, seen['db']
+
+    def test_outside_requests_reads_go_to_primary(self):
+        """Команды и фоновые потоки читают с основной базы."""
+        self.assertEqual(self.router.db_for_read(Post), routers.PRIMARY)
+
+    def test_safe_request_reads_from_replica(self):
+        response, db = self.route(self.factory.get('/'))
+        self.assertEqual(db, routers.REPLICA)
+        self.assertNotIn(PRIMARY_COOKIE, response.cookies)
+
+    def test_write_goes_to_primary_and_sticks(self):
+        """После записи чтения идут в основную базу, а ответ ставит
+        куку прилипания."""
+        response, db = self.route(self.factory.post('/'), write=True)
+        self.assertEqual(db, routers.PRIMARY)
+        self.assertEqual(self.router.db_for_write(Post), routers.PRIMARY)
+        self.assertIn(PRIMARY_COOKIE, response.cookies)
+
+    def test_cookie_pins_reads_to_primary(self):
+        request = self.factory.get('/')
+        request.COOKIES[PRIMARY_COOKIE] = '1'
+        self.assertEqual(self.route(request)[1], routers.PRIMARY)
+
+    def test_write_inside_get_pins_rest_of_request(self):
+        self.assertEqual(
+            self.route(self.factory.get('/'), write=True)[1],
+            routers.PRIMARY,
+        )
+
+    def test_cache_and_sessions_stay_on_primary(self):
+        """Кеш и сессии не читаются с отстающей реплики, а запись в кеш
+        не считается записью пользователя."""
+        cache_model = caches['shared'].cache_model_class
+        routers.reset(pinned=False)
+        self.assertEqual(self.router.db_for_read(Session), routers.PRIMARY)
+        self.assertEqual(
+            self.router.db_for_read(cache_model), routers.PRIMARY
+        )
+        self.router.db_for_write(cache_model)
+        self.assertFalse(routers.wrote())
+
+    def test_migrations_only_on_primary(self):
+        self.assertTrue(self.router.allow_migrate(routers.PRIMARY, 'posts'))
+        self.assertFalse(self.router.allow_migrate(routers.REPLICA, 'posts'))
+
+    def test_read_point(self):
+        """Точка чтения различает основную базу и синхронизации
+        реплики."""
+        self.assertEqual(routers.read_point(), routers.PRIMARY)
+        routers.reset(pinned=False)
+        self.assertEqual(routers.read_point(), 'replica:7')
+
+    def test_unsynced_replica_is_not_read(self):
+        """Без точки синхронизации реплика не читается."""
+        with mock.patch.object(routers, '_read_replica_point', lambda: None):
+            response, db = self.route(self.factory.get('/'))
+        self.assertEqual(db, routers.PRIMARY)
+
+
+class SyncReplicaTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        connections.databases[routers.REPLICA] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(self.directory, 'replica.sqlite3'),
+        }
+        connections.ensure_defaults(routers.REPLICA)
+
+    def tearDown(self):
+        connections[routers.REPLICA].close()
+        del connections[routers.REPLICA]
+        del connections.databases[routers.REPLICA]
+        shutil.rmtree(self.directory)
+        routers.reset()
+
+    def test_sync_moves_point(self):
+        """Каждая синхронизация сдвигает точку реплики."""
+        self.assertIsNone(routers._read_replica_point())
+        for point in (1, 2):
+            call_command('sync_replica', stdout=StringIO())
+            self.assertEqual(routers._read_replica_point(), point)
+            self.assertEqual(
+                Post.objects.using(routers.REPLICA).count(),
+                Post.objects.count(),
+            )
+
+
+class SqliteTuningTests(SimpleTestCase):
+    """Тестовая база живёт в памяти, поэтому блокировки проверяются
+    на отдельном файле SQLite, как в рабочем окружении."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        connections.databases[STRESS_DB] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(self.directory, 'stress.sqlite3'),
+        }
+        with connections[STRESS_DB].cursor() as cursor:
+            cursor.execute(
+                'CREATE TABLE log (id INTEGER PRIMARY KEY, writer, seen)'
+            )
+
+    def tearDown(self):
+        connections[STRESS_DB].close()
+        del connections[STRESS_DB]
+        del connections.databases[STRESS_DB]
+        shutil.rmtree(self.directory)
+
+    def pragma(self, name):
+        with connections[STRESS_DB].cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_connection_is_tuned(self):
+        """Новое соединение получает WAL и остальные PRAGMA."""
+        self.assertEqual(self.pragma('journal_mode'), 'wal')
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('busy_timeout'), 5000)
+        self.assertEqual(self.pragma('cache_size'), -64000)
+
+    def test_concurrent_writers(self):
+        """Параллельные транзакции «прочитал — записал» не теряются
+        и не падают с database is locked."""
+        errors = []
+
+        @atomic_with_retry(using=STRESS_DB, delay=0.01)
+        def write(writer):
+            with connections[STRESS_DB].cursor() as cursor:
+                cursor.execute('SELECT COUNT(*) FROM log')
+                seen = cursor.fetchone()[0]
+                cursor.execute(
+                    'INSERT INTO log (writer, seen) VALUES (%s, %s)',
+                    (writer, seen),
+                )
+
+        def run(writer):
+            try:
+                for _ in range(WRITES_PER_WRITER):
+                    write(writer)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connections[STRESS_DB].close()
+
+        threads = [
+            threading.Thread(target=run, args=(writer,))
+            for writer in range(WRITERS)
+        ]
+        with mock.patch('core.sqlite.logger'):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(errors, [])
+        with connections[STRESS_DB].cursor() as cursor:
+            cursor.execute('SELECT COUNT(*), COUNT(DISTINCT seen) FROM log')
+            total, distinct = cursor.fetchone()
+        # Каждая транзакция видела все предыдущие: записи не пересеклись.
+        self.assertEqual(total, WRITERS * WRITES_PER_WRITER)
+        self.assertEqual(distinct, total)
+
+    def test_retry_only_on_lock(self):
+        """Повторяются только ошибки блокировки и не больше retries раз."""
+        calls = []
+
+        @atomic_with_retry(using=STRESS_DB, retries=2, delay=0)
+        def locked():
+            calls.append(1)
+            raise OperationalError('database is locked')
+
+        @atomic_with_retry(using=STRESS_DB, retries=2, delay=0)
+        def broken():
+            calls.append(1)
+            raise OperationalError('no such table: missing')
+
+        with self.assertLogs('core.sqlite', 'WARNING') as logs:
+            with self.assertRaises(OperationalError):
+                locked()
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(len(logs.records), 2)
+        calls.clear()
+        with self.assertRaises(OperationalError):
+            broken()
+        self.assertEqual(len(calls), 1)
+
+
+class TaskQueueTests(TestCase):
+    """База тестов в памяти, поэтому задачи выполняются сразу при
+    постановке, а воркер — в основном потоке."""
+
+    def setUp(self):
+        CALLS.clear()
+
+    def test_enqueue_runs_task(self):
+        job = record.enqueue('привет')
+        job.refresh_from_db()
+        self.assertEqual(job.status, Task.DONE)
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(CALLS, ['привет'])
+
+    def test_idempotency_key(self):
+        """Задача с тем же ключом ставится и выполняется один раз."""
+        first = record.enqueue(1, idempotency_key='once')
+        second = record.enqueue(2, idempotency_key='once')
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(CALLS, [1])
+        self.assertEqual(Task.objects.count(), 1)
+
+    def test_failure_is_retried_then_given_up(self):
+        """Ошибка откатывает работу задачи и откладывает повтор;
+        после последней попытки задача считается неудавшейся."""
+        User.objects.create_user(username='Author')
+        with self.assertLogs('core.taskqueue', 'WARNING'):
+            job = explode.enqueue()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Task.PENDING)
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('RuntimeError', job.error)
+        self.assertFalse(Post.objects.exists())
+        self.assertEqual(taskqueue.due(10), [])
+        Task.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        with self.assertLogs('core.taskqueue', 'ERROR'):
+            call_command('run_tasks', '--once', '--threads', '1',
+                         stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.status, Task.FAILED)
+        self.assertEqual(CALLS, ['boom', 'boom'])
+
+    def test_worker_runs_pending_and_stale_tasks(self):
+        """Воркер выполняет задачи из очереди и брошенные упавшим
+        процессом."""
+        payload = '{"args": ["из базы"], "kwargs": {}}'
+        Task.objects.create(name='core.tests.record', payload=payload)
+        Task.objects.create(
+            name='core.tests.record',
+            payload=payload,
+            status=Task.RUNNING,
+            locked_at=timezone.now() - taskqueue.LOCK_TIMEOUT
+            - timedelta(seconds=1),
+        )
+        out = StringIO()
+        call_command('run_tasks', '--once', '--threads', '1', stdout=out)
+        self.assertIn('Выполнено задач: 2', out.getvalue())
+        self.assertEqual(CALLS, ['из базы', 'из базы'])
+
+    def test_running_task_is_not_taken_twice(self):
+        job = Task.objects.create(
+            name='core.tests.record', payload='{"args": [1], "kwargs": {}}',
+            status=Task.RUNNING, locked_at=timezone.now(),
+        )
+        self.assertFalse(taskqueue.run(job.pk))
+        self.assertEqual(taskqueue.due(10), [])
+        self.assertEqual(CALLS, [])
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.storage = Post.image.field.storage
+
+    def picture(self, color):
+        """Картинка одного цвета: одинаковые цвета дают один файл."""
+        buffer = BytesIO()
+        Image.new('RGB', (8, 8), color=color).save(buffer, 'PNG')
+        return ContentFile(buffer.getvalue(), name='photo.PNG')
+
+    def post(self, color, text='Пост'):
+        return Post.objects.create(
+            text=text, author=self.author, image=self.picture(color)
+        )
+
+    def refs(self, name):
+        return StoredFile.objects.get(name=name).refs
+
+    def test_same_content_stored_once(self):
+        """Одинаковое содержимое — одно имя и один файл в подкаталогах."""
+        first = self.storage.save('posts/a.jpg', ContentFile(b'same'))
+        second = self.storage.save('posts/b.jpg', ContentFile(b'same'))
+        other = self.storage.save('posts/a.jpg', ContentFile(b'other'))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertTrue(is_hashed(first))
+        directory, filename = first.rsplit('/', 1)
+        self.assertEqual(directory, f'posts/{filename[:2]}/{filename[2:4]}')
+        self.assertEqual(self.storage.listdir(directory)[1], [filename])
+        self.assertTrue(filename.endswith('.jpg'))
+
+    def test_posts_count_references(self):
+        """Посты держат ссылки на файл; удалённые и сменившие картинку
+        отпускают их."""
+        first = self.post('red')
+        second = self.post('red')
+        name = first.image.name
+        self.assertEqual(second.image.name, name)
+        self.assertEqual(self.refs(name), 2)
+        second.image = self.picture('blue')
+        second.save()
+        self.assertEqual(self.refs(name), 1)
+        self.assertEqual(self.refs(second.image.name), 1)
+        first.delete()
+        self.assertEqual(self.refs(name), 0)
+        self.assertIsNotNone(StoredFile.objects.get(name=name).released)
+
+    def test_collect(self):
+        """Файлы без ссылок удаляются после паузы, остальные остаются;
+        файлы без строки — только по unknown."""
+        kept = self.post('green').image.name
+        released = self.post('white')
+        name = released.image.name
+        released.delete()
+        orphan = self.storage.save('posts/x.jpg', ContentFile(b'orphan'))
+        self.assertEqual(self.storage.collect(), [])
+        old = (timezone.now() - timedelta(days=1)).timestamp()
+        for path in (name, orphan, kept):
+            os.utime(self.storage.path(path), (old, old))
+        StoredFile.objects.filter(name=name).update(
+            released=timezone.now() - timedelta(days=1)
+        )
+        self.assertEqual(self.storage.collect(), [name])
+        self.assertTrue(self.storage.exists(orphan))
+        self.assertEqual(self.storage.collect(unknown=True), [orphan])
+        self.assertFalse(self.storage.exists(name))
+        self.assertFalse(self.storage.exists(orphan))
+        self.assertTrue(self.storage.exists(kept))
+        self.assertFalse(StoredFile.objects.filter(name=name).exists())
+
+    def test_collect_skips_retained(self):
+        """Файл, на который сослались после выборки отпущенных, остаётся
+        вместе со строкой; свежий файл остаётся на диске."""
+        name = self.post('white').image.name
+        Post.objects.filter(image=name).delete()
+        fresh = self.post('black')
+        fresh_name = fresh.image.name
+        fresh.delete()
+        old = (timezone.now() - timedelta(days=1)).timestamp()
+        os.utime(self.storage.path(name), (old, old))
+        StoredFile.objects.update(released=timezone.now() - timedelta(days=1))
+
+        def retain_after_select(names):
+            names = list(names)
+            self.storage.retain(name)
+            return names
+
+        with mock.patch('core.storage.list', retain_after_select,
+                        create=True):
+            deleted = self.storage.collect()
+        self.assertNotIn(name, deleted)
+        self.assertNotIn(fresh_name, deleted)
+        self.assertTrue(self.storage.exists(name))
+        self.assertEqual(self.refs(name), 1)
+        self.assertTrue(self.storage.exists(fresh_name))
+
+    def test_import_keeps_files(self):
+        """Посты, загруженные yatube_import в обход сигналов, держат
+        ссылки на свои картинки, и collect_media их не удаляет."""
+        name = self.post('navy').image.name
+        path = os.path.join(TEMP_MEDIA_ROOT, 'dump.ndjson')
+        call_command('yatube_export', path, stderr=StringIO())
+        User.objects.all().delete()
+        StoredFile.objects.all().delete()
+        call_command('yatube_import', path, stdout=StringIO())
+        self.assertEqual(self.refs(name), 1)
+        for options in ((), ('--recount',)):
+            with self.subTest(options=options):
+                call_command(
+                    'collect_media', '--grace', '0', *options,
+                    stdout=StringIO(),
+                )
+                self.assertTrue(self.storage.exists(name))
+        self.assertEqual(Post.objects.get().image.name, name)
+
+    def test_recount(self):
+        post = self.post('black')
+        StoredFile.objects.filter(name=post.image.name).update(refs=5)
+        out = StringIO()
+        call_command('collect_media', '--recount', stdout=out)
+        self.assertIn('исправлено ссылок 1', out.getvalue())
+        self.assertEqual(self.refs(post.image.name), 1)
+
+    def test_media_is_immutable(self):
+        """Файлы по хешу отдаются с заголовками «кешировать навсегда»."""
+        name = self.post('gray').image.name
+        legacy = ContentAddressedStorage().path('posts/legacy.jpg')
+        with open(legacy, 'wb') as file:
+            file.write(b'legacy')
+        factory = RequestFactory()
+        response = media(
+            factory.get('/'), name, document_root=TEMP_MEDIA_ROOT
+        )
+        self.assertEqual(
+            response['Cache-Control'],
+            f'public, max-age={IMMUTABLE_MAX_AGE}, immutable',
+        )
+        self.assertIn('Expires', response)
+        response = media(
+            factory.get('/'), 'posts/legacy.jpg',
+            document_root=TEMP_MEDIA_ROOT,
+        )
+        self.assertNotIn('Cache-Control', response)
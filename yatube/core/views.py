@@ -1,4 +1,18 @@
+import time
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.cache import caches
+from django.http import JsonResponse
 from django.shortcuts import render
+from django.utils.http import http_date
+from django.views.static import serve
+
+from .profiling import histogram
+from .storage import is_hashed
+
+# Год — предел max-age, который соблюдают браузеры и прокси.
+IMMUTABLE_MAX_AGE: int = 365 * 24 * 60 * 60
 
 
 def page_not_found(request, exception):
@@ -15,3 +29,30 @@ def server_error(request):
 
 def permission_denied(request, exception):
     return render(request, 'core/403.html', status=403)
+
+
+def media(request, path, document_root=None):
+    """Медиафайлы для разработки. Файлы с адресом по содержимому
+    (core.storage) под своим именем не меняются, поэтому отдаются
+    с заголовками «кешировать навсегда»."""
+    response = serve(request, path, document_root=document_root)
+    if response.status_code == 200 and is_hashed(path):
+        response['Cache-Control'] = (
+            f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+        )
+        response['Expires'] = http_date(time.time() + IMMUTABLE_MAX_AGE)
+    return response
+
+
+@staff_member_required
+def profiling(request):
+    """Гистограмма замеров страниц и статистика кешей этого процесса."""
+    return JsonResponse({
+        'views': histogram.snapshot(),
+        'budgets': getattr(settings, 'PROFILING_BUDGETS', {}),
+        'caches': {
+            alias: caches[alias].stats()
+            for alias in settings.CACHES
+            if hasattr(caches[alias], 'stats')
+        },
+    }, json_dumps_params={'ensure_ascii': False, 'indent': 2})
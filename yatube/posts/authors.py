@@ -0,0 +1,96 @@
+"""Карточки авторов для лент и комментариев.
+
+Шаблонам от автора нужны только имя пользователя и полное имя, а не
+вся строка auth_user с хешем пароля. Карточки живут в LRU процесса;
+за всеми недостающими на странице авторами уходит один запрос in_bulk.
+Сохранение пользователя меняет версию карточек, и каждый процесс
+при следующем чтении сбрасывает свои. Если версии нет в кеше (после
+очистки или вытеснения), первое чтение создаёт её.
+"""
+import threading
+from collections import OrderedDict
+
+from django.contrib.auth import get_user_model
+
+from core.routers import PRIMARY
+
+from . import versions
+
+MAX_CARDS: int = 10000
+
+_cards = OrderedDict()
+_version = None
+_lock = threading.Lock()
+
+
+class AuthorCard:
+    """Имя и полное имя автора — всё, что о нём выводят шаблоны."""
+    __slots__ = ('pk', 'username', 'first_name', 'last_name')
+
+    def __init__(self, pk, username, first_name='', last_name=''):
+        self.pk = pk
+        self.username = username
+        self.first_name = first_name
+        self.last_name = last_name
+
+    def __str__(self):
+        return self.username
+
+    def __repr__(self):
+        return f'<AuthorCard {self.pk}: {self.username}>'
+
+    def get_username(self):
+        return self.username
+
+    def get_full_name(self):
+        return f'{self.first_name} {self.last_name}'.strip()
+
+
+def cards(ids):
+    """Карточки авторов по id: {id: AuthorCard}."""
+    global _version
+    ids = set(ids)
+    version = versions.authors_version()
+    found = {}
+    with _lock:
+        if version != _version:
+            _cards.clear()
+            _version = version
+        for pk in ids:
+            card = _cards.get(pk)
+            if card is not None:
+                _cards.move_to_end(pk)
+                found[pk] = card
+    missing = ids - found.keys()
+    if not missing:
+        return found
+    # Карточки живут дольше запроса и проверяются версиями из кеша
+    # основной базы, поэтому и читаются с неё, а не с реплики.
+    users = get_user_model().objects.using(PRIMARY).only(
+        'id', 'username', 'first_name', 'last_name'
+    ).in_bulk(missing)
+    loaded = {
+        pk: AuthorCard(pk, user.username, user.first_name, user.last_name)
+        for pk, user in users.items()
+    }
+    with _lock:
+        if version == _version:
+            _cards.update(loaded)
+            while len(_cards) > MAX_CARDS:
+                _cards.popitem(last=False)
+    found.update(loaded)
+    return found
+
+
+def attach(objects):
+    """Проставляет объектам с author_id атрибут author_card.
+
+    Объекты, у которых author_id отложен через only(), пропускаются:
+    чтение поля стоило бы запроса на каждый.
+    """
+    objects = [obj for obj in objects if 'author_id' in obj.__dict__]
+    if not objects:
+        return
+    found = cards(obj.author_id for obj in objects)
+    for obj in objects:
+        obj.author_card = found.get(obj.author_id)
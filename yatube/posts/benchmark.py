@@ -0,0 +1,198 @@
+"""Наполнение базы и замеры скорости страниц posts."""
+import random
+import subprocess
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+from faker import Faker
+
+from core.profiling import percentile, profile
+
+from . import counters, search, timeline, versions
+from .models import Comment, Follow, Group, Post
+from .ndjson import raw_dates
+
+User = get_user_model()
+SCALES = {
+    '10k': 10_000,
+    '100k': 100_000,
+    '1m': 1_000_000,
+}
+POSTS_PER_AUTHOR: int = 50
+COMMENTS_PER_POST: float = 0.2
+FOLLOWS_PER_USER: int = 5
+GROUPS: int = 20
+BATCH_SIZE: int = 5000
+SEED: int = 42
+
+
+def _batches(total, make):
+    for start in range(0, total, BATCH_SIZE):
+        yield [make(i) for i in range(start, min(start + BATCH_SIZE, total))]
+
+
+def seed(posts, log=lambda message: None):
+    """Добавляет в базу posts постов и соразмерных им пользователей,
+    групп, комментариев и подписок. Данные воспроизводимы: Faker и
+    random запускаются с одним и тем же зерном."""
+    fake = Faker('ru_RU')
+    fake.seed_instance(SEED)
+    rnd = random.Random(SEED)
+    prefix = f'bench{User.objects.count()}'
+    users = max(posts // POSTS_PER_AUTHOR, 2)
+    now = timezone.now()
+    with transaction.atomic():
+        for batch in _batches(users, lambda i: User(
+            username=f'{prefix}_{i}',
+            first_name=fake.first_name(),
+            last_name=fake.last_name(),
+        )):
+            User.objects.bulk_create(batch)
+        user_ids = list(User.objects.filter(
+            username__startswith=f'{prefix}_'
+        ).values_list('pk', flat=True))
+        log(f'users: {len(user_ids)}')
+        Group.objects.bulk_create(
+            (
+                Group(
+                    title=fake.word().capitalize(),
+                    slug=f'{prefix}-{i}',
+                    description=fake.sentence(),
+                )
+                for i in range(GROUPS)
+            ),
+        )
+        group_ids = list(Group.objects.filter(
+            slug__startswith=f'{prefix}-'
+        ).values_list('pk', flat=True))
+        with raw_dates(Post):
+            for batch in _batches(posts, lambda i: Post(
+                text=fake.paragraph(),
+                author_id=rnd.choice(user_ids),
+                group_id=rnd.choice(group_ids + [None]),
+                pub_date=now - timedelta(minutes=i),
+            )):
+                Post.objects.bulk_create(batch)
+                log(f'posts: {len(batch)}')
+        post_ids = list(Post.objects.filter(
+            author_id__in=user_ids
+        ).values_list('pk', flat=True).iterator())
+        with raw_dates(Comment):
+            for batch in _batches(
+                int(posts * COMMENTS_PER_POST), lambda i: Comment(
+                    post_id=rnd.choice(post_ids),
+                    author_id=rnd.choice(user_ids),
+                    text=fake.sentence(),
+                    created=now - timedelta(seconds=i),
+                )
+            ):
+                Comment.objects.bulk_create(batch)
+        Follow.objects.bulk_create(
+            (
+                Follow(user_id=user_id, author_id=author_id)
+                for user_id in user_ids
+                for author_id in rnd.sample(
+                    user_ids, min(FOLLOWS_PER_USER, len(user_ids))
+                )
+                if author_id != user_id
+            ),
+            ignore_conflicts=True,
+        )
+        log('follows, rebuilding counters, timelines and search')
+        counters.recount()
+        timeline.rebuild()
+        search.rebuild()
+    versions.bump_feed()
+    versions.bump_groups()
+    return user_ids
+
+
+def _sample(queryset, field, size=100):
+    return list(queryset.order_by('?').values_list(field, flat=True)[:size])
+
+
+def _targets(rnd):
+    """Для каждой страницы — функция, выдающая случайный адрес."""
+    posts = _sample(Post.objects.all(), 'pk')
+    groups = _sample(Group.objects.all(), 'slug')
+    authors = _sample(User.objects.filter(stats__posts_count__gt=0),
+                      'username')
+    return {
+        'posts:index': lambda: reverse('posts:index') + (
+            f'?page={rnd.randint(1, 10)}'),
+        'posts:group_list': lambda: reverse(
+            'posts:group_list', args=(rnd.choice(groups),)),
+        'posts:profile': lambda: reverse(
+            'posts:profile', args=(rnd.choice(authors),)),
+        'posts:post_detail': lambda: reverse(
+            'posts:post_detail', args=(rnd.choice(posts),)),
+        'posts:follow_index': lambda: reverse('posts:follow_index'),
+    }
+
+
+def _summary(samples):
+    ms = 1000
+    latency = [sample.total_time * ms for sample in samples]
+    return {
+        'requests': len(samples),
+        'p50_ms': round(percentile(latency, 0.50), 2),
+        'p95_ms': round(percentile(latency, 0.95), 2),
+        'p99_ms': round(percentile(latency, 0.99), 2),
+        'queries': round(
+            sum(s.query_count for s in samples) / len(samples), 2),
+        'sql_ms': round(
+            sum(s.sql_time for s in samples) * ms / len(samples), 2),
+        'render_ms': round(
+            sum(s.render_time for s in samples) * ms / len(samples), 2),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            stderr=subprocess.DEVNULL,
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(requests=50, warm=False, views=None):
+    """Прогоняет страницы через тестовый клиент и возвращает отчёт.
+
+    Без warm перед каждым запросом кеш очищается: меряется холодный
+    путь, который видит первый посетитель после записи.
+    """
+    rnd = random.Random(SEED)
+    reader = User.objects.filter(stats__following_count__gt=0).first()
+    if reader is None or not Group.objects.exists():
+        raise ValueError('Нет данных: сначала наполните базу.')
+    client = Client()
+    client.force_login(reader)
+    targets = _targets(rnd)
+    report = {
+        'revision': git_revision(),
+        'posts': Post.objects.count(),
+        'warm': warm,
+        'views': {},
+    }
+    for name, url in targets.items():
+        if views and name not in views:
+            continue
+        samples = []
+        for _ in range(requests):
+            if not warm:
+                cache.clear()
+            address = url()
+            with profile() as sample:
+                response = client.get(address)
+            if response.status_code != 200:
+                raise ValueError(f'{address}: {response.status_code}')
+            samples.append(sample)
+        report['views'][name] = _summary(samples)
+    return report
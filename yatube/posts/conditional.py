@@ -0,0 +1,95 @@
+"""Валидаторы условных GET для лент и страницы поста.
+
+ETag и Last-Modified считаются по версиям данных (см. versions), без
+рендера шаблона. Шапка страниц зависит от пользователя, поэтому ETag
+включает его id, а Last-Modified — время его последнего входа.
+Страница с реплики отстаёт от версий, поэтому ETag включает точку
+чтения (core.routers.read_point), а Last-Modified у неё нет.
+"""
+import hashlib
+
+from core import routers
+
+from .models import UserStats
+from .versions import (COMMENTS_VERSION_KEY, FEED_VERSION_KEY,
+                       POST_VERSION_KEY, comments_version, feed_version,
+                       get_modified, post_version, timeline_version)
+
+
+def _etag(request, *parts):
+    viewer = request.user.pk if request.user.is_authenticated else 'anon'
+    key = ':'.join(
+        str(part) for part in (
+            viewer, request.get_full_path(), routers.read_point()
+        ) + parts
+    )
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+def _last_modified(request, *keys):
+    if routers.read_point() != routers.PRIMARY:
+        return None
+    dates = [get_modified(key) for key in keys]
+    if request.user.is_authenticated and request.user.last_login:
+        dates.append(request.user.last_login)
+    return max(dates)
+
+
+def feed_etag(request, *args, **kwargs):
+    return _etag(request, feed_version())
+
+
+def feed_last_modified(request, *args, **kwargs):
+    return _last_modified(request, FEED_VERSION_KEY)
+
+
+def profile_etag(request, username):
+    """Кроме ленты автора, профиль показывает его счётчики и кнопку
+    подписки, которая меняет версию ленты подписок зрителя.
+
+    Last-Modified у профиля нет: подписка на автора со стороны других
+    пользователей меняет счётчик, но не время ни одной из версий.
+    """
+    stats = UserStats.objects.filter(user__username=username).values_list(
+        'posts_count', 'followers_count', 'following_count'
+    ).first()
+    parts = [feed_version(), stats]
+    if request.user.is_authenticated:
+        parts.append(timeline_version(request.user.pk))
+    return _etag(request, *parts)
+
+
+def follow_etag(request, *args, **kwargs):
+    """Лента подписок: посты всех авторов и подписки зрителя."""
+    if not request.user.is_authenticated:
+        return None
+    return _etag(request, feed_version(), timeline_version(request.user.pk))
+
+
+def counted_feed_etag(request, *args, **kwargs):
+    """Лента с числом комментариев у постов (API): новый комментарий
+    меняет её, хотя HTML-ленты остаются прежними."""
+    return _etag(request, feed_version(), comments_version())
+
+
+def counted_feed_last_modified(request, *args, **kwargs):
+    return _last_modified(request, FEED_VERSION_KEY, COMMENTS_VERSION_KEY)
+
+
+def counted_follow_etag(request, *args, **kwargs):
+    if not request.user.is_authenticated:
+        return None
+    return _etag(
+        request, feed_version(), timeline_version(request.user.pk),
+        comments_version(),
+    )
+
+
+def post_etag(request, post_id):
+    return _etag(request, feed_version(), post_version(post_id))
+
+
+def post_last_modified(request, post_id):
+    return _last_modified(
+        request, FEED_VERSION_KEY, POST_VERSION_KEY.format(post_id)
+    )
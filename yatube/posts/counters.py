@@ -0,0 +1,104 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+def bump(user_id, field, delta):
+    """Атомарно меняет счётчик пользователя на delta.
+
+    Счётчик не уходит в минус, а строка создаётся только при росте:
+    при каскадном удалении пользователя её нельзя воскрешать.
+    """
+    stats = UserStats.objects.filter(
+        user_id=user_id, **{f'{field}__gte': -delta}
+    )
+    if stats.update(**{field: F(field) + delta}) or delta < 0:
+        return
+    UserStats.objects.get_or_create(user_id=user_id)
+    stats.update(**{field: F(field) + delta})
+
+
+def bump_comments(post_id, delta):
+    Post.objects.filter(pk=post_id, comments_count__gte=-delta).update(
+        comments_count=F('comments_count') + delta
+    )
+
+
+def bump_group_posts(group_id, delta):
+    Group.objects.filter(pk=group_id, posts_count__gte=-delta).update(
+        posts_count=F('posts_count') + delta
+    )
+
+
+def recount_groups():
+    """Пересчитывает число записей всех групп одним запросом."""
+    Group.objects.update(posts_count=_count(Post.objects.all(), 'group'))
+
+
+def recount_follows(user_ids):
+    """Пересчитывает счётчики подписок пользователей по таблице Follow —
+    после массовых вставок и удалений, которые обходят сигналы."""
+    user_ids = list(user_ids)
+    UserStats.objects.bulk_create(
+        (UserStats(user_id=pk) for pk in user_ids), ignore_conflicts=True
+    )
+    UserStats.objects.filter(user_id__in=user_ids).update(
+        followers_count=_count(Follow.objects.all(), 'author'),
+        following_count=_count(Follow.objects.all(), 'user'),
+    )
+
+
+def stats_for(user):
+    """Счётчики пользователя; нулевые, если строки ещё нет."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        return UserStats(user=user)
+
+
+def _count(queryset, field):
+    counted = (
+        queryset.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+
+
+def recount():
+    """Пересчитывает все счётчики по таблицам, возвращает число
+    пользователей и постов, у которых счётчики разошлись."""
+    UserStats.objects.bulk_create(
+        (
+            UserStats(user_id=pk)
+            for pk in User.objects.filter(
+                stats__isnull=True
+            ).values_list('pk', flat=True)
+        ),
+        ignore_conflicts=True,
+    )
+    stats = UserStats.objects.annotate(
+        real_posts=_count(Post.objects.all(), 'author'),
+        real_followers=_count(Follow.objects.all(), 'author'),
+        real_following=_count(Follow.objects.all(), 'user'),
+    )
+    stale_users = stats.filter(
+        ~Q(posts_count=F('real_posts'))
+        | ~Q(followers_count=F('real_followers'))
+        | ~Q(following_count=F('real_following'))
+    ).count()
+    UserStats.objects.update(
+        posts_count=_count(Post.objects.all(), 'author'),
+        followers_count=_count(Follow.objects.all(), 'author'),
+        following_count=_count(Follow.objects.all(), 'user'),
+    )
+    comments = _count(Comment.objects.all(), 'post')
+    stale_posts = Post.objects.annotate(real=comments).exclude(
+        comments_count=F('real')
+    ).count()
+    Post.objects.update(comments_count=comments)
+    recount_groups()
+    return stale_users, stale_posts
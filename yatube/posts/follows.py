@@ -0,0 +1,93 @@
+"""Массовые подписки и отписки.
+
+Подписка по одной стоит нескольких запросов на автора: get_or_create и
+сигналы со счётчиками, лентой и версией. Здесь подписки пишутся одним
+bulk_create, а производные данные чинятся по запросу на вид, поэтому
+число запросов не зависит от числа авторов.
+"""
+from django.db import connections, router
+
+from . import counters, tasks, versions
+from .models import Follow, TimelineEntry, User
+
+# Больше имён за раз не уложить в предел SQLite в 999 параметров
+# на запрос.
+MAX_USERNAMES: int = 500
+
+
+def resolve(usernames):
+    """id пользователей по именам одним запросом: {username: id}."""
+    return dict(
+        User.objects.filter(username__in=set(usernames)).values_list(
+            'username', 'pk'
+        )
+    )
+
+
+def add(pairs):
+    """Подписывает по парам (user_id, author_id).
+
+    Уже существующие подписки bulk_create пропускает по уникальному
+    ограничению, так что повторный вызов ничего не меняет. Счётчики
+    пересчитываются по таблице, а не прибавляются, — параллельная
+    подписка на того же автора их не собьёт.
+    """
+    pairs = {(user_id, author_id) for user_id, author_id in pairs
+             if user_id != author_id}
+    if not pairs:
+        return
+    Follow.objects.bulk_create(
+        (Follow(user_id=user_id, author_id=author_id)
+         for user_id, author_id in pairs),
+        ignore_conflicts=True,
+    )
+    users = {user_id for user_id, _ in pairs}
+    counters.recount_follows(users | {author_id for _, author_id in pairs})
+    versions.bump_timelines(users)
+    tasks.backfill.enqueue(sorted(pairs))
+
+
+def remove(user_id, author_ids):
+    """Отписывает пользователя от авторов."""
+    author_ids = list(author_ids)
+    if not author_ids:
+        return
+    # Простым DELETE, без сигналов post_delete: они стоили бы запросов
+    # на каждую подписку, а всё, что они делают, сделано ниже.
+    # QuerySet.delete() из-за этих сигналов читал бы подписки по одной.
+    meta = Follow._meta
+    with connections[router.db_for_write(Follow)].cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {meta.db_table} '
+            f'WHERE {meta.get_field("user").column} = %s '
+            f'AND {meta.get_field("author").column} '
+            f'IN ({", ".join(["%s"] * len(author_ids))})',
+            [user_id] + author_ids,
+        )
+    TimelineEntry.objects.filter(
+        user_id=user_id, author_id__in=author_ids
+    ).delete()
+    counters.recount_follows([user_id] + author_ids)
+    versions.bump_timeline(user_id)
+
+
+def state(user, usernames, ids):
+    """Раскладывает запрошенные имена по тому, подписан ли на них
+    пользователь сейчас."""
+    following = set(Follow.objects.filter(
+        user=user, author_id__in=list(ids.values())
+    ).values_list('author__username', flat=True))
+    return {
+        'following': sorted(following),
+        'not_following': sorted(set(ids) - following),
+        'missing': sorted(set(usernames) - set(ids)),
+    }
+
+
+def update(user, follow=(), unfollow=()):
+    """Подписывает пользователя на авторов follow и отписывает от
+    unfollow; возвращает итоговое состояние по всем этим именам."""
+    ids = resolve(list(follow) + list(unfollow))
+    add((user.pk, ids[name]) for name in follow if name in ids)
+    remove(user.pk, [ids[name] for name in unfollow if name in ids])
+    return state(user, list(follow) + list(unfollow), ids)
@@ -1,4 +1,8 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image
+
+from . import images
 from .models import Post, Comment
 
 
@@ -13,6 +17,19 @@ class PostForm(forms.ModelForm):
             raise forms.ValidationError('Поле не дожно быть пeeустым')
         return text
 
+    def clean_image(self):
+        """Новая загрузка перекодируется (см. posts.images) уже здесь,
+        чтобы битая картинка стала ошибкой формы."""
+        image = self.cleaned_data.get('image')
+        if not isinstance(image, UploadedFile):
+            return image
+        try:
+            return images.ingest(image)
+        except (OSError, ValueError, Image.DecompressionBombError):
+            raise forms.ValidationError(
+                'Не удалось обработать картинку.', code='invalid_image'
+            )
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
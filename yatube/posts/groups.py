@@ -0,0 +1,70 @@
+"""Реестр групп в памяти процесса.
+
+Групп немного, и меняются они редко, поэтому все они читаются одним
+запросом и держатся в процессе: страница группы и ленты берут группу
+по slug или id без обращения к базе. Сохранение и удаление группы
+меняют версию реестра, и каждый процесс при следующем чтении
+перечитывает его. Если версии нет в кеше, первое чтение создаёт её,
+как в posts.authors. Загрузки в обход моделей (yatube_import,
+benchmark) меняют версию сами.
+
+Число записей (Group.posts_count) меняется с каждым постом, поэтому в
+реестр оно не входит: каталог /groups/ читает группы вместе с ним
+одним запросом.
+"""
+import threading
+
+from core.routers import PRIMARY
+
+from . import versions
+
+_registry = None
+_lock = threading.Lock()
+
+
+class Registry:
+    def __init__(self, version, groups):
+        self.version = version
+        self.groups = sorted(groups, key=lambda group: (group.title, group.pk))
+        self.by_slug = {group.slug: group for group in self.groups}
+        self.by_id = {group.pk: group for group in self.groups}
+
+
+def registry():
+    """Текущий снимок реестра групп."""
+    global _registry
+    from .models import Group
+
+    version = versions.groups_version()
+    snapshot = _registry
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+    # Снимок проверяется версией из кеша основной базы: читать его
+    # с отстающей реплики нельзя.
+    snapshot = Registry(
+        version, Group.objects.using(PRIMARY).defer('posts_count')
+    )
+    with _lock:
+        _registry = snapshot
+    return snapshot
+
+
+def by_slug(slug):
+    return registry().by_slug.get(slug)
+
+
+def by_id(pk):
+    return registry().by_id.get(pk)
+
+
+def attach(objects):
+    """Проставляет объектам с group_id группу из реестра вместо
+    JOIN с таблицей групп."""
+    objects = [obj for obj in objects if 'group_id' in obj.__dict__]
+    if not objects:
+        return
+    groups = registry().by_id
+    for obj in objects:
+        group = groups.get(obj.group_id)
+        if group is not None:
+            obj._meta.get_field('group').set_cached_value(obj, group)
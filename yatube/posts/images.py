@@ -0,0 +1,119 @@
+"""Приём картинок постов.
+
+Загрузка декодируется один раз: поворот по EXIF применяется к
+пикселям, стороны ограничиваются IMAGE_MAX_SIDE, метаданные (EXIF с
+координатами, профили, комментарии) отбрасываются, картинка
+перекодируется в WebP, а если Pillow собран без него — в JPEG или PNG
+для прозрачных. Одинаковые картинки после перекодирования совпадают
+байт в байт, и хранилище (core.storage) держит их одним файлом; хеш
+содержимого и так входит в имя файла.
+
+Перекодирование вызывает сигнал pre_save поста, поэтому через него
+проходят загрузки и из формы, и из админки.
+"""
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, ImageSequence, features
+
+MAX_SIDE: int = 2048
+QUALITY: int = 85
+EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif'}
+# Из info кадра в файл попадает только прозрачность палитры.
+KEPT_INFO = ('transparency',)
+
+
+class IngestedImage(ContentFile):
+    """Перекодированная картинка; хранилище даст ей имя по хешу."""
+
+    def __init__(self, content, image_format):
+        super().__init__(content, name=f'image.{EXTENSIONS[image_format]}')
+
+
+def _strip_info(image):
+    # Кодировщики берут EXIF, ICC и комментарии из info.
+    image.info = {
+        key: value for key, value in image.info.items()
+        if key in KEPT_INFO
+    }
+    return image
+
+
+def _has_alpha(image):
+    return image.mode in ('RGBA', 'LA', 'PA') or (
+        image.mode == 'P' and 'transparency' in image.info
+    )
+
+
+def output_format(image):
+    """WebP, если Pillow его умеет, иначе JPEG или PNG с прозрачностью."""
+    preferred = getattr(settings, 'IMAGE_FORMAT', None)
+    if preferred:
+        return preferred
+    if features.check('webp'):
+        return 'WEBP'
+    return 'PNG' if _has_alpha(image) else 'JPEG'
+
+
+def _encode(image, image_format, quality):
+    buffer = BytesIO()
+    if image_format == 'JPEG':
+        image.convert('RGB').save(
+            buffer, 'JPEG', quality=quality, optimize=True, progressive=True
+        )
+    elif image_format == 'PNG':
+        if image.mode not in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA' if _has_alpha(image) else 'RGB')
+        image.save(buffer, 'PNG', optimize=True)
+    else:
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if _has_alpha(image) else 'RGB')
+        image.save(buffer, image_format, quality=quality, method=4)
+    return buffer.getvalue()
+
+
+def _encode_animated(image, max_side):
+    """Пересобирает анимацию в том же формате из уменьшенных кадров без
+    метаданных."""
+    frames, durations = [], []
+    for frame in ImageSequence.Iterator(image):
+        durations.append(frame.info.get('duration', 0))
+        frame = frame.copy()
+        frame.thumbnail((max_side, max_side), Image.LANCZOS)
+        frames.append(_strip_info(frame))
+    buffer = BytesIO()
+    frames[0].save(
+        buffer, image.format, save_all=True, append_images=frames[1:],
+        duration=durations, loop=image.info.get('loop', 0),
+    )
+    return buffer.getvalue()
+
+
+def ingest(upload):
+    """Перекодирует загруженную картинку и возвращает IngestedImage.
+
+    Анимированные картинки не меняют формат, иначе остался бы только
+    первый кадр: каждый их кадр уменьшается и пересобирается без
+    метаданных.
+    """
+    max_side = getattr(settings, 'IMAGE_MAX_SIDE', MAX_SIDE)
+    quality = getattr(settings, 'IMAGE_QUALITY', QUALITY)
+    upload.seek(0)
+    with Image.open(upload) as image:
+        if getattr(image, 'is_animated', False):
+            image_format = image.format
+            if image_format not in EXTENSIONS:
+                raise ValueError(
+                    f'Неподдерживаемый формат картинки: {image_format}'
+                )
+            content = _encode_animated(image, max_side)
+        else:
+            # JPEG умеет декодировать сразу в уменьшенном масштабе.
+            image.draft('RGB', (max_side, max_side))
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((max_side, max_side), Image.LANCZOS)
+            image = _strip_info(image)
+            image_format = output_format(image)
+            content = _encode(image, image_format, quality)
+    return IngestedImage(content, image_format)
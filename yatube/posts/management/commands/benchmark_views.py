@@ -0,0 +1,46 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = ('Наполняет базу тестовыми данными и меряет задержку, SQL '
+            'и рендер страниц posts. Отчёт выводится в JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed', choices=sorted(benchmark.SCALES),
+            help='Перед замером досыпать данные указанного масштаба.',
+        )
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument(
+            '--warm', action='store_true',
+            help='Не очищать кеш перед запросами.',
+        )
+        parser.add_argument(
+            '--view', action='append', dest='views',
+            help='Мерить только эту страницу (можно повторять).',
+        )
+        parser.add_argument('--output', help='Файл для отчёта JSON.')
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            benchmark.seed(
+                benchmark.SCALES[options['seed']],
+                log=lambda message: self.stderr.write(message),
+            )
+        try:
+            report = benchmark.run(
+                requests=options['requests'],
+                warm=options['warm'],
+                views=options['views'],
+            )
+        except ValueError as error:
+            raise CommandError(error)
+        text = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                stream.write(text)
+        self.stdout.write(text)
@@ -0,0 +1,139 @@
+import re
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from posts.models import Comment, Follow, Group, Post, TimelineEntry
+from posts.timeline import timeline_posts
+from posts.utils import NUMBER_OF_POSTS, KeysetPaginator, encode_cursor
+
+User = get_user_model()
+BATCH_SIZE: int = 10000
+POSTS_PER_AUTHOR: int = 1000
+GROUPS: int = 20
+# Уникальное ограничение подписки SQLite хранит в автоиндексе таблицы.
+FOLLOW_INDEX = r'unique_follow|sqlite_autoindex_posts_follow_\d+'
+
+
+def uses_index(plan, index):
+    """План читает таблицу по индексу с этим именем (или регуляркой),
+    а не просто упоминает таблицу."""
+    return re.search(
+        rf'\busing (?:covering )?(?:index )?(?:{index})\b', plan, re.I
+    ) is not None
+
+
+def timeline_index():
+    return next(
+        index.name for index in TimelineEntry._meta.indexes
+        if index.fields == ['user', '-pub_date']
+    )
+
+
+class Command(BaseCommand):
+    help = ('Показывает планы запросов лент и проверяет, '
+            'что они идут по составным индексам.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Сколько постов досыпать в базу перед проверкой.',
+        )
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            self.seed(options['seed'])
+        post = Post.objects.order_by('-pk').first()
+        follow = Follow.objects.order_by('-pk').first()
+        if post is None or follow is None:
+            raise CommandError('База пуста: запустите команду с --seed.')
+        group_id = (
+            Post.objects.filter(group__isnull=False)
+            .values_list('group_id', flat=True).first()
+        )
+        feeds = (
+            ('index', Post.objects.for_feed(), 'post_pub_date_idx'),
+            ('group_list', Post.objects.for_feed().filter(group_id=group_id),
+             'post_group_pub_date_idx'),
+            ('profile', Post.objects.for_feed().filter(
+                author_id=post.author_id), 'post_author_pub_date_idx'),
+            ('follow_index', timeline_posts(follow.user), timeline_index()),
+            ('comments', Comment.objects.filter(post_id=post.pk).for_post()
+             .order_by('-created', '-pk'), 'comment_post_created_id_idx'),
+            ('follow', Follow.objects.filter(
+                user_id=follow.user_id, author_id=follow.author_id),
+             FOLLOW_INDEX),
+        )
+        missing = []
+        for name, queryset, index in feeds:
+            page = queryset[:NUMBER_OF_POSTS]
+            plan = page.explain()
+            started = time.perf_counter()
+            list(page)
+            elapsed = (time.perf_counter() - started) * 1000
+            self.stdout.write(f'{name}: {elapsed:.2f} ms\n{plan}\n')
+            if not uses_index(plan, index):
+                missing.append(f'{name} ({index})')
+        self.deep_page()
+        if missing:
+            raise CommandError(
+                'Запросы не используют индексы: ' + ', '.join(missing)
+            )
+        self.stdout.write(self.style.SUCCESS('Все ленты идут по индексам.'))
+
+    def deep_page(self):
+        """Сравнивает время первой и глубокой страницы ленты."""
+        queryset = Post.objects.for_feed()
+        middle = queryset.order_by('-pub_date', '-pk')[
+            queryset.count() // 2]
+        paginator = KeysetPaginator(queryset, NUMBER_OF_POSTS)
+        for name, cursor in (('first', None), ('deep', encode_cursor(middle))):
+            started = time.perf_counter()
+            paginator.get_page(after=cursor)
+            elapsed = (time.perf_counter() - started) * 1000
+            self.stdout.write(f'keyset {name} page: {elapsed:.2f} ms')
+
+    def seed(self, total):
+        start = Post.objects.order_by('-pk').values_list('pk', flat=True)
+        start = start.first() or 0
+        groups = [
+            Group.objects.get_or_create(
+                slug=f'bench-{i}',
+                defaults={'title': f'bench {i}', 'description': 'bench'},
+            )[0]
+            for i in range(GROUPS)
+        ]
+        authors = [
+            User.objects.create_user(username=f'bench-{start}-{i}')
+            for i in range(max(total // POSTS_PER_AUTHOR, 2))
+        ]
+        Follow.objects.bulk_create(
+            (
+                Follow(user=reader, author=author)
+                for reader in authors[:2] for author in authors[2:]
+            ),
+            ignore_conflicts=True,
+        )
+        for offset in range(0, total, BATCH_SIZE):
+            Post.objects.bulk_create(
+                Post(
+                    text=f'bench post {offset + i}',
+                    author=authors[(offset + i) % len(authors)],
+                    group=groups[(offset + i) % GROUPS],
+                )
+                for i in range(min(BATCH_SIZE, total - offset))
+            )
+            self.stdout.write(
+                f'seeded {min(offset + BATCH_SIZE, total)} posts')
+        # pub_date проставляется auto_now_add: разносим даты постов,
+        # иначе у всей выборки одинаковый ключ сортировки.
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute(
+                    "UPDATE posts_post SET pub_date = "
+                    "datetime(pub_date, '-' || id || ' seconds') "
+                    "WHERE id > %s", [start],
+                )
+            cursor.execute('ANALYZE')
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts.search import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Заново строит поисковый индекс по постам и комментариям.'
+
+    def handle(self, *args, **options):
+        total = rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано постов: {total}'
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import recount
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов, комментариев и подписок.'
+
+    def handle(self, *args, **options):
+        stale_users, stale_posts = recount()
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено пользователей: {stale_users}, '
+            f'постов: {stale_posts}'
+        ))
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import rollups
+
+
+class Command(BaseCommand):
+    help = ('Сворачивает новые комментарии по часам и пересчитывает '
+            'рейтинги лент «Популярное» и «В тренде». Запускать по '
+            'расписанию, например раз в пять минут.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        comments, scored = rollups.run()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Новых комментариев: {comments}, постов с рейтингом: '
+            f'{scored} за {elapsed:.2f} с'
+        ))
@@ -0,0 +1,31 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.ndjson import export, open_stream
+
+
+class Command(BaseCommand):
+    help = ('Потоково выгружает пользователей, группы, посты, '
+            'комментарии и подписки в NDJSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Файл выгрузки (.gz сжимается), по умолчанию stdout.',
+        )
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options['path'] == '-':
+            total = export(sys.stdout, options['batch_size'])
+        else:
+            with open_stream(options['path'], 'w') as stream:
+                total = export(stream, options['batch_size'])
+        elapsed = time.perf_counter() - started
+        self.stderr.write(
+            f'Выгружено записей: {total} за {elapsed:.1f} с '
+            f'({total / max(elapsed, 1e-6):.0f} rows/s)'
+        )
@@ -0,0 +1,47 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.storage import recount_files
+from posts import counters, search, timeline, versions
+from posts.ndjson import Importer, iter_records, open_stream
+
+
+class Command(BaseCommand):
+    help = ('Потоково загружает NDJSON или dump.json пачками '
+            'через bulk_create.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='Файл NDJSON или JSON-массив dumpdata, - для stdin.'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        importer = Importer(options['batch_size'])
+        started = time.perf_counter()
+        with transaction.atomic():
+            if options['path'] == '-':
+                importer.load(iter_records(sys.stdin))
+            else:
+                with open_stream(options['path'], 'r') as stream:
+                    importer.load(iter_records(stream))
+            # bulk_create не шлёт сигналы: чиним производные данные.
+            counters.recount()
+            recount_files()
+            timeline.rebuild()
+            search.rebuild()
+        versions.bump_feed()
+        versions.bump_groups()
+        elapsed = time.perf_counter() - started
+        total = sum(importer.counts.values())
+        for label, count in importer.counts.items():
+            self.stdout.write(f'{label}: {count}')
+        self.stdout.write(f'Пропущено записей других моделей: '
+                          f'{importer.skipped}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено записей: {total} за {elapsed:.1f} с '
+            f'({total / max(elapsed, 1e-6):.0f} rows/s)'
+        ))
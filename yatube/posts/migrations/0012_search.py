@@ -0,0 +1,50 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+FTS = (
+    'CREATE VIRTUAL TABLE IF NOT EXISTS posts_search '
+    "USING fts5(text, comments, tokenize='unicode61')"
+)
+
+
+def create_index(apps, schema_editor):
+    # Заполняет индекс 0018_search_comments, когда его схема
+    # уже окончательная.
+    from posts import search
+    if search.fts5_supported(schema_editor.connection):
+        schema_editor.execute(FTS)
+
+
+def drop_index(apps, schema_editor):
+    schema_editor.execute('DROP TABLE IF EXISTS posts_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('weight', models.FloatField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.Post')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='searchterm',
+            index=models.Index(fields=['term', '-weight'], name='posts_searc_term_d795f0_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='searchterm',
+            unique_together={('term', 'post')},
+        ),
+        migrations.RunPython(create_index, drop_index),
+    ]
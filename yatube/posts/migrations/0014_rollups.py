@@ -0,0 +1,59 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_comment_keyset_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostActivity',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('comments', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PostScore',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score', serialize=False, to='posts.Post')),
+                ('popular', models.FloatField(default=0)),
+                ('trending', models.FloatField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RollupState',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('last_id', models.PositiveIntegerField(default=0)),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='postscore',
+            index=models.Index(fields=['-popular'], name='posts_posts_popular_0d3c24_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='postscore',
+            index=models.Index(fields=['-trending'], name='posts_posts_trendin_a4eb5f_idx'),
+        ),
+        migrations.AddField(
+            model_name='postactivity',
+            name='post',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity', to='posts.Post'),
+        ),
+        migrations.AddIndex(
+            model_name='postactivity',
+            index=models.Index(fields=['hour'], name='posts_posta_hour_eb5ce0_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='postactivity',
+            unique_together={('post', 'hour')},
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:40
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_counts(apps, schema_editor):
+    Group = apps.get_model('posts', 'Group')
+    Post = apps.get_model('posts', 'Post')
+    counts = Post.objects.filter(group__isnull=False).order_by().values_list(
+        'group'
+    ).annotate(Count('pk'))
+    for group_id, total in counts:
+        Group.objects.filter(pk=group_id).update(posts_count=total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='posts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='записей'),
+        ),
+        migrations.RunPython(fill_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Схема FTS до переноса комментариев в отдельную таблицу.
+OLD_FTS = (
+    'CREATE VIRTUAL TABLE IF NOT EXISTS posts_search '
+    "USING fts5(text, comments, tokenize='unicode61')"
+)
+
+
+def split_comments(apps, schema_editor):
+    from posts import search
+    connection = schema_editor.connection
+    if search.fts5_supported(connection):
+        schema_editor.execute(search.DROP_FTS)
+        schema_editor.execute(search.CREATE_FTS)
+        schema_editor.execute(search.CREATE_COMMENTS_FTS)
+    search.rebuild(
+        using=connection.alias,
+        post_model=apps.get_model('posts', 'Post'),
+        comment_model=apps.get_model('posts', 'Comment'),
+        term_model=apps.get_model('posts', 'SearchTerm'),
+    )
+
+
+def join_comments(apps, schema_editor):
+    """Возвращает прежнюю схему индекса пустой: заполнить её должен
+    rebuild прежней версии кода."""
+    from posts import search
+    apps.get_model('posts', 'SearchTerm').objects.all().delete()
+    if search.fts5_supported(schema_editor.connection):
+        schema_editor.execute(search.DROP_COMMENTS_FTS)
+        schema_editor.execute(search.DROP_FTS)
+        schema_editor.execute(OLD_FTS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_image_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchterm',
+            name='comment',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.Comment'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='searchterm',
+            unique_together=set(),
+        ),
+        migrations.RunPython(split_comments, join_comments),
+    ]
@@ -2,6 +2,10 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 
+from core.storage import ContentAddressedStorage
+
+from . import authors, groups
+
 User = get_user_model()
 LIMIT_TEXT: int = 15
 
@@ -10,11 +14,70 @@ class Group(models.Model):
     title = models.CharField(max_length=200, verbose_name='титл')
     slug = models.SlugField(unique=True, verbose_name='адрес')
     description = models.TextField(verbose_name='описание')
+    posts_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='записей'
+    )
 
     def __str__(self):
         return self.title[:LIMIT_TEXT]
 
 
+class AttachingQuerySet(models.QuerySet):
+    """QuerySet, который после выборки дополняет объекты данными
+    из памяти процесса: карточками авторов (posts.authors) и группами
+    из реестра (posts.groups)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._attachers = ()
+
+    def _attach(self, attacher):
+        clone = self._chain()
+        if attacher not in clone._attachers:
+            clone._attachers += (attacher,)
+        return clone
+
+    def with_author_cards(self):
+        return self._attach(authors.attach)
+
+    def with_groups(self):
+        return self._attach(groups.attach)
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._attachers = self._attachers
+        return clone
+
+    def _fetch_all(self):
+        fetched = self._result_cache is None
+        super()._fetch_all()
+        if fetched and self._attachers:
+            objects = [
+                obj for obj in self._result_cache
+                if isinstance(obj, models.Model)
+            ]
+            for attacher in self._attachers:
+                attacher(objects)
+
+
+class PostQuerySet(AttachingQuerySet):
+    def for_feed(self):
+        """Посты для лент: авторы — карточками, группы — из реестра.
+
+        Авторы не присоединяются через INNER JOIN: иначе SQLite на
+        больших таблицах начинает план с auth_user и сортирует все посты
+        вместо прохода по индексу pub_date.
+        """
+        return self.for_profile().with_groups()
+
+    def for_profile(self):
+        """Посты ленты без групп: профиль их не показывает, и реестр
+        групп ему читать незачем."""
+        return self.with_author_cards().only(
+            'id', 'text', 'pub_date', 'image', 'author_id', 'group_id',
+        )
+
+
 class Post(models.Model):
     text = models.TextField(verbose_name='текст',
                             help_text='Здесь должен быть текст')
@@ -34,14 +97,42 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='комментариев'
+    )
+
+    objects = PostQuerySet.as_manager()
 
     def __str__(self):
         return self.text[:LIMIT_TEXT]
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'], name='post_pub_date_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx',
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx',
+            ),
+        ]
+
+
+class CommentQuerySet(AttachingQuerySet):
+    def for_post(self):
+        """Комментарии по индексу (post, -created, -id) с карточками
+        авторов вместо строк auth_user."""
+        return self.with_author_cards().only(
+            'id', 'post_id', 'text', 'created', 'author_id',
+        )
 
 
 class Comment (models.Model):
@@ -57,8 +148,16 @@ class Comment (models.Model):
     text = models.TextField(null=True, blank=True)
     created = models.DateTimeField(auto_now_add=True,)
 
+    objects = CommentQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='comment_post_created_id_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.text
@@ -75,3 +174,134 @@ class Follow (models.Model):
         on_delete=models.CASCADE,
         related_name='following',
     )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='unique_follow'
+            ),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """Пост в материализованной ленте подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-pub_date']
+        unique_together = ('user', 'post')
+        indexes = [
+            models.Index(fields=['user', '-pub_date']),
+            models.Index(fields=['user', 'author']),
+        ]
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, которые поддерживаются сигналами."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.user_id}: {self.posts_count}'
+
+
+class SearchTerm(models.Model):
+    """Обратный индекс поиска для баз без FTS5: основа слова → пост.
+
+    Строки комментария помечены его id, чтобы комментарий можно было
+    переиндексировать отдельно от поста.
+    """
+    term = models.CharField(max_length=64)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    comment = models.ForeignKey(
+        Comment,
+        null=True,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    weight = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['term', '-weight']),
+        ]
+
+    def __str__(self):
+        return f'{self.term}: {self.post_id}'
+
+
+class RollupState(models.Model):
+    """Отметка свёртки: id последней учтённой записи источника."""
+    name = models.CharField(max_length=50, primary_key=True)
+    last_id = models.PositiveIntegerField(default=0)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.name}: {self.last_id}'
+
+
+class PostActivity(models.Model):
+    """Комментарии к посту за один час — свёртка таблицы Comment."""
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='activity',
+    )
+    hour = models.DateTimeField()
+    comments = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('post', 'hour')
+        indexes = [
+            models.Index(fields=['hour']),
+        ]
+
+    def __str__(self):
+        return f'{self.post_id} {self.hour}: {self.comments}'
+
+
+class PostScore(models.Model):
+    """Рейтинг поста для лент «Популярное» и «В тренде»."""
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='score',
+    )
+    popular = models.FloatField(default=0)
+    trending = models.FloatField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-popular']),
+            models.Index(fields=['-trending']),
+        ]
+
+    def __str__(self):
+        return f'{self.post_id}: {self.popular}/{self.trending}'
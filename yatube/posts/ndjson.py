@@ -0,0 +1,159 @@
+"""Потоковые выгрузка и загрузка данных в формате dumpdata.
+
+Каждая запись — словарь {"model", "pk", "fields"}, как в dump.json.
+Выгрузка пишет по записи в строке (NDJSON), загрузка понимает и NDJSON,
+и обычный JSON-массив dumpdata, не читая файл в память целиком.
+"""
+import gzip
+import json
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.serializers.python import Deserializer
+from django.core.serializers.python import Serializer as PythonSerializer
+
+# Порядок важен: каждая модель ссылается только на модели выше неё.
+MODELS = (
+    'auth.user',
+    'posts.group',
+    'posts.post',
+    'posts.comment',
+    'posts.follow',
+)
+CHUNK_SIZE: int = 64 * 1024
+
+
+def open_stream(path, mode):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+class LineSerializer(PythonSerializer):
+    """Пишет каждый объект в поток сразу, не копя список."""
+
+    def end_object(self, obj):
+        super().end_object(obj)
+        self.stream.write(json.dumps(
+            self.objects.pop(), cls=DjangoJSONEncoder, ensure_ascii=False
+        ))
+        self.stream.write('\n')
+
+    def getvalue(self):
+        return None
+
+
+def iter_records(stream):
+    """Читает записи по одной из NDJSON или JSON-массива."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    eof = False
+    while True:
+        buffer = buffer.lstrip(' \t\r\n,[')
+        if buffer.startswith(']'):
+            return
+        if buffer:
+            try:
+                record, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                yield record
+                buffer = buffer[end:]
+                continue
+        elif eof:
+            return
+        chunk = stream.read(CHUNK_SIZE)
+        eof = not chunk
+        buffer += chunk
+
+
+@contextmanager
+def raw_dates(model):
+    """Отключает auto_now_add, чтобы bulk_create сохранил даты из дампа."""
+    fields = [
+        field for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now_add', False)
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def insert_batch(model, deserialized):
+    """Вставляет пачку объектов одним bulk_create вместе с их M2M."""
+    with raw_dates(model):
+        model._default_manager.bulk_create(
+            [item.object for item in deserialized]
+        )
+    for item in deserialized:
+        for name, values in (item.m2m_data or {}).items():
+            if not values:
+                continue
+            field = model._meta.get_field(name)
+            through = field.remote_field.through
+            source = field.m2m_field_name() + '_id'
+            target = field.m2m_reverse_field_name() + '_id'
+            through._default_manager.bulk_create(
+                through(**{source: item.object.pk, target: value})
+                for value in values
+            )
+
+
+def export(stream, batch_size):
+    """Пишет все модели MODELS в поток, возвращает число записей."""
+    total = 0
+    for label in MODELS:
+        model = apps.get_model(label)
+        queryset = model._default_manager.order_by('pk')
+        LineSerializer().serialize(
+            queryset.iterator(chunk_size=batch_size), stream=stream
+        )
+        total += queryset.count()
+    return total
+
+
+class Importer:
+    """Копит объекты по моделям и вставляет их пачками.
+
+    Пачка модели вставляется только после пачек моделей, на которые
+    она ссылается, поэтому порядок MODELS соблюдается при любом
+    порядке записей во входном файле.
+    """
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.buffers = {label: [] for label in MODELS}
+        self.counts = dict.fromkeys(MODELS, 0)
+        self.skipped = 0
+
+    def known(self, records):
+        for record in records:
+            if record.get('model', '').lower() in self.buffers:
+                yield record
+            else:
+                self.skipped += 1
+
+    def load(self, records):
+        for item in Deserializer(self.known(records), ignorenonexistent=True):
+            label = item.object._meta.label_lower
+            self.buffers[label].append(item)
+            if len(self.buffers[label]) >= self.batch_size:
+                self.flush(upto=label)
+        self.flush()
+
+    def flush(self, upto=None):
+        for label in MODELS:
+            batch = self.buffers[label]
+            if batch:
+                insert_batch(apps.get_model(label), batch)
+                self.counts[label] += len(batch)
+                self.buffers[label] = []
+            if label == upto:
+                return
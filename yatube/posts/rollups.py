@@ -0,0 +1,118 @@
+"""Свёртки для лент «Популярное» и «В тренде».
+
+Команда rollup_scores по расписанию раскладывает новые комментарии по
+часовым корзинам PostActivity и пересчитывает PostScore. Страницы только
+сортируют по готовому рейтингу и не считают комментарии при запросе.
+"""
+import math
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Sum
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from .models import Comment, Post, PostActivity, PostScore, RollupState
+
+POPULAR_WINDOW = timedelta(days=7)
+TRENDING_WINDOW = timedelta(hours=24)
+# Вклад подписчиков автора растёт логарифмически: иначе «звёзды»
+# занимали бы ленты одним числом подписчиков, без обсуждения.
+FOLLOWER_WEIGHT: float = 1.0
+COMMENTS_MARK = 'comments'
+
+
+def roll_up_comments():
+    """Добавляет в корзины комментарии, появившиеся после прошлого
+    запуска, и возвращает их число.
+
+    Граница берётся до чтения: комментарии, добавленные во время
+    свёртки, достанутся следующему запуску, а не потеряются.
+    """
+    state, _ = RollupState.objects.select_for_update().get_or_create(
+        name=COMMENTS_MARK
+    )
+    top = Comment.objects.aggregate(top=Max('pk'))['top'] or 0
+    if top <= state.last_id:
+        return 0
+    rows = Comment.objects.filter(
+        pk__gt=state.last_id, pk__lte=top, post__isnull=False
+    ).order_by().annotate(hour=TruncHour('created')).values(
+        'post_id', 'hour'
+    ).annotate(count=Count('pk'))
+    buckets = {(row['post_id'], row['hour']): row['count'] for row in rows}
+    if buckets:
+        existing = set(PostActivity.objects.filter(
+            hour__gte=min(hour for _, hour in buckets)
+        ).values_list('post_id', 'hour'))
+        for (post_id, hour), count in buckets.items():
+            if (post_id, hour) in existing:
+                PostActivity.objects.filter(post_id=post_id, hour=hour).update(
+                    comments=F('comments') + count
+                )
+        PostActivity.objects.bulk_create(
+            PostActivity(post_id=post_id, hour=hour, comments=count)
+            for (post_id, hour), count in buckets.items()
+            if (post_id, hour) not in existing
+        )
+    state.last_id = top
+    state.save()
+    return sum(buckets.values())
+
+
+def _followers_bonus(followers):
+    return FOLLOWER_WEIGHT * math.log2(1 + (followers or 0))
+
+
+def refresh_scores(now=None):
+    """Пересчитывает рейтинги постов по корзинам в скользящих окнах.
+
+    Окна сдвигаются и без новых комментариев, поэтому таблица рейтингов
+    каждый раз собирается заново. В неё попадают только посты недели
+    и посты, которые обсуждали за неделю.
+    """
+    now = now or timezone.now()
+    popular_since = now - POPULAR_WINDOW
+    trending_since = now - TRENDING_WINDOW
+    PostActivity.objects.filter(hour__lt=popular_since).delete()
+    posts = {
+        pk: (pub_date, followers)
+        for pk, pub_date, followers in Post.objects.filter(
+            pub_date__gte=popular_since
+        ).values_list('pk', 'pub_date', 'author__stats__followers_count')
+    }
+    popular, trending = {}, {}
+    activity = PostActivity.objects.values(
+        'post_id', 'post__pub_date', 'post__author__stats__followers_count'
+    ).order_by()
+    for row in activity.annotate(total=Sum('comments')):
+        posts[row['post_id']] = (
+            row['post__pub_date'],
+            row['post__author__stats__followers_count'],
+        )
+        popular[row['post_id']] = row['total']
+    for row in activity.filter(hour__gte=trending_since).annotate(
+        total=Sum('comments')
+    ):
+        trending[row['post_id']] = row['total']
+    scores = []
+    for pk, (pub_date, followers) in posts.items():
+        bonus = _followers_bonus(followers)
+        is_trending = pk in trending or pub_date >= trending_since
+        scores.append(PostScore(
+            post_id=pk,
+            popular=popular.get(pk, 0) + bonus,
+            trending=trending.get(pk, 0) + bonus if is_trending else 0,
+        ))
+    with transaction.atomic():
+        PostScore.objects.all().delete()
+        PostScore.objects.bulk_create(scores)
+    return len(scores)
+
+
+def run(now=None):
+    """Свёртка новых комментариев и пересчёт рейтингов; возвращает
+    число новых комментариев и постов с рейтингом."""
+    with transaction.atomic():
+        comments = roll_up_comments()
+    return comments, refresh_scores(now)
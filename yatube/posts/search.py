@@ -0,0 +1,337 @@
+"""Полнотекстовый поиск по постам и комментариям к ним.
+
+Тексты индексируются основами слов (см. stemmer), поэтому запрос
+«постов» находит «пост» и «постами». На SQLite со сборкой FTS5 индекс —
+виртуальные таблицы posts_search (посты) и posts_search_comments
+(комментарии) с ранжированием bm25, на остальных базах — обратный
+индекс в таблице SearchTerm. Комментарий индексируется отдельной
+строкой по своему id, так что новый комментарий не заставляет заново
+читать и разбирать все остальные комментарии поста. Индекс обновляют
+сигналы, а после массовой загрузки — rebuild().
+"""
+import math
+import re
+from collections import Counter
+
+from django.db import connections, models, router
+
+from .models import Comment, Post, SearchTerm
+from .stemmer import stem
+
+FTS_TABLE = 'posts_search'
+COMMENTS_FTS_TABLE = 'posts_search_comments'
+CREATE_FTS = (
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} '
+    f"USING fts5(text, tokenize='unicode61')"
+)
+CREATE_COMMENTS_FTS = (
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS {COMMENTS_FTS_TABLE} '
+    f"USING fts5(text, post_id UNINDEXED, tokenize='unicode61')"
+)
+DROP_FTS = f'DROP TABLE IF EXISTS {FTS_TABLE}'
+DROP_COMMENTS_FTS = f'DROP TABLE IF EXISTS {COMMENTS_FTS_TABLE}'
+# Совпадение в тексте поста весит вдвое больше совпадения в комментариях.
+TEXT_WEIGHT: float = 2.0
+COMMENTS_WEIGHT: float = 1.0
+MAX_TERMS: int = 8
+BATCH_SIZE: int = 500
+
+WORD_RE = re.compile(r'\w+')
+_fts5 = {}
+
+
+def terms(text):
+    """Основы слов текста в порядке появления."""
+    return [stem(word)[:64] for word in WORD_RE.findall(text.lower())]
+
+
+def query_terms(query):
+    """Уникальные основы слов запроса, не больше MAX_TERMS."""
+    return list(dict.fromkeys(terms(query)))[:MAX_TERMS]
+
+
+def fts5_supported(connection):
+    if connection.alias not in _fts5:
+        supported = connection.vendor == 'sqlite'
+        if supported:
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA compile_options')
+                supported = ('ENABLE_FTS5',) in cursor.fetchall()
+        _fts5[connection.alias] = supported
+    return _fts5[connection.alias]
+
+
+def documents(post_ids, post_model=Post):
+    """Основы слов текстов постов: {id: [основы]}."""
+    return {
+        pk: terms(text)
+        for pk, text in post_model.objects.filter(
+            pk__in=post_ids
+        ).values_list('pk', 'text')
+    }
+
+
+def comment_documents(comments):
+    """Основы слов комментариев: {id: (id поста, [основы])}."""
+    return {
+        comment.pk: (comment.post_id, terms(comment.text or ''))
+        for comment in comments if comment.post_id
+    }
+
+
+class FtsIndex:
+    """Индекс в виртуальных таблицах FTS5: rowid строки постов — id
+    поста, строки комментариев — id комментария."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def store(self, docs):
+        self._replace(FTS_TABLE, ('rowid', 'text'), docs, [
+            (pk, ' '.join(text)) for pk, text in docs.items()
+        ])
+
+    def store_comments(self, docs):
+        self._replace(COMMENTS_FTS_TABLE, ('rowid', 'text', 'post_id'), docs, [
+            (pk, ' '.join(text), post_id)
+            for pk, (post_id, text) in docs.items()
+        ])
+
+    def _replace(self, table, columns, ids, rows):
+        with self.connection.cursor() as cursor:
+            self._delete(cursor, table, ids)
+            cursor.executemany(
+                f'INSERT INTO {table}({", ".join(columns)}) '
+                f'VALUES ({", ".join(["%s"] * len(columns))})',
+                rows,
+            )
+
+    def remove(self, post_ids):
+        """Убирает посты; их комментарии убирает сигнал удаления
+        комментария."""
+        with self.connection.cursor() as cursor:
+            self._delete(cursor, FTS_TABLE, post_ids)
+
+    def remove_comments(self, comment_ids):
+        with self.connection.cursor() as cursor:
+            self._delete(cursor, COMMENTS_FTS_TABLE, comment_ids)
+
+    def _delete(self, cursor, table, ids):
+        cursor.executemany(
+            f'DELETE FROM {table} WHERE rowid = %s', [(pk,) for pk in ids]
+        )
+
+    def clear(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(f'DELETE FROM {COMMENTS_FTS_TABLE}')
+
+    @staticmethod
+    def _hits(words):
+        """Совпадения по словам: (id поста, номер слова, вес bm25).
+
+        Слово может найтись в тексте поста или в любом из его
+        комментариев, поэтому каждое ищется в обеих таблицах, а пост
+        подходит, если нашлись все слова.
+        """
+        selects, params = [], []
+        for number, word in enumerate(words):
+            selects.append(
+                f'SELECT rowid AS post_id, {number} AS word, '
+                f'bm25({FTS_TABLE}) * %s AS score FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s'
+            )
+            selects.append(
+                f'SELECT post_id, {number}, '
+                f'bm25({COMMENTS_FTS_TABLE}) * %s '
+                f'FROM {COMMENTS_FTS_TABLE} '
+                f'WHERE {COMMENTS_FTS_TABLE} MATCH %s'
+            )
+            params.extend(
+                [TEXT_WEIGHT, f'"{word}"', COMMENTS_WEIGHT, f'"{word}"']
+            )
+        return (
+            'SELECT post_id, SUM(score) AS score FROM ('
+            + ' UNION ALL '.join(selects)
+            + ') GROUP BY post_id HAVING COUNT(DISTINCT word) = %s',
+            params + [len(words)],
+        )
+
+    def count(self, words):
+        sql, params = self._hits(words)
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM ({sql})', params)
+            return cursor.fetchone()[0]
+
+    def ids(self, words, offset, limit):
+        sql, params = self._hits(words)
+        with self.connection.cursor() as cursor:
+            # bm25 отрицателен: чем меньше сумма, тем выше пост.
+            cursor.execute(
+                f'{sql} ORDER BY score, post_id DESC LIMIT %s OFFSET %s',
+                params + [limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class TermIndex:
+    """Обратный индекс в обычной таблице: вес основы в тексте поста или
+    комментария — её взвешенная частота, нормированная на длину этого
+    текста, при поиске веса поста и его комментариев складываются
+    и умножаются на IDF основы."""
+
+    def __init__(self, term_model=SearchTerm):
+        self.model = term_model
+
+    @staticmethod
+    def _weights(text, weight):
+        norm = math.sqrt(len(text)) or 1
+        return {
+            word: count * weight / norm
+            for word, count in Counter(text).items()
+        }
+
+    def store(self, docs):
+        self.model.objects.filter(
+            post_id__in=list(docs), comment__isnull=True
+        ).delete()
+        self.model.objects.bulk_create(
+            self.model(term=word, post_id=pk, weight=weight)
+            for pk, text in docs.items()
+            for word, weight in self._weights(text, TEXT_WEIGHT).items()
+        )
+
+    def store_comments(self, docs):
+        self.remove_comments(docs)
+        self.model.objects.bulk_create(
+            self.model(term=word, post_id=post_id, comment_id=pk,
+                       weight=weight)
+            for pk, (post_id, text) in docs.items()
+            for word, weight in self._weights(text, COMMENTS_WEIGHT).items()
+        )
+
+    def remove(self, post_ids):
+        self.model.objects.filter(post_id__in=list(post_ids)).delete()
+
+    def remove_comments(self, comment_ids):
+        self.model.objects.filter(comment_id__in=list(comment_ids)).delete()
+
+    def clear(self):
+        self.model.objects.all().delete()
+
+    def _matches(self, words):
+        return self.model.objects.filter(term__in=words).values(
+            'post_id'
+        ).annotate(
+            found=models.Count('term', distinct=True)
+        ).filter(found=len(words))
+
+    def count(self, words):
+        return self._matches(words).count()
+
+    def ids(self, words, offset, limit):
+        # Наибольший id вместо COUNT(*): для IDF хватает оценки.
+        total = Post.objects.aggregate(total=models.Max('pk'))['total'] or 1
+        frequencies = dict(
+            self.model.objects.filter(term__in=words).values(
+                'term'
+            ).annotate(
+                df=models.Count('post_id', distinct=True)
+            ).values_list('term', 'df')
+        )
+        score = models.Sum(models.Case(
+            *(
+                models.When(term=word, then=models.F('weight') * math.log(
+                    1 + total / frequencies[word]
+                ))
+                for word in words if word in frequencies
+            ),
+            default=0.0,
+            output_field=models.FloatField(),
+        ))
+        return list(
+            self._matches(words).annotate(score=score).order_by(
+                '-score', '-post_id'
+            ).values_list('post_id', flat=True)[offset:offset + limit]
+        )
+
+
+def backend(using=None, term_model=SearchTerm):
+    connection = connections[using or router.db_for_write(Post)]
+    if fts5_supported(connection):
+        return FtsIndex(connection)
+    return TermIndex(term_model)
+
+
+def index_posts(post_ids):
+    """Переиндексирует тексты постов; комментарии не трогаются."""
+    backend().store(documents(post_ids))
+
+
+def remove_posts(post_ids):
+    backend().remove(post_ids)
+
+
+def index_comments(comments):
+    """Индексирует только эти комментарии, без остальных в посте."""
+    backend().store_comments(comment_documents(comments))
+
+
+def remove_comments(comment_ids):
+    backend().remove_comments(comment_ids)
+
+
+def rebuild(batch_size=BATCH_SIZE, using=None, post_model=Post,
+            comment_model=Comment, term_model=SearchTerm):
+    """Строит индекс заново по всем постам, возвращает их число.
+
+    Модели можно подменить историческими, как это делает миграция.
+    """
+    index = backend(using, term_model)
+    index.clear()
+    total = last = 0
+    while True:
+        ids = list(post_model.objects.filter(pk__gt=last).order_by(
+            'pk'
+        ).values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return total
+        index.store(documents(ids, post_model))
+        index.store_comments(comment_documents(
+            comment_model.objects.filter(post_id__in=ids).only(
+                'pk', 'post_id', 'text'
+            ).iterator()
+        ))
+        total += len(ids)
+        last = ids[-1]
+
+
+class SearchResults:
+    """Найденные посты в порядке релевантности.
+
+    Paginator берёт у объекта только count() и срезы, поэтому на
+    страницу читается ровно столько id, сколько на ней постов.
+    """
+
+    def __init__(self, query):
+        self.words = query_terms(query)
+        self.index = backend(router.db_for_read(Post))
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            self._count = self.index.count(self.words) if self.words else 0
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        if not self.words:
+            return []
+        offset = key.start or 0
+        ids = self.index.ids(self.words, offset, key.stop - offset)
+        posts = Post.objects.for_feed().in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
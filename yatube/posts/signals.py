@@ -0,0 +1,135 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import (counters, images, search, tasks, thumbnails, timeline,
+               versions)
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields, **kwargs):
+    if created:
+        # Карточки нового пользователя ещё нет ни в одном процессе.
+        UserStats.objects.get_or_create(user=instance)
+    elif update_fields != frozenset({'last_login'}):
+        # Вход обновляет только last_login: карточкам он не важен.
+        versions.bump_authors()
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, update_fields, **kwargs):
+    """Запоминает прежние картинку и группу поста: со старой картинки
+    снимается ссылка, а у старой группы — запись. Поля, которых нет
+    в update_fields, в базе не меняются.
+
+    Новая загрузка перекодируется здесь, какой бы путь её ни сохранял.
+    """
+    image = instance.image
+    if image and not image._committed and not isinstance(
+        image.file, images.IngestedImage
+    ):
+        instance.image = images.ingest(image.file)
+    if instance._state.adding:
+        instance._previous_image = ''
+        return
+    instance._previous_image = instance.image.name or ''
+    instance._previous_group_id = instance.group_id
+    fields = {'image', 'group', 'group_id'}
+    if update_fields is not None:
+        fields &= set(update_fields)
+    if not fields:
+        return
+    image, group_id = Post.objects.filter(pk=instance.pk).values_list(
+        'image', 'group_id'
+    ).first() or ('', instance.group_id)
+    if 'image' in fields:
+        instance._previous_image = image or ''
+    if 'group' in fields or 'group_id' in fields:
+        instance._previous_group_id = group_id
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_image', '')
+    if instance.image.name != previous:
+        if instance.image:
+            instance.image.storage.retain(instance.image.name)
+        if previous:
+            instance.image.storage.release(previous)
+    if created:
+        counters.bump(instance.author_id, 'posts_count', 1)
+        tasks.fan_out.enqueue(
+            instance.pk, idempotency_key=f'fan-out:{instance.pk}'
+        )
+        if instance.group_id:
+            counters.bump_group_posts(instance.group_id, 1)
+    else:
+        previous_group_id = getattr(
+            instance, '_previous_group_id', instance.group_id
+        )
+        if previous_group_id != instance.group_id:
+            if previous_group_id:
+                counters.bump_group_posts(previous_group_id, -1)
+            if instance.group_id:
+                counters.bump_group_posts(instance.group_id, 1)
+    if instance.image:
+        thumbnails.schedule(instance.image.name)
+    search.index_posts([instance.pk])
+    versions.bump_feed()
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.bump(instance.author_id, 'posts_count', -1)
+    if instance.image:
+        instance.image.storage.release(instance.image.name)
+    if instance.group_id:
+        counters.bump_group_posts(instance.group_id, -1)
+    search.remove_posts([instance.pk])
+    versions.bump_feed()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    versions.bump_feed()
+    versions.bump_groups()
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created and instance.post_id:
+        counters.bump_comments(instance.post_id, 1)
+    if instance.post_id:
+        search.index_comments([instance])
+        versions.bump_post(instance.post_id)
+        versions.bump_comments()
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    search.remove_comments([instance.pk])
+    if instance.post_id:
+        counters.bump_comments(instance.post_id, -1)
+        versions.bump_post(instance.post_id)
+        versions.bump_comments()
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.bump(instance.user_id, 'following_count', 1)
+        counters.bump(instance.author_id, 'followers_count', 1)
+        tasks.backfill.enqueue(
+            [[instance.user_id, instance.author_id]],
+            idempotency_key=f'backfill:{instance.pk}',
+        )
+        versions.bump_timeline(instance.user_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.bump(instance.user_id, 'following_count', -1)
+    counters.bump(instance.author_id, 'followers_count', -1)
+    timeline.prune(instance.user_id, instance.author_id)
+    versions.bump_timeline(instance.user_id)
@@ -0,0 +1,134 @@
+"""Стеммер Snowball для русского языка.
+
+Повторяет алгоритм https://snowballstem.org/algorithms/russian/stemmer.html:
+окончания снимаются только в области RV (после первой гласной),
+словообразовательные «ост»/«ость» — только в R2.
+"""
+from functools import lru_cache
+
+VOWELS = frozenset('аеиоуыэюя')
+
+PERFECTIVE_GERUND = (
+    ('в', 'вши', 'вшись'),
+    ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+ADJECTIVE = (
+    (),
+    (
+        'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+        'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую',
+        'юю', 'ая', 'яя', 'ою', 'ею',
+    ),
+)
+PARTICIPLE = (
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+REFLEXIVE = ((), ('ся', 'сь'))
+VERB = (
+    (
+        'ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но',
+        'ет', 'ют', 'ны', 'ть', 'ешь', 'нно',
+    ),
+    (
+        'ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей',
+        'уй', 'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят',
+        'ует', 'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю',
+    ),
+)
+NOUN = (
+    (),
+    (
+        'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии',
+        'и', 'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам',
+        'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия',
+        'ья', 'я',
+    ),
+)
+DERIVATIONAL = ('ост', 'ость')
+SUPERLATIVE = ('ейш', 'ейше')
+
+
+def _regions(word):
+    """Начала областей RV и R2."""
+    rv = r1 = r2 = len(word)
+    for i, letter in enumerate(word):
+        if letter in VOWELS:
+            rv = i + 1
+            break
+    for i in range(1, len(word)):
+        if word[i - 1] in VOWELS and word[i] not in VOWELS:
+            r1 = i + 1
+            break
+    for i in range(r1 + 1, len(word)):
+        if word[i - 1] in VOWELS and word[i] not in VOWELS:
+            r2 = i + 1
+            break
+    return rv, r2
+
+
+def _remove(rv, groups):
+    """Снимает самое длинное окончание из групп, иначе возвращает None.
+
+    Окончания первой группы снимаются, только если перед ними «а» или «я».
+    """
+    first, second = groups
+    for ending in sorted(first + second, key=len, reverse=True):
+        if not rv.endswith(ending):
+            continue
+        stem = rv[:-len(ending)]
+        if ending in second:
+            return stem
+        return stem if stem.endswith(('а', 'я')) else None
+    return None
+
+
+def _adjectival(rv):
+    stem = _remove(rv, ADJECTIVE)
+    if stem is None:
+        return None
+    participle = _remove(stem, PARTICIPLE)
+    return stem if participle is None else participle
+
+
+def _step1(rv):
+    stem = _remove(rv, PERFECTIVE_GERUND)
+    if stem is not None:
+        return stem
+    reflexive = _remove(rv, REFLEXIVE)
+    if reflexive is not None:
+        rv = reflexive
+    for step in (_adjectival, lambda part: _remove(part, VERB),
+                 lambda part: _remove(part, NOUN)):
+        stem = step(rv)
+        if stem is not None:
+            return stem
+    return rv
+
+
+@lru_cache(maxsize=100_000)
+def stem(word):
+    """Основа слова: «постов», «посты», «постам» → «пост»."""
+    word = word.lower().replace('ё', 'е')
+    start, r2 = _regions(word)
+    prefix, rv = word[:start], word[start:]
+    rv = _step1(rv)
+    if rv.endswith('и'):
+        rv = rv[:-1]
+    for ending in sorted(DERIVATIONAL, key=len, reverse=True):
+        if rv.endswith(ending) and start + len(rv) - len(ending) >= r2:
+            rv = rv[:-len(ending)]
+            break
+    if rv.endswith('нн'):
+        rv = rv[:-1]
+    else:
+        for ending in sorted(SUPERLATIVE, key=len, reverse=True):
+            if rv.endswith(ending):
+                rv = rv[:-len(ending)]
+                if rv.endswith('нн'):
+                    rv = rv[:-1]
+                break
+        else:
+            if rv.endswith('ь'):
+                rv = rv[:-1]
+    return prefix + rv
@@ -0,0 +1,40 @@
+"""Побочные эффекты записи, которые не нужны в ответе на запрос."""
+from core.taskqueue import task
+
+from . import thumbnails, timeline, versions
+from .models import Follow, Post
+
+
+@task()
+def fan_out(post_id):
+    """Раскладывает пост по лентам подписчиков."""
+    post = Post.objects.filter(pk=post_id).only(
+        'pk', 'author_id', 'pub_date'
+    ).first()
+    if post is None:
+        return
+    timeline.fan_out(post)
+    # Ленты подписок, закешированные до раскладки, пора перерисовать.
+    versions.bump_feed()
+
+
+@task()
+def generate_thumbnails(name):
+    """Создаёт миниатюры картинки поста (см. posts.thumbnails)."""
+    thumbnails.generate(name)
+    # Страницы с заглушкой вместо миниатюры пора перерисовать.
+    versions.bump_feed()
+
+
+@task()
+def backfill(pairs):
+    """Дополняет ленты постами авторов после подписки по парам
+    [user_id, author_id]; пары, от которых успели отписаться, пропускает."""
+    users = {user_id for user_id, _ in pairs}
+    following = set(Follow.objects.filter(
+        user_id__in=users, author_id__in={author for _, author in pairs}
+    ).values_list('user_id', 'author_id'))
+    timeline.backfill_many(
+        pair for pair in map(tuple, pairs) if pair in following
+    )
+    versions.bump_timelines(users)
@@ -0,0 +1,107 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import authors, versions
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+AUTHORS: int = 3
+
+
+class AuthorCardTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='описание'
+        )
+        cls.authors = [
+            User.objects.create_user(
+                username=f'Author{i}', first_name='Имя', last_name=f'{i}'
+            )
+            for i in range(AUTHORS)
+        ]
+        cls.posts = [
+            Post.objects.create(text='Пост', author=author, group=cls.group)
+            for author in cls.authors
+        ]
+        for author in cls.authors:
+            Comment.objects.create(
+                post=cls.posts[0], author=author, text='Коммент'
+            )
+
+    def setUp(self):
+        cache.clear()
+        versions.bump_authors()
+        self.client = Client()
+
+    def user_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [
+            query['sql'] for query in queries if '"auth_user"' in query['sql']
+        ]
+
+    def test_one_query_per_page(self):
+        """Авторы страницы читаются одним запросом без лишних колонок,
+        повторная страница обходится без него."""
+        url = reverse('posts:group_list', args=(self.group.slug,))
+        queries = self.user_queries(url)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('password', queries[0])
+        self.assertEqual(self.user_queries(url), [])
+        response = self.client.get(url)
+        for author in self.authors:
+            self.assertContains(response, f'Автор: {author.username}')
+
+    def test_cold_cache_keeps_cards(self):
+        """Без версии в кеше первое чтение создаёт её, и карточки
+        запоминаются."""
+        cache.clear()
+        authors.cards([self.authors[0].pk])
+        with CaptureQueriesContext(connection) as queries:
+            authors.cards([self.authors[0].pk])
+        self.assertFalse(
+            [query for query in queries if '"auth_user"' in query['sql']]
+        )
+
+    def test_comments_use_cards(self):
+        url = reverse('posts:post_detail', args=(self.posts[0].pk,))
+        response = self.client.get(url)
+        for author in self.authors:
+            self.assertContains(response, author.username)
+        comments = self.client.get(
+            reverse('posts:post_comments', args=(self.posts[0].pk,))
+        ).json()['comments']
+        self.assertEqual(
+            {comment['author'] for comment in comments},
+            {author.username for author in self.authors},
+        )
+
+    def test_saved_user_is_reloaded(self):
+        """Сохранение пользователя сбрасывает карточки."""
+        author = self.authors[0]
+        authors.cards([author.pk])
+        author.username = 'Renamed'
+        author.save()
+        self.assertEqual(authors.cards([author.pk])[author.pk].username,
+                         'Renamed')
+
+    def test_login_keeps_cards(self):
+        """Вход обновляет только last_login и не сбрасывает карточки."""
+        version = versions.authors_version()
+        self.client.force_login(self.authors[0])
+        self.assertEqual(versions.authors_version(), version)
+
+    def test_card(self):
+        card = authors.cards([self.authors[1].pk])[self.authors[1].pk]
+        self.assertEqual(card.get_username(), 'Author1')
+        self.assertEqual(card.get_full_name(), 'Имя 1')
+        self.assertEqual(str(card), 'Author1')
+        with self.assertRaises(AttributeError):
+            card.password = 'x'
@@ -0,0 +1,97 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Post
+from ..utils import NUMBER_OF_COMMENTS
+
+User = get_user_model()
+TOTAL: int = NUMBER_OF_COMMENTS * 2 + 5
+
+
+class CommentPagesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+        cls.quiet = Post.objects.create(text='Тихий пост', author=cls.author)
+        for i in range(TOTAL):
+            commenter = User.objects.create_user(username=f'Reader{i}')
+            Comment.objects.create(
+                post=cls.post, author=commenter, text=f'Комментарий {i}'
+            )
+        Comment.objects.create(
+            post=cls.quiet, author=cls.author, text='Единственный'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def detail(self, post, **params):
+        return self.client.get(
+            reverse('posts:post_detail', args=(post.pk,)), params
+        )
+
+    def test_first_page_is_bounded(self):
+        """На странице поста только первая порция комментариев."""
+        response = self.detail(self.post)
+        comments = response.context['comments']
+        self.assertEqual(len(comments), NUMBER_OF_COMMENTS)
+        self.assertEqual(comments[0].text, f'Комментарий {TOTAL - 1}')
+        self.assertTrue(comments.has_next())
+        self.assertContains(response, 'more-comments')
+
+    def test_query_count_does_not_depend_on_comments(self):
+        """Авторы комментариев не добавляют запросов."""
+        counts = []
+        for post in (self.quiet, self.post):
+            self.detail(post)
+            with CaptureQueriesContext(connection) as queries:
+                self.detail(post)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_load_more_walks_all_comments(self):
+        """JSON «ещё» по курсору отдаёт остальные комментарии без
+        повторов и пропусков."""
+        page = self.detail(self.post).context['comments']
+        seen = [comment.pk for comment in page]
+        after = page.next_cursor
+        url = reverse('posts:post_comments', args=(self.post.pk,))
+        while after:
+            data = self.client.get(url, {'after': after}).json()
+            seen.extend(comment['id'] for comment in data['comments'])
+            after = data['next']
+        expected = list(Comment.objects.filter(
+            post=self.post
+        ).order_by('-created', '-pk').values_list('pk', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_json_fields(self):
+        """Комментарий в JSON несёт автора, ссылку на профиль и текст."""
+        url = reverse('posts:post_comments', args=(self.quiet.pk,))
+        data = self.client.get(url).json()
+        self.assertIsNone(data['next'])
+        self.assertEqual(data['comments'][0]['author'], 'Author')
+        self.assertEqual(
+            data['comments'][0]['author_url'],
+            reverse('posts:profile', args=('Author',)),
+        )
+        self.assertEqual(data['comments'][0]['text'], 'Единственный')
+
+    def test_page_link_without_js(self):
+        """Без JS ссылка «ещё» открывает следующую страницу поста."""
+        cursor = self.detail(self.post).context['comments'].next_cursor
+        comments = self.detail(self.post, after=cursor).context['comments']
+        self.assertEqual(len(comments), NUMBER_OF_COMMENTS)
+        self.assertTrue(comments.has_previous())
+
+    def test_missing_post(self):
+        """Комментарии несуществующего поста — 404."""
+        url = reverse('posts:post_comments', args=(10 ** 6,))
+        self.assertEqual(self.client.get(url).status_code, 404)
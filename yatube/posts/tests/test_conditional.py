@@ -0,0 +1,141 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core import routers
+
+from .. import versions
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='описание'
+        )
+        cls.post = Post.objects.create(
+            text='Пост', author=cls.author, group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.author.username,)),
+            reverse('posts:post_detail', args=(self.post.pk,)),
+        )
+
+    def revalidate(self, url, response, client=None):
+        return (client or self.client).get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+
+    def test_matching_etag_gets_304(self):
+        """Совпавший ETag даёт 304 без тела."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                again = self.revalidate(url, response)
+                self.assertEqual(again.status_code, 304)
+                self.assertEqual(again.content, b'')
+
+    def test_if_modified_since(self):
+        """Лента и пост отдают Last-Modified и понимают
+        If-Modified-Since."""
+        for url in (self.urls[0], self.urls[3]):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                again = self.client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+                )
+                self.assertEqual(again.status_code, 304)
+
+    def test_new_post_changes_validators(self):
+        """Новый пост меняет ETag лент."""
+        responses = [self.client.get(url) for url in self.urls]
+        Post.objects.create(text='Новый', author=self.author)
+        for url, response in zip(self.urls, responses):
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.revalidate(url, response).status_code, 200
+                )
+
+    def test_comment_changes_post_etag(self):
+        """Комментарий меняет ETag только страницы поста."""
+        index, detail = self.urls[0], self.urls[3]
+        responses = {url: self.client.get(url) for url in (index, detail)}
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        self.assertEqual(
+            self.revalidate(index, responses[index]).status_code, 304
+        )
+        self.assertEqual(
+            self.revalidate(detail, responses[detail]).status_code, 200
+        )
+
+    def test_etag_varies_by_user(self):
+        """Ответ для гостя не подходит авторизованному пользователю."""
+        authorized = Client()
+        authorized.force_login(self.reader)
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(
+                    self.revalidate(url, response, authorized).status_code,
+                    200,
+                )
+
+    def test_follow_changes_profile_etag(self):
+        """Подписка меняет ETag профиля: там кнопка и счётчики."""
+        authorized = Client()
+        authorized.force_login(self.reader)
+        url = self.urls[2]
+        response = authorized.get(url)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(
+            self.revalidate(url, response, authorized).status_code, 200
+        )
+
+    def test_page_is_part_of_etag(self):
+        """Разные страницы ленты — разные ETag."""
+        url = self.urls[0]
+        first = self.client.get(url)
+        second = self.client.get(url, {'page': 2})
+        self.assertNotEqual(first['ETag'], second['ETag'])
+
+    def test_replica_sync_changes_validators(self):
+        """Страница с реплики меняет ETag с синхронизацией реплики и не
+        отдаёт Last-Modified: версии в кеше её не описывают."""
+        url = reverse('posts:index')
+        with mock.patch.object(routers, 'read_point', lambda: 'replica:1'):
+            stale = self.client.get(url)
+            self.assertFalse(stale.has_header('Last-Modified'))
+            self.assertEqual(self.revalidate(url, stale).status_code, 304)
+        with mock.patch.object(routers, 'read_point', lambda: 'replica:2'):
+            self.assertEqual(self.revalidate(url, stale).status_code, 200)
+        self.assertEqual(self.revalidate(url, stale).status_code, 200)
+
+    def test_rolled_back_write_keeps_versions(self):
+        """Версии меняются только после коммита: откат записи, в том
+        числе повтор atomic_with_retry, их не трогает."""
+        version = versions.feed_version()
+        with mock.patch.object(connection, 'is_in_memory_db', lambda: False):
+            with self.assertRaises(RuntimeError):
+                with transaction.atomic():
+                    Post.objects.create(text='Откат', author=self.author)
+                    raise RuntimeError
+        self.assertEqual(versions.feed_version(), version)
@@ -0,0 +1,89 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Post, UserStats
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_post_counter(self):
+        """Счётчик постов автора меняется при создании и удалении."""
+        post = Post.objects.create(text='Пост', author=self.author)
+        Post.objects.create(text='Ещё пост', author=self.author)
+        self.assertEqual(self.stats(self.author).posts_count, 2)
+        post.delete()
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+
+    def test_comment_counter(self):
+        """Счётчик комментариев поста меняется при создании и удалении."""
+        post = Post.objects.create(text='Пост', author=self.author)
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий'
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+    def test_follow_counters(self):
+        """Подписка меняет счётчики подписчиков и подписок."""
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        follow.delete()
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+
+    def test_deleting_user_with_posts(self):
+        """Удаление автора не ломается на его счётчиках."""
+        user = User.objects.create_user(username='Leaving')
+        Post.objects.create(text='Пост', author=user)
+        Follow.objects.create(user=self.reader, author=user)
+        user.delete()
+        self.assertFalse(UserStats.objects.filter(user_id=user.pk).exists())
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+
+    def test_recount_repairs_drift(self):
+        """Команда recount чинит разошедшиеся счётчики."""
+        post = Post.objects.create(text='Пост', author=self.author)
+        Comment.objects.create(post=post, author=self.reader, text='-')
+        UserStats.objects.filter(user=self.author).update(posts_count=40)
+        Post.objects.filter(pk=post.pk).update(comments_count=7)
+        UserStats.objects.filter(user=self.reader).delete()
+        out = StringIO()
+        call_command('recount', stdout=out)
+        self.assertIn('пользователей: 1, постов: 1', out.getvalue())
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertTrue(UserStats.objects.filter(user=self.reader).exists())
+
+    def test_pages_show_counters(self):
+        """Профиль и пост показывают счётчик постов автора."""
+        post = Post.objects.create(text='Пост', author=self.author)
+        UserStats.objects.filter(user=self.author).update(posts_count=42)
+        client = Client()
+        pages = {
+            reverse('posts:profile', args=(self.author.username,)):
+                'Всего постов:  42',
+            reverse('posts:post_detail', args=(post.pk,)):
+                '<span >42</span>',
+        }
+        for url, expected in pages.items():
+            with self.subTest(url=url):
+                self.assertContains(client.get(url), expected)
@@ -0,0 +1,190 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..follows import MAX_USERNAMES
+from ..models import Follow, Post, TimelineEntry, UserStats
+
+User = get_user_model()
+AUTHORS: int = 30
+
+
+class BulkFollowTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.authors = [
+            User.objects.create_user(username=f'Author{i}')
+            for i in range(AUTHORS)
+        ]
+        for author in cls.authors:
+            Post.objects.create(text='Пост', author=author)
+        cls.names = [author.username for author in cls.authors]
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+        self.url = reverse('posts:follow_bulk')
+
+    def post(self, client=None, **data):
+        return (client or self.client).post(
+            self.url, json.dumps(data), content_type='application/json'
+        )
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_follow_many(self):
+        """Один запрос подписывает на всех авторов и чинит счётчики
+        и ленту."""
+        response = self.post(follow=self.names + ['Nobody', 'Reader'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'following': sorted(self.names),
+            'not_following': ['Reader'],
+            'missing': ['Nobody'],
+        })
+        self.assertEqual(self.stats(self.reader).following_count, AUTHORS)
+        self.assertEqual(self.stats(self.authors[0]).followers_count, 1)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), AUTHORS
+        )
+
+    def test_repeat_changes_nothing(self):
+        """Повторная подписка не дублирует подписки и счётчики."""
+        self.post(follow=self.names[:5])
+        self.post(follow=self.names[:10])
+        self.assertEqual(Follow.objects.filter(user=self.reader).count(), 10)
+        self.assertEqual(self.stats(self.reader).following_count, 10)
+        self.assertEqual(self.stats(self.authors[0]).followers_count, 1)
+
+    def test_unfollow_many(self):
+        """Массовая отписка убирает подписки и посты из ленты."""
+        self.post(follow=self.names)
+        response = self.post(unfollow=self.names[:20])
+        self.assertEqual(
+            response.json()['not_following'], sorted(self.names[:20])
+        )
+        self.assertEqual(self.stats(self.reader).following_count, 10)
+        self.assertEqual(self.stats(self.authors[0]).followers_count, 0)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 10
+        )
+
+    def test_query_count_does_not_depend_on_authors(self):
+        """Число запросов не растёт с числом авторов."""
+        counts = []
+        for username, names in (('Few', self.names[:3]), ('Many', self.names)):
+            client = Client()
+            client.force_login(User.objects.create_user(username=username))
+            with CaptureQueriesContext(connection) as queries:
+                self.post(client, follow=names)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_bad_requests(self):
+        """Не JSON, не списки и слишком длинные списки — 400, GET — 405."""
+        bad = (
+            self.client.post(self.url, 'не json', content_type='text/plain'),
+            self.post(follow='Author0'),
+            self.post(follow=[1, 2]),
+            self.post(follow=['x'] * (MAX_USERNAMES + 1)),
+        )
+        for response in bad:
+            with self.subTest(content=response.content):
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+
+
+class FollowStateTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.fan = User.objects.create_user(username='Fan')
+        Follow.objects.create(user=cls.fan, author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+        self.url = reverse('posts:profile', args=(self.author.username,))
+
+    def follow_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        return response, [
+            query['sql'] for query in queries
+            if 'FROM "posts_follow"' in query['sql']
+        ]
+
+    def test_button_depends_on_viewer(self):
+        """Кнопка отражает подписку зрителя, а не чью-то ещё."""
+        response = self.client.get(self.url)
+        self.assertFalse(response.context['following'])
+        self.assertContains(response, 'Подписаться')
+        self.client.get(
+            reverse('posts:profile_follow', args=(self.author.username,))
+        )
+        response = self.client.get(self.url)
+        self.assertTrue(response.context['following'])
+        self.assertContains(response, 'Отписаться')
+
+    def test_one_query_per_request(self):
+        """Профиль проверяет одну подписку одним запросом."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        response, queries = self.follow_queries()
+        self.assertEqual(len(queries), 1)
+        self.assertIn('"posts_follow"."author_id" =', queries[0])
+        self.assertTrue(response.context['following'])
+
+
+class ImportFollowsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        for name in ('Anna', 'Boris', 'Vera'):
+            User.objects.create_user(username=name)
+        cls.directory = tempfile.mkdtemp()
+        cls.path = os.path.join(cls.directory, 'follows.csv')
+        with open(cls.path, 'w', encoding='utf-8') as stream:
+            stream.write(
+                'user,author\n'
+                'Anna,Boris\n'
+                'Anna,Vera\n'
+                'Boris,Vera\n'
+                'Vera,Ghost\n'
+            )
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+        super().tearDownClass()
+
+    def load(self, *args):
+        out = StringIO()
+        call_command('import_follows', self.path, *args, stdout=out)
+        return out.getvalue()
+
+    def test_import(self):
+        """Граф грузится пачками, неизвестные имена пропускаются,
+        повторная загрузка ничего не меняет."""
+        out = self.load('--batch-size', '2')
+        self.assertIn('Строк: 4, подписок: 3', out)
+        self.assertIn('Ghost', out)
+        self.load()
+        self.assertEqual(Follow.objects.count(), 3)
+        vera = UserStats.objects.get(user__username='Vera')
+        self.assertEqual(vera.followers_count, 2)
+        anna = UserStats.objects.get(user__username='Anna')
+        self.assertEqual(anna.following_count, 2)
@@ -0,0 +1,128 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import groups, versions
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class GroupRegistryTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.cats = Group.objects.create(
+            title='Коты', slug='cats', description='про котов'
+        )
+        cls.dogs = Group.objects.create(
+            title='Собаки', slug='dogs', description='про собак'
+        )
+        cls.post = Post.objects.create(
+            text='Мяу', author=cls.author, group=cls.cats
+        )
+        Post.objects.create(text='Мур', author=cls.author, group=cls.cats)
+
+    def setUp(self):
+        cache.clear()
+        versions.bump_groups()
+        self.client = Client()
+
+    def group_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [
+            query['sql'] for query in queries
+            if '"posts_group"' in query['sql']
+        ]
+
+    def test_directory(self):
+        """Каталог читает группы с числом записей одним запросом без
+        GROUP BY."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:groups'))
+        sql = [query['sql'] for query in queries]
+        self.assertNotIn('GROUP BY', ' '.join(sql))
+        self.assertNotIn('"posts_post"', ' '.join(sql))
+        self.assertEqual(
+            len([query for query in sql if '"posts_group"' in query]), 1
+        )
+        self.assertEqual(
+            [(group.slug, group.posts_count)
+             for group in response.context['groups']],
+            [('cats', 2), ('dogs', 0)],
+        )
+        self.assertContains(response, 'Записей: 2')
+
+    def counts(self):
+        return dict(Group.objects.values_list('slug', 'posts_count'))
+
+    def test_counts_follow_posts(self):
+        """Число записей следует за созданием, переносом и удалением,
+        а реестр при этом не перечитывается."""
+        version = versions.groups_version()
+        post = Post.objects.create(
+            text='Гав', author=self.author, group=self.dogs
+        )
+        self.assertEqual(self.counts()['dogs'], 1)
+        post.group = self.cats
+        post.save()
+        self.assertEqual(self.counts(), {'cats': 3, 'dogs': 0})
+        post.delete()
+        self.assertEqual(self.counts()['cats'], 2)
+        self.assertEqual(versions.groups_version(), version)
+
+    def test_edit_keeps_counts(self):
+        """Правка поста без смены группы не трогает posts_group."""
+        self.post.text = 'Мяу!'
+        with CaptureQueriesContext(connection) as queries:
+            self.post.save()
+        self.assertFalse(any(
+            query['sql'].startswith('UPDATE "posts_group"')
+            for query in queries
+        ))
+        self.assertEqual(self.counts()['cats'], 2)
+
+    def test_pages_skip_group_table(self):
+        """Страница группы и ленты не читают posts_group на тёплом
+        реестре."""
+        urls = (
+            reverse('posts:group_list', args=('cats',)),
+            reverse('posts:index'),
+        )
+        groups.registry()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.group_queries(url), [])
+        response = self.client.get(urls[0])
+        self.assertEqual(response.context['group'], self.cats)
+        self.assertEqual(
+            response.context['page_obj'][0].group.title, 'Коты'
+        )
+
+    def test_cold_cache_keeps_registry(self):
+        """Без версии в кеше первое чтение создаёт её, и страница
+        группы больше не читает posts_group."""
+        url = reverse('posts:group_list', args=('cats',))
+        cache.clear()
+        self.client.get(url)
+        self.assertEqual(self.group_queries(url), [])
+
+    def test_changes_reload_registry(self):
+        """Сохранение и удаление группы перечитывают реестр."""
+        groups.registry()
+        cats = Group.objects.get(slug='cats')
+        cats.title = 'Кошки'
+        cats.save()
+        self.assertEqual(groups.by_slug('cats').title, 'Кошки')
+        Group.objects.get(slug='dogs').delete()
+        self.assertIsNone(groups.by_slug('dogs'))
+        response = self.client.get(
+            reverse('posts:group_list', args=('dogs',))
+        )
+        self.assertEqual(response.status_code, 404)
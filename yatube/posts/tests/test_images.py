@@ -0,0 +1,132 @@
+import hashlib
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from .. import images
+from ..models import Post
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+ORIENTATION: int = 0x0112
+
+
+def photo(size=(400, 200), orientation=None, image_format='JPEG'):
+    """Картинка с EXIF: ориентацией и «координатами» в описании."""
+    image = Image.new('RGB', size, color=(200, 30, 30))
+    exif = Image.Exif()
+    exif[0x010E] = 'GPS 55.75, 37.61'
+    if orientation:
+        exif[ORIENTATION] = orientation
+    buffer = BytesIO()
+    image.save(buffer, image_format, exif=exif.tobytes())
+    return SimpleUploadedFile(
+        name='photo.jpg', content=buffer.getvalue(), content_type='image/jpeg'
+    )
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT, IMAGE_MAX_SIDE=100, IMAGE_FORMAT='JPEG'
+)
+class IngestTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Photographer')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def create(self, upload, text='Пост'):
+        self.client.post(
+            reverse('posts:create_post'), {'text': text, 'image': upload}
+        )
+        return Post.objects.get(text=text)
+
+    def test_downscaled_and_stripped(self):
+        """Картинка уменьшается, поворачивается по EXIF и теряет
+        метаданные."""
+        post = self.create(photo(orientation=6))
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.format, 'JPEG')
+            self.assertEqual(image.size, (50, 100))
+            self.assertNotIn('exif', image.info)
+        with post.image.open() as content:
+            digest = hashlib.sha256(content.read()).hexdigest()
+        self.assertEqual(
+            post.image.name, f'posts/{digest[:2]}/{digest[2:4]}/{digest}.jpg'
+        )
+
+    def test_duplicate_reuses_file(self):
+        """Повторная загрузка ссылается на уже сохранённый файл."""
+        first = self.create(photo(), 'Первый')
+        second = self.create(photo(), 'Второй')
+        self.assertEqual(first.image.name, second.image.name)
+        directory, filename = first.image.name.rsplit('/', 1)
+        self.assertEqual(
+            first.image.storage.listdir(directory)[1], [filename]
+        )
+
+    def test_transparency_kept(self):
+        """Прозрачные картинки без WebP сохраняются в PNG."""
+        image = Image.new('RGBA', (20, 20), color=(0, 0, 0, 0))
+        buffer = BytesIO()
+        image.save(buffer, 'PNG')
+        upload = SimpleUploadedFile('clear.png', buffer.getvalue())
+        with self.settings(IMAGE_FORMAT=None):
+            ingested = images.ingest(upload)
+        expected = 'webp' if images.features.check('webp') else 'png'
+        self.assertTrue(ingested.name.endswith(f'.{expected}'))
+
+    def test_animation_stripped(self):
+        """Анимация сохраняет кадры и формат, но уменьшается и теряет
+        комментарий."""
+        frames = [
+            Image.new('P', (300, 150), color=index) for index in range(3)
+        ]
+        buffer = BytesIO()
+        frames[0].save(
+            buffer, 'GIF', save_all=True, append_images=frames[1:],
+            duration=100, loop=0, comment=b'GPS 55.75, 37.61',
+        )
+        upload = SimpleUploadedFile('moving.gif', buffer.getvalue())
+        post = self.create(upload)
+        self.assertTrue(post.image.name.endswith('.gif'))
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.n_frames, 3)
+            self.assertEqual(image.size, (100, 50))
+            self.assertNotIn('comment', image.info)
+
+    def test_model_save_ingests(self):
+        """Загрузка мимо формы (админка, код) тоже перекодируется."""
+        post = Post.objects.create(
+            text='Из админки', author=self.user, image=photo()
+        )
+        self.assertTrue(post.image.name.endswith('.jpg'))
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (100, 50))
+            self.assertNotIn('exif', image.info)
+        self.assertEqual(
+            post.image.name, self.create(photo(), 'Из формы').image.name
+        )
+
+    def test_broken_image(self):
+        upload = SimpleUploadedFile('broken.jpg', b'not an image')
+        response = self.client.post(
+            reverse('posts:create_post'), {'text': 'Битый', 'image': upload}
+        )
+        self.assertTrue(response.context['form'].errors['image'])
+        self.assertFalse(Post.objects.filter(text='Битый').exists())
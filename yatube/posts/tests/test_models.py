@@ -1,7 +1,12 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import IntegrityError
 from django.test import TestCase
 from django.core.files.uploadedfile import SimpleUploadedFile
-from ..models import Group, Post
+from ..management.commands.feed_query_plans import FOLLOW_INDEX, uses_index
+from ..models import Follow, Group, Post
 
 User = get_user_model()
 
@@ -71,3 +76,41 @@ class PostModelTest(TestCase):
             with self.subTest(field=field):
                 verbose = task._meta.get_field(field).help_text
                 self.assertEqual(verbose, expected_value)
+
+
+class FeedIndexTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        cls.group = Group.objects.create(
+            title='Группа', slug='index-slug', description='-'
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        Post.objects.create(text='Пост', author=cls.author, group=cls.group)
+
+    def test_follow_is_unique(self):
+        """Повторная подписка на автора запрещена на уровне базы."""
+        with self.assertRaises(IntegrityError):
+            Follow.objects.create(user=self.user, author=self.author)
+
+    def test_feed_queries_use_indexes(self):
+        """Запросы лент идут по составным индексам."""
+        out = StringIO()
+        call_command('feed_query_plans', stdout=out)
+        self.assertIn('post_author_pub_date_idx', out.getvalue())
+        self.assertIn('post_group_pub_date_idx', out.getvalue())
+
+    def test_plan_must_name_index(self):
+        """Упоминания таблицы в плане мало: нужен индекс по имени."""
+        self.assertFalse(uses_index('SCAN posts_follow', FOLLOW_INDEX))
+        self.assertTrue(uses_index(
+            'SEARCH posts_follow USING COVERING INDEX '
+            'sqlite_autoindex_posts_follow_1 (user_id=? AND author_id=?)',
+            FOLLOW_INDEX,
+        ))
+        self.assertFalse(uses_index(
+            'SEARCH posts_post USING INDEX post_pub_date_idx_old',
+            'post_pub_date_idx',
+        ))
@@ -0,0 +1,74 @@
+import json
+import os
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from .. import groups
+from ..models import Comment, Follow, Group, Post, TimelineEntry, UserStats
+from ..ndjson import iter_records
+
+User = get_user_model()
+OLD_DATE = datetime(1854, 3, 14, tzinfo=timezone.utc)
+
+
+class NdjsonTests(TestCase):
+    def setUp(self):
+        author = User.objects.create_user(username='Tolstoy')
+        reader = User.objects.create_user(username='Reader')
+        group = Group.objects.create(
+            title='Дневники', slug='diaries', description='-'
+        )
+        post = Post.objects.create(text='Запись', author=author, group=group)
+        Post.objects.filter(pk=post.pk).update(pub_date=OLD_DATE)
+        Comment.objects.create(post=post, author=reader, text='Отлично')
+        Follow.objects.create(user=reader, author=author)
+        self.path = tempfile.mktemp(suffix='.ndjson')
+        self.addCleanup(
+            lambda: os.path.exists(self.path) and os.remove(self.path)
+        )
+
+    def test_export_import_round_trip(self):
+        """Выгрузка и загрузка сохраняют данные, даты и счётчики."""
+        call_command('yatube_export', self.path, stderr=StringIO())
+        with open(self.path, encoding='utf-8') as stream:
+            labels = [json.loads(line)['model'] for line in stream]
+        self.assertEqual(labels, [
+            'auth.user', 'auth.user', 'posts.group', 'posts.post',
+            'posts.comment', 'posts.follow',
+        ])
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        self.assertIsNone(groups.by_slug('diaries'))
+        out = StringIO()
+        call_command('yatube_import', self.path, batch_size=1, stdout=out)
+        self.assertIn('Загружено записей: 6', out.getvalue())
+        post = Post.objects.get()
+        self.assertEqual(post.pub_date, OLD_DATE)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(post.group.slug, 'diaries')
+        # Реестр групп процесса узнаёт о загруженных группах.
+        self.assertIsNotNone(groups.by_slug('diaries'))
+        self.assertEqual(
+            UserStats.objects.get(user__username='Tolstoy').posts_count, 1
+        )
+        self.assertTrue(TimelineEntry.objects.filter(post=post).exists())
+
+    @mock.patch('posts.ndjson.CHUNK_SIZE', 7)
+    def test_reads_json_array_in_chunks(self):
+        """Массив dumpdata читается по частям, как и NDJSON."""
+        records = [
+            {'model': 'posts.group', 'pk': i, 'fields': {'title': '[,]'}}
+            for i in range(5)
+        ]
+        for text in (json.dumps(records, indent=2),
+                     '\n'.join(json.dumps(record) for record in records)):
+            with self.subTest(text=text[:1]):
+                self.assertEqual(
+                    list(iter_records(StringIO(text))), records
+                )
@@ -0,0 +1,77 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Post
+from ..utils import NUMBER_OF_POSTS, KeysetPage, decode_cursor
+
+User = get_user_model()
+POSTS_TOTAL: int = 8
+
+
+@override_settings(KEYSET_PAGINATION=True)
+class KeysetPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Keyset')
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=cls.user) for i in range(POSTS_TOTAL)
+        )
+        now = timezone.now()
+        # Половина постов с одинаковой датой: проверяем разбор ничьих по id.
+        for i, post in enumerate(Post.objects.order_by('pk')):
+            post.pub_date = now - timedelta(minutes=i // 2)
+            post.save()
+        cls.expected = list(Post.objects.order_by('-pub_date', '-pk'))
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    def walk(self, url):
+        pages = []
+        response = self.client.get(url)
+        pages.append(list(response.context['page_obj']))
+        while response.context['page_obj'].has_next():
+            cursor = response.context['page_obj'].next_cursor
+            cache.clear()
+            response = self.client.get(url, {'after': cursor})
+            pages.append(list(response.context['page_obj']))
+        return response, pages
+
+    def test_pages_cover_feed_in_order(self):
+        """Курсоры проходят ленту целиком без пропусков и повторов."""
+        response, pages = self.walk(reverse('posts:index'))
+        self.assertIsInstance(response.context['page_obj'], KeysetPage)
+        self.assertEqual(sum(pages, []), self.expected)
+        self.assertTrue(
+            all(len(page) <= NUMBER_OF_POSTS for page in pages)
+        )
+
+    def test_before_cursor_returns_previous_page(self):
+        """Токен before возвращает предыдущую страницу."""
+        url = reverse('posts:profile', args=(self.user.username,))
+        first = self.client.get(url).context['page_obj']
+        second = self.client.get(
+            url, {'after': first.next_cursor}
+        ).context['page_obj']
+        back = self.client.get(
+            url, {'before': second.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(back), list(first))
+        self.assertFalse(first.has_previous())
+        self.assertTrue(back.has_next())
+
+    def test_broken_cursor_falls_back_to_first_page(self):
+        """Битый курсор отдаёт первую страницу."""
+        self.assertIsNone(decode_cursor('не-курсор'))
+        response = self.client.get(reverse('posts:index'), {'after': '%%%'})
+        self.assertEqual(
+            list(response.context['page_obj']),
+            self.expected[:NUMBER_OF_POSTS],
+        )
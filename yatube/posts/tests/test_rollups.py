@@ -0,0 +1,100 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import rollups
+from ..models import Comment, Follow, Post, PostActivity, PostScore
+
+User = get_user_model()
+
+
+class RollupTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.star = User.objects.create_user(username='Star')
+        cls.reader = User.objects.create_user(username='Reader')
+        for i in range(3):
+            Follow.objects.create(
+                user=User.objects.create_user(username=f'Fan{i}'),
+                author=cls.star,
+            )
+        cls.quiet = Post.objects.create(text='Тихий', author=cls.author)
+        cls.discussed = Post.objects.create(
+            text='Обсуждаемый', author=cls.author
+        )
+        cls.famous = Post.objects.create(text='Звёздный', author=cls.star)
+
+    def setUp(self):
+        self.client = Client()
+
+    def comment(self, post, count=1):
+        for _ in range(count):
+            Comment.objects.create(post=post, author=self.reader, text='!')
+
+    def rolled_up(self):
+        return PostActivity.objects.aggregate(total=Sum('comments'))['total']
+
+    def feed(self, name):
+        response = self.client.get(reverse(f'posts:{name}'))
+        return list(response.context['page_obj'])
+
+    def test_rankings(self):
+        """Обсуждение и подписчики автора поднимают пост в лентах."""
+        self.comment(self.discussed, 5)
+        rollups.run()
+        self.assertEqual(
+            self.feed('popular'), [self.discussed, self.famous]
+        )
+        self.assertEqual(
+            self.feed('trending'), [self.discussed, self.famous]
+        )
+
+    def test_only_new_comments(self):
+        """Каждый запуск учитывает только комментарии после отметки."""
+        self.comment(self.discussed, 2)
+        self.assertEqual(rollups.run()[0], 2)
+        self.assertEqual(rollups.run()[0], 0)
+        self.comment(self.discussed, 3)
+        self.assertEqual(rollups.run()[0], 3)
+        self.assertEqual(self.rolled_up(), 5)
+        self.assertEqual(PostActivity.objects.count(), 1)
+
+    def test_windows_slide(self):
+        """Старые корзины выпадают из окон без новых комментариев."""
+        self.comment(self.discussed, 5)
+        rollups.run()
+        later = timezone.now() + timedelta(days=2)
+        rollups.refresh_scores(later)
+        score = PostScore.objects.get(post=self.discussed)
+        self.assertEqual(score.trending, 0)
+        self.assertEqual(score.popular, 5)
+        rollups.refresh_scores(later + timedelta(days=7))
+        self.assertFalse(PostActivity.objects.exists())
+        self.assertFalse(PostScore.objects.exists())
+
+    def test_views_do_not_read_comments(self):
+        """Ленты не считают комментарии при запросе."""
+        self.comment(self.discussed, 2)
+        rollups.run()
+        for name in ('popular', 'trending'):
+            with self.subTest(name=name):
+                with CaptureQueriesContext(connection) as queries:
+                    self.client.get(reverse(f'posts:{name}'))
+                sql = ' '.join(query['sql'] for query in queries)
+                self.assertNotIn('posts_comment', sql)
+
+    def test_command(self):
+        self.comment(self.quiet)
+        out = StringIO()
+        call_command('rollup_scores', stdout=out)
+        self.assertIn('Новых комментариев: 1', out.getvalue())
@@ -0,0 +1,148 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import search
+from ..models import Comment, Post, SearchTerm
+from ..stemmer import stem
+
+User = get_user_model()
+
+
+class StemmerTests(TestCase):
+    def test_word_forms_share_stem(self):
+        """Формы одного слова приводятся к одной основе."""
+        cases = {
+            'пост': ('пост', 'посты', 'постов', 'постами'),
+            'красив': ('красивые', 'красивейший'),
+            'бегущ': ('бегущий',),
+            'ответствен': ('ответственность',),
+            'елк': ('ёлками', 'ёлки'),
+        }
+        for expected, words in cases.items():
+            for word in words:
+                with self.subTest(word=word):
+                    self.assertEqual(stem(word), expected)
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.cats = Post.objects.create(
+            text='Кошки спят на подоконнике', author=cls.author
+        )
+        cls.dogs = Post.objects.create(
+            text='Собаки гуляют в парке', author=cls.author
+        )
+        cls.both = Post.objects.create(
+            text='Кошка и собака дружат', author=cls.author
+        )
+
+    def setUp(self):
+        self.client = Client()
+
+    def found(self, query):
+        response = self.client.get(reverse('posts:search'), {'q': query})
+        return [post.pk for post in response.context['page_obj']]
+
+    def test_finds_word_forms(self):
+        """Поиск находит посты по другим формам слова."""
+        self.assertEqual(
+            sorted(self.found('кошками')),
+            sorted([self.cats.pk, self.both.pk]),
+        )
+
+    def test_all_words_must_match(self):
+        """Пост должен содержать все слова запроса."""
+        self.assertEqual(self.found('кошки собаки'), [self.both.pk])
+
+    def test_empty_query(self):
+        """Пустой запрос ничего не ищет."""
+        self.assertEqual(self.found(''), [])
+        self.assertEqual(self.found('  ,.  '), [])
+
+    def test_post_text_outranks_comments(self):
+        """Совпадение в тексте поста выше совпадения в комментарии."""
+        Comment.objects.create(
+            post=self.dogs, author=self.author, text='А у меня попугай'
+        )
+        parrot = Post.objects.create(
+            text='Попугай говорит слова', author=self.author
+        )
+        self.assertEqual(self.found('попугаи'), [parrot.pk, self.dogs.pk])
+
+    def test_index_follows_changes(self):
+        """Правка и удаление поста и комментария обновляют индекс."""
+        cats = Post.objects.get(pk=self.cats.pk)
+        cats.text = 'Хомяки спят'
+        cats.save()
+        self.assertEqual(self.found('хомяк'), [cats.pk])
+        comment = Comment.objects.create(
+            post=self.both, author=self.author, text='Хомяк тоже'
+        )
+        self.assertEqual(len(self.found('хомяк')), 2)
+        comment.delete()
+        cats.delete()
+        self.assertEqual(self.found('хомяк'), [])
+
+    def test_comment_is_indexed_alone(self):
+        """Новый комментарий не перечитывает остальные комментарии поста,
+        а слова запроса могут найтись в разных комментариях."""
+        for i in range(3):
+            Comment.objects.create(
+                post=self.dogs, author=self.author, text=f'Лиса номер {i}'
+            )
+        with CaptureQueriesContext(connection) as queries:
+            Comment.objects.create(
+                post=self.dogs, author=self.author, text='Барсук'
+            )
+        self.assertFalse([
+            query for query in queries
+            if query['sql'].startswith('SELECT')
+            and '"posts_comment"' in query['sql']
+        ])
+        self.assertEqual(self.found('лисы барсуки'), [self.dogs.pk])
+        self.assertEqual(self.found('собака барсук'), [self.dogs.pk])
+
+    def test_paginator_keeps_query(self):
+        """Ссылки пагинатора сохраняют запрос."""
+        for i in range(11):
+            Post.objects.create(text=f'Енот номер {i}', author=self.author)
+        response = self.client.get(reverse('posts:search'), {'q': 'енот'})
+        self.assertEqual(response.context['page_obj'].paginator.count, 11)
+        self.assertContains(response, '?q=%D0%B5%D0%BD%D0%BE%D1%82&page=2')
+        response = self.client.get(
+            reverse('posts:search'), {'q': 'енот', 'page': 4}
+        )
+        self.assertEqual(len(response.context['page_obj']), 2)
+
+    def test_rebuild(self):
+        """rebuild восстанавливает индекс после массовой загрузки."""
+        search.backend().clear()
+        self.assertEqual(self.found('кошка'), [])
+        self.assertEqual(search.rebuild(), 3)
+        self.assertEqual(len(self.found('кошка')), 2)
+
+
+@mock.patch.object(search, 'fts5_supported', lambda connection: False)
+class TermIndexTests(SearchTests):
+    """Те же проверки для обратного индекса без FTS5."""
+
+    @classmethod
+    def setUpClass(cls):
+        with mock.patch.object(
+            search, 'fts5_supported', lambda connection: False
+        ):
+            super().setUpClass()
+
+    def test_terms_are_stored(self):
+        """Основы слов лежат в SearchTerm."""
+        self.assertTrue(SearchTerm.objects.filter(
+            term='кошк', post=self.cats
+        ).exists())
@@ -0,0 +1,85 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from core.models import Task
+
+from ..models import Post
+from ..thumbnails import (GEOMETRIES, OPTIONS, PlaceholderImage,
+                          PregeneratedThumbnailBackend, generate, schedule)
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        # Одинаковые картинки хранятся одним файлом, и миниатюры прошлых
+        # тестов остались бы в кеше KV-хранилища sorl.
+        cache.clear()
+        with mock.patch('posts.thumbnails.schedule'):
+            self.post = Post.objects.create(
+                text='Пост с картинкой',
+                author=User.objects.create_user(username='Painter'),
+                image=SimpleUploadedFile(
+                    name='small.gif', content=SMALL_GIF,
+                    content_type='image/gif',
+                ),
+            )
+        self.backend = PregeneratedThumbnailBackend()
+
+    def test_missing_thumbnail_gives_placeholder(self):
+        """Без готовой миниатюры шаблон получает заглушку и задачу."""
+        with mock.patch('posts.thumbnails.schedule') as schedule:
+            thumbnail = self.backend.get_thumbnail(
+                self.post.image, '640x480', **OPTIONS
+            )
+        self.assertIsInstance(thumbnail, PlaceholderImage)
+        self.assertTrue(thumbnail.url.startswith('data:image/svg+xml'))
+        schedule.assert_called_once_with(self.post.image.name)
+
+    def test_generated_thumbnails_are_served(self):
+        """После фоновой генерации отдаются настоящие миниатюры."""
+        generate(self.post.image.name)
+        with mock.patch('posts.thumbnails.schedule') as schedule:
+            for geometry in GEOMETRIES:
+                with self.subTest(geometry=geometry):
+                    thumbnail = self.backend.get_thumbnail(
+                        self.post.image, geometry, **OPTIONS
+                    )
+                    self.assertNotIsInstance(thumbnail, PlaceholderImage)
+                    self.assertTrue(thumbnail.exists())
+        schedule.assert_not_called()
+
+    def test_schedule_is_a_task(self):
+        """Миниатюры создаёт задача очереди, по одной на файл."""
+        name = self.post.image.name
+        schedule(name)
+        schedule(name)
+        self.assertEqual(
+            Task.objects.filter(key=f'thumbs:{name}').count(), 1
+        )
+        thumbnail = self.backend.get_thumbnail(
+            self.post.image, GEOMETRIES[0], **OPTIONS
+        )
+        self.assertNotIsInstance(thumbnail, PlaceholderImage)
@@ -0,0 +1,77 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.models import Task
+
+from ..models import Follow, Post, TimelineEntry
+from ..tasks import backfill
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.old_post = Post.objects.create(
+            text='Пост до подписки', author=cls.author
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def feed(self):
+        response = self.client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка дополняет ленту, отписка очищает её."""
+        self.client.get(
+            reverse('posts:profile_follow', args=(self.author.username,))
+        )
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=self.old_post).exists())
+        self.assertEqual(self.feed(), [self.old_post])
+        self.client.get(
+            reverse('posts:profile_unfollow', args=(self.author.username,))
+        )
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.reader).exists()
+        )
+        self.assertEqual(self.feed(), [])
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост попадает в ленты подписчиков."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post).exists())
+        self.assertEqual(self.feed(), [post, self.old_post])
+
+    def test_fan_out_is_a_task(self):
+        """Раскладка идёт фоновой задачей, по одной на пост."""
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        post.save()
+        self.assertEqual(
+            Task.objects.filter(key=f'fan-out:{post.pk}').count(), 1
+        )
+
+    def test_backfill_skips_unfollowed(self):
+        """Отложенное дополнение ленты не возвращает посты автора,
+        от которого уже отписались."""
+        backfill([[self.reader.pk, self.author.pk]])
+        self.assertFalse(TimelineEntry.objects.exists())
+
+    @mock.patch('posts.timeline.CELEBRITY_FOLLOWERS', 1)
+    def test_celebrity_posts_are_read_on_demand(self):
+        """Посты «звёздных» авторов подмешиваются при чтении."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='Пост звезды', author=self.author)
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(self.feed(), [post, self.old_post])
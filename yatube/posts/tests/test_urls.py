@@ -51,6 +51,7 @@ class TaskURLTests(TestCase):
         url_name = {
             '/': HTTPStatus.OK,
             '/group/test-slug/': HTTPStatus.OK,
+            '/groups/': HTTPStatus.OK,
             f'/profile/{self.user}/': HTTPStatus.OK,
             f'/posts/{self.post.id}/': HTTPStatus.OK,
             f'/posts/{self.post.id}/edit/': HTTPStatus.FOUND,
@@ -67,6 +68,7 @@ class TaskURLTests(TestCase):
         url_name = {
             '/': HTTPStatus.OK,
             '/group/test-slug/': HTTPStatus.OK,
+            '/groups/': HTTPStatus.OK,
             f'/profile/{self.user}/': HTTPStatus.OK,
             f'/posts/{self.post.id}/': HTTPStatus.OK,
             f'/posts/{self.post.id}/edit/': HTTPStatus.FOUND,
@@ -88,6 +90,7 @@ class TaskURLTests(TestCase):
         templates_url_names = {
             '/': 'posts/index.html',
             '/group/test-slug/': 'posts/group_list.html',
+            '/groups/': 'posts/groups.html',
             '/profile/HasNoName/': 'posts/profile.html',
             '/posts/88/': 'posts/post_detail.html',
             '/posts/88/edit/': 'posts/create_post.html',
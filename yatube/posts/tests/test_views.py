@@ -1,7 +1,14 @@
+from unittest import mock
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from ..models import Post, Group, Comment, Follow
+from ..utils import NUMBER_OF_POSTS
 from django import forms
 from django.core.files.uploadedfile import SimpleUploadedFile
 
@@ -179,12 +186,27 @@ class TaskPagesTests(TestCase):
 
     def test_check_cache(self):
         """Проверка кеша."""
+        cache.clear()
         response = self.guest_client.get(reverse('posts:index'))
         r_1 = response.content
-        Post.objects.get(id=1).delete()
+        Post.objects.filter(pk=self.post.pk).update(text='Мимо сигналов')
         response2 = self.guest_client.get(reverse('posts:index'))
         r_2 = response2.content
         self.assertEqual(r_1, r_2)
+        Post.objects.get(pk=self.post.pk).delete()
+        response3 = self.guest_client.get(reverse('posts:index'))
+        self.assertNotEqual(r_1, response3.content)
+
+    def test_cache_depends_on_page(self):
+        """Кеш главной страницы различает номера страниц."""
+        cache.clear()
+        for i in range(NUMBER_OF_POSTS):
+            Post.objects.create(text=f'Пост номер {i}', author=self.user)
+        first = self.guest_client.get(reverse('posts:index'))
+        second = self.guest_client.get(reverse('posts:index'), {'page': 2})
+        self.assertContains(first, 'Пост номер 0')
+        self.assertNotContains(second, 'Пост номер 0')
+        self.assertContains(second, 'Текст нового поста')
 
     def test_follow_page(self):
         """ Проверка подписок """
@@ -201,3 +223,77 @@ class TaskPagesTests(TestCase):
         Follow.objects.all().delete()
         r_3 = self.authorized_client.get(reverse('posts:follow_index'))
         self.assertEqual(len(r_3.context['page_obj']), 0)
+
+
+class FeedQueryCountTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.follower = User.objects.create_user(username='Follower')
+        cls.group = Group.objects.create(
+            title='Лента',
+            slug='feed-slug',
+            description='описание'
+        )
+        for i in range(6):
+            author = User.objects.create_user(username=f'Author{i}')
+            group = Group.objects.create(
+                title=f'Группа {i}', slug=f'group-{i}', description='-'
+            )
+            Follow.objects.create(user=cls.follower, author=author)
+            Post.objects.create(text=f'Пост {i}', author=author, group=group)
+            Post.objects.create(
+                text=f'Пост в ленте {i}', author=author, group=cls.group
+            )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.follower)
+
+    def count_queries(self, url, page_size):
+        cache.clear()
+        with mock.patch('posts.utils.NUMBER_OF_POSTS', page_size):
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(url)
+        return len(queries)
+
+    def test_feed_query_count_does_not_depend_on_page_size(self):
+        """Число запросов ленты не зависит от числа постов на странице."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=('Author0',)),
+            reverse('posts:follow_index'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.count_queries(url, 1), self.count_queries(url, 10)
+                )
+
+    def test_views_fit_query_budgets(self):
+        """Холодные страницы укладываются в бюджет запросов.
+
+        Бюджет времени здесь не проверяется: он зависит от машины.
+        """
+        budgets = {
+            name: {'queries': budget['queries']}
+            for name, budget in settings.PROFILING_BUDGETS.items()
+            if 'queries' in budget
+        }
+        post = Post.objects.filter(group=self.group).first()
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:groups'),
+            reverse('posts:profile', args=('Author0',)),
+            reverse('posts:post_detail', args=(post.pk,)),
+            reverse('posts:follow_index'),
+        )
+        with override_settings(
+            PROFILING_BUDGETS=budgets, PROFILING_BUDGET_ACTION='raise'
+        ):
+            for url in urls:
+                with self.subTest(url=url):
+                    cache.clear()
+                    self.assertEqual(self.client.get(url).status_code, 200)
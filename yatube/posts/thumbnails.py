@@ -0,0 +1,84 @@
+from urllib.parse import quote
+
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import DummyImageFile, ImageFile
+
+from .models import Post
+
+# Все размеры, которые запрашивают шаблоны лент и страницы поста.
+GEOMETRIES = ('640x480', '960x640', '960x339')
+OPTIONS = {'crop': 'center', 'upscale': True}
+PLACEHOLDER = (
+    "<svg xmlns='http://www.w3.org/2000/svg' width='{0}' height='{1}'>"
+    "<rect width='100%' height='100%' fill='#e9ecef'/></svg>"
+)
+
+
+class PlaceholderImage(DummyImageFile):
+    """Заглушка, которую шаблон показывает, пока миниатюра готовится."""
+
+    @property
+    def url(self):
+        svg = PLACEHOLDER.format(self.width or '100%', self.height or '100%')
+        return 'data:image/svg+xml,' + quote(svg)
+
+
+class PregeneratedThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl-thumbnail, который никогда не ресайзит в запросе.
+
+    Готовая миниатюра берётся из KV-хранилища, иначе генерация всех
+    размеров ставится в очередь задач, а шаблон получает заглушку.
+    """
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        if not file_:
+            raise ValueError('falsey file_ argument in get_thumbnail()')
+        cached = default.kvstore.get(
+            self.thumbnail_for(file_, geometry_string, options)
+        )
+        if cached:
+            return cached
+        schedule(file_.name if hasattr(file_, 'name') else file_)
+        return PlaceholderImage(geometry_string)
+
+    def thumbnail_for(self, file_, geometry_string, options):
+        """Повторяет выбор опций и имени файла из get_thumbnail sorl."""
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+    def generate(self, file_, geometry_string, **options):
+        return super().get_thumbnail(file_, geometry_string, **options)
+
+
+def generate(name):
+    """Создаёт все миниатюры картинки, которые нужны шаблонам.
+
+    Картинка открывается через хранилище поля: оно входит в ключ
+    KV-хранилища, по которому шаблон потом ищет миниатюру.
+    """
+    source = ImageFile(name, Post.image.field.storage)
+    for geometry in GEOMETRIES:
+        PregeneratedThumbnailBackend().generate(source, geometry, **OPTIONS)
+
+
+def schedule(name):
+    """Ставит генерацию миниатюр в очередь задач (core.taskqueue).
+
+    Ключ задачи — имя файла: одинаковые загрузки хранятся одним файлом,
+    и его миниатюры ставятся в очередь один раз.
+    """
+    from .tasks import generate_thumbnails
+
+    generate_thumbnails.enqueue(name, idempotency_key=f'thumbs:{name}')
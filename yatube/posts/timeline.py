@@ -0,0 +1,134 @@
+from collections import Counter, defaultdict
+
+from django.db.models import Q
+
+from .models import Follow, Post, TimelineEntry, UserStats
+
+# Авторы, у которых подписчиков не меньше этого числа, в ленты не
+# раскладываются: их посты подмешиваются в ленту при чтении.
+CELEBRITY_FOLLOWERS: int = 1000
+BACKFILL_LIMIT: int = 1000
+BATCH_SIZE: int = 500
+
+
+def is_celebrity(author_id):
+    return UserStats.objects.filter(
+        user_id=author_id, followers_count__gte=CELEBRITY_FOLLOWERS
+    ).exists()
+
+
+def celebrity_ids(user):
+    """id «звёздных» авторов, на которых подписан пользователь."""
+    return list(
+        Follow.objects.filter(
+            user=user,
+            author__stats__followers_count__gte=CELEBRITY_FOLLOWERS,
+        ).values_list('author_id', flat=True)
+    )
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if is_celebrity(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id,
+                post=post,
+                author_id=post.author_id,
+                pub_date=post.pub_date,
+            )
+            for user_id in followers.iterator()
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту последние посты автора после подписки."""
+    if is_celebrity(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).order_by('-pub_date')
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for post_id, pub_date in posts.values_list(
+                'pk', 'pub_date'
+            )[:BACKFILL_LIMIT]
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill_many(pairs):
+    """backfill сразу для многих пар (user_id, author_id): один запрос
+    на «звёзд» и один на посты вместо трёх запросов на каждую пару."""
+    followers = defaultdict(list)
+    for user_id, author_id in pairs:
+        followers[author_id].append(user_id)
+    celebrities = set(UserStats.objects.filter(
+        user_id__in=list(followers),
+        followers_count__gte=CELEBRITY_FOLLOWERS,
+    ).values_list('user_id', flat=True))
+    posts = Post.objects.filter(
+        author_id__in=[pk for pk in followers if pk not in celebrities]
+    ).order_by('author_id', '-pub_date').values_list(
+        'pk', 'author_id', 'pub_date'
+    )
+    taken = Counter()
+
+    def entries():
+        for post_id, author_id, pub_date in posts.iterator():
+            if taken[author_id] >= BACKFILL_LIMIT:
+                continue
+            taken[author_id] += 1
+            for user_id in followers[author_id]:
+                yield TimelineEntry(
+                    user_id=user_id,
+                    post_id=post_id,
+                    author_id=author_id,
+                    pub_date=pub_date,
+                )
+
+    TimelineEntry.objects.bulk_create(
+        entries(), batch_size=BATCH_SIZE, ignore_conflicts=True
+    )
+
+
+def prune(user_id, author_id):
+    """Убирает посты автора из ленты после отписки."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def timeline_posts(user):
+    """Посты ленты подписок пользователя."""
+    posts = Post.objects.for_feed()
+    celebrities = celebrity_ids(user)
+    if not celebrities:
+        return posts.filter(timeline_entries__user=user).order_by(
+            '-timeline_entries__pub_date'
+        )
+    entries = TimelineEntry.objects.filter(user=user).values('post_id')
+    return posts.filter(
+        Q(pk__in=entries) | Q(author_id__in=celebrities)
+    )
+
+
+def rebuild():
+    """Заново раскладывает посты по лентам всех подписок."""
+    TimelineEntry.objects.all().delete()
+    for user_id, author_id in Follow.objects.values_list(
+        'user_id', 'author_id'
+    ).iterator():
+        backfill(user_id, author_id)
@@ -5,14 +5,21 @@ from . import views
 app_name = 'posts'
 
 urlpatterns = [
+    path('groups/', views.group_directory, name='groups'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
     path('profile/<str:username>/', views.profile, name='profile'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('create/', views.post_create, name='create_post'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
+    path('posts/<int:post_id>/comments/',
+         views.post_comments, name='post_comments'),
     path('posts/<int:post_id>/comment/',
          views.add_comment, name='add_comment'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('follow/bulk/', views.follow_bulk, name='follow_bulk'),
+    path('search/', views.search, name='search'),
+    path('popular/', views.popular, name='popular'),
+    path('trending/', views.trending, name='trending'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
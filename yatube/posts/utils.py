@@ -1,12 +1,145 @@
+import base64
+import binascii
+from collections.abc import Sequence
+
+from django.conf import settings
 from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
 
 NUMBER_OF_POSTS: int = 3
+NUMBER_OF_COMMENTS: int = 20
+
+
+def encode_cursor(obj, field='pub_date'):
+    """Упаковывает позицию объекта (дата, id) в непрозрачный токен."""
+    raw = f'{getattr(obj, field).isoformat()}|{obj.pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Распаковывает токен курсора, для битого токена возвращает None."""
+    if not token:
+        return None
+    try:
+        padding = '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(token + padding).decode()
+        pub_date, pk = raw.rsplit('|', 1)
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        return None
+    if pub_date is None:
+        return None
+    return pub_date, pk
+
+
+class KeysetPage(Sequence):
+    """Страница курсорной пагинации.
+
+    Повторяет ту часть интерфейса django.core.paginator.Page,
+    которой пользуется шаблон posts/includes/paginator.html.
+    """
+
+    is_keyset = True
+
+    def __init__(self, object_list, has_next, has_previous,
+                 field='pub_date'):
+        self.object_list = object_list
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.field = field
+
+    def __repr__(self):
+        return f'<KeysetPage: {len(self)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def next_cursor(self):
+        if not self.has_next():
+            return None
+        return encode_cursor(self.object_list[-1], self.field)
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous():
+            return None
+        return encode_cursor(self.object_list[0], self.field)
+
+
+class KeysetPaginator:
+    """Пагинация по ключу (дата, id) без COUNT(*) и OFFSET.
+
+    Время выборки любой страницы не зависит от её глубины:
+    запрос всегда начинается с позиции курсора. Условие записано как
+    диапазон по дате, чтобы база шла по индексу (..., -дата, -id).
+    Поле даты задаёт field: pub_date у постов, created у комментариев.
+    """
+
+    def __init__(self, object_list, per_page, field='pub_date'):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.field = field
+
+    def get_page(self, after=None, before=None):
+        field = self.field
+        after = decode_cursor(after)
+        before = None if after else decode_cursor(before)
+        queryset = self.object_list
+        if before:
+            date, pk = before
+            queryset = queryset.filter(
+                Q(**{f'{field}__gt': date}) | Q(pk__gt=pk),
+                **{f'{field}__gte': date},
+            ).order_by(field, 'pk')
+        else:
+            if after:
+                date, pk = after
+                queryset = queryset.filter(
+                    Q(**{f'{field}__lt': date}) | Q(pk__lt=pk),
+                    **{f'{field}__lte': date},
+                )
+            queryset = queryset.order_by(f'-{field}', '-pk')
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if before:
+            rows.reverse()
+            return KeysetPage(
+                rows, has_next=True, has_previous=has_more, field=field
+            )
+        return KeysetPage(
+            rows, has_next=has_more, has_previous=bool(after), field=field
+        )
 
 
-def get_paginator(request, argument):
-    paginator = Paginator(argument, NUMBER_OF_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+def get_paginator(request, argument, keyset=None):
+    if keyset is None:
+        keyset = getattr(settings, 'KEYSET_PAGINATION', False)
+    if keyset:
+        paginator = KeysetPaginator(argument, NUMBER_OF_POSTS)
+        page_obj = paginator.get_page(
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+        )
+    else:
+        paginator = Paginator(argument, NUMBER_OF_POSTS)
+        page_number = request.GET.get('page')
+        page_obj = paginator.get_page(page_number)
     return {
         'page_obj': page_obj
     }
@@ -0,0 +1,117 @@
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+
+FEED_VERSION_KEY = 'posts:feed'
+TIMELINE_VERSION_KEY = 'posts:timeline:{}'
+POST_VERSION_KEY = 'posts:post:{}'
+AUTHORS_VERSION_KEY = 'posts:authors'
+GROUPS_VERSION_KEY = 'posts:groups'
+COMMENTS_VERSION_KEY = 'posts:comments'
+
+
+def _new_version():
+    return uuid4().hex, timezone.now()
+
+
+def _get(key):
+    entry = cache.get(key)
+    if entry is None:
+        entry = _new_version()
+        if not cache.add(key, entry, None):
+            entry = cache.get(key, entry)
+    return entry
+
+
+def get_version(key):
+    """Текущая версия данных для ключей фрагментного кеша.
+
+    Версия — случайная строка, а не счётчик: если кеш вытеснит её,
+    новая не совпадёт ни с одной из старых. Рядом с версией хранится
+    время её смены — для Last-Modified.
+    """
+    return _get(key)[0]
+
+
+def get_modified(key):
+    """Когда данные под ключом менялись в последний раз."""
+    return _get(key)[1]
+
+
+def _after_commit(func):
+    """Меняет версии после коммита транзакции.
+
+    Смена версии до коммита дала бы другому запросу прочитать старые
+    данные и закешировать их под новой версией, а попытка, которую
+    откатил atomic_with_retry, меняла бы версии зря. В SQLite в памяти
+    (тесты внутри TestCase) коммита не будет, там версия меняется сразу.
+    """
+    if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+        func()
+    else:
+        transaction.on_commit(func)
+
+
+def bump_version(key):
+    _after_commit(lambda: cache.set(key, _new_version(), None))
+
+
+def bump_versions(keys):
+    keys = list(keys)
+    _after_commit(lambda: cache.set_many(
+        {key: _new_version() for key in keys}, None
+    ))
+
+
+def feed_version():
+    return get_version(FEED_VERSION_KEY)
+
+
+def timeline_version(user_id):
+    return get_version(TIMELINE_VERSION_KEY.format(user_id))
+
+
+def post_version(post_id):
+    return get_version(POST_VERSION_KEY.format(post_id))
+
+
+def comments_version():
+    return get_version(COMMENTS_VERSION_KEY)
+
+
+def authors_version():
+    return get_version(AUTHORS_VERSION_KEY)
+
+
+def groups_version():
+    return get_version(GROUPS_VERSION_KEY)
+
+
+def bump_feed():
+    bump_version(FEED_VERSION_KEY)
+
+
+def bump_timeline(user_id):
+    bump_version(TIMELINE_VERSION_KEY.format(user_id))
+
+
+def bump_timelines(user_ids):
+    bump_versions(TIMELINE_VERSION_KEY.format(pk) for pk in user_ids)
+
+
+def bump_post(post_id):
+    bump_version(POST_VERSION_KEY.format(post_id))
+
+
+def bump_authors():
+    bump_version(AUTHORS_VERSION_KEY)
+
+
+def bump_groups():
+    bump_version(GROUPS_VERSION_KEY)
+
+
+def bump_comments():
+    bump_version(COMMENTS_VERSION_KEY)
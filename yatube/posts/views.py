@@ -1,46 +1,170 @@
+import json
+
+from django.http import Http404, JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
-from .models import Post, Group, User, Follow
+from django.urls import reverse
+from .models import Comment, Follow, Group, Post, User
 from django.contrib.auth.decorators import login_required
+from django.views.decorators.http import condition, require_POST
+from core.routers import read_point
+from core.sqlite import atomic_with_retry
+from . import conditional, follows, groups
 from .forms import PostForm, CommentForm
-from .utils import get_paginator
+from .counters import stats_for
+from .search import SearchResults
+from .timeline import timeline_posts
+from .utils import NUMBER_OF_COMMENTS, KeysetPaginator, get_paginator
+from .versions import feed_version, timeline_version
 
 
+@condition(
+    etag_func=conditional.feed_etag,
+    last_modified_func=conditional.feed_last_modified,
+)
 def index(request):
-    context = get_paginator(request, Post.objects.all())
+    context = {
+        'feed_version': feed_version(),
+        'read_point': read_point(),
+    }
+    context.update(get_paginator(request, Post.objects.for_feed()))
     return render(request, 'posts/index.html', context)
 
 
+@condition(
+    etag_func=conditional.feed_etag,
+    last_modified_func=conditional.feed_last_modified,
+)
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
+    group = groups.by_slug(slug)
+    if group is None:
+        raise Http404('Группа не найдена.')
     context = {
         'group': group,
     }
-    context.update(get_paginator(request, group.posts.all()))
+    context.update(get_paginator(
+        request, Post.objects.filter(group_id=group.pk).for_feed()
+    ))
     return render(request, 'posts/group_list.html', context)
 
 
+@condition(
+    etag_func=conditional.feed_etag,
+    last_modified_func=conditional.feed_last_modified,
+)
+def group_directory(request):
+    """Все группы с числом записей — одним запросом, без GROUP BY.
+
+    Реестр здесь не нужен: число записей в него не входит, а с ним
+    холодный каталог стоил бы ещё двух запросов.
+    """
+    context = {
+        'groups': Group.objects.order_by('title', 'pk'),
+    }
+    return render(request, 'posts/groups.html', context)
+
+
+@condition(etag_func=conditional.profile_etag)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    following = author.following.exists()
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    # Одному автору хватает EXISTS по индексу.
+    following = request.user.is_authenticated and Follow.objects.filter(
+        user=request.user, author=author
+    ).exists()
     context = {
         'author': author,
         'following': following,
     }
-    context.update(get_paginator(request, author.posts.all()))
+    context.update(get_paginator(request, author.posts.for_profile()))
     return render(request, 'posts/profile.html', context)
 
 
+@condition(
+    etag_func=conditional.post_etag,
+    last_modified_func=conditional.post_last_modified,
+)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id
+    )
     form = CommentForm()
     context = {
         'post': post,
-        'comments': post.comments.all(),
+        'comments': comments_page(post.pk, request.GET.get('after')),
         'form': form
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def comments_page(post_id, after=None):
+    """Страница комментариев поста от новых к старым по курсору."""
+    paginator = KeysetPaginator(
+        Comment.objects.filter(post_id=post_id).for_post(),
+        NUMBER_OF_COMMENTS,
+        field='created',
+    )
+    return paginator.get_page(after=after)
+
+
+@condition(
+    etag_func=conditional.post_etag,
+    last_modified_func=conditional.post_last_modified,
+)
+def post_comments(request, post_id):
+    """Следующая страница комментариев в JSON для кнопки «ещё»."""
+    get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    page = comments_page(post_id, request.GET.get('after'))
+    return JsonResponse({
+        'comments': [
+            {
+                'id': comment.pk,
+                'author': comment.author_card.username,
+                'author_url': reverse(
+                    'posts:profile', args=(comment.author_card.username,)
+                ),
+                'text': comment.text,
+                'created': comment.created.isoformat(),
+            }
+            for comment in page
+        ],
+        'next': page.next_cursor,
+    })
+
+
+def popular(request):
+    """Посты недели с самыми обсуждаемыми и читаемыми авторами."""
+    return ranked(request, 'popular', 'Популярное')
+
+
+def trending(request):
+    """Посты, которые обсуждают прямо сейчас."""
+    return ranked(request, 'trending', 'В тренде')
+
+
+def ranked(request, score, title):
+    """Лента по рейтингу из PostScore (см. posts.rollups)."""
+    posts = Post.objects.for_feed().filter(
+        **{f'score__{score}__gt': 0}
+    ).order_by(f'-score__{score}', '-pub_date')
+    context = {
+        'title': title,
+    }
+    context.update(get_paginator(request, posts, keyset=False))
+    return render(request, 'posts/ranked.html', context)
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    context = {
+        'query': query,
+    }
+    context.update(
+        get_paginator(request, SearchResults(query), keyset=False)
+    )
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None,)
@@ -48,7 +172,7 @@ def post_create(request):
         if form.is_valid():
             post_object = form.save(commit=False)
             post_object.author = request.user
-            post_object.save()
+            atomic_with_retry()(post_object.save)()
             return redirect('posts:profile', request.user)
     return render(request, 'posts/create_post.html',
                   {'form': form})
@@ -68,7 +192,7 @@ def post_edit(request, post_id):
         'post_id': post_id
     }
     if form.is_valid():
-        form.save()
+        atomic_with_retry()(form.save)()
         return redirect('posts:post_detail', post_id)
     return render(request, 'posts/create_post.html', context)
 
@@ -81,7 +205,7 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        atomic_with_retry()(comment.save)()
     return redirect('posts:post_detail', post_id=post_id)
 
 
@@ -90,7 +214,7 @@ def profile_follow(request, username):
     user = request.user
     author = get_object_or_404(User, username=username)
     if user != author:
-        Follow.objects.get_or_create(
+        atomic_with_retry()(Follow.objects.get_or_create)(
             user=user,
             author=author)
     return redirect('posts:follow_index')
@@ -99,19 +223,53 @@ def profile_follow(request, username):
 @login_required
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    Follow.objects.filter(user=request.user, author=author).delete()
+    atomic_with_retry()(
+        Follow.objects.filter(user=request.user, author=author).delete
+    )()
     return redirect('posts:follow_index')
 
 
+@login_required
+@require_POST
+def follow_bulk(request):
+    """Подписка и отписка списками: JSON {"follow": [имена],
+    "unfollow": [имена]}. Отвечает состоянием по всем этим именам."""
+    try:
+        data = json.loads(request.body.decode() or '{}')
+        follow = data.get('follow', [])
+        unfollow = data.get('unfollow', [])
+    except (ValueError, AttributeError):
+        return JsonResponse({'error': 'Ожидается JSON-объект.'}, status=400)
+    if not isinstance(follow, list) or not isinstance(unfollow, list):
+        names = None
+    else:
+        names = follow + unfollow
+    if names is None or not all(isinstance(name, str) for name in names):
+        return JsonResponse(
+            {'error': 'Ожидаются списки имён пользователей.'}, status=400
+        )
+    if len(names) > follows.MAX_USERNAMES:
+        return JsonResponse(
+            {'error': f'Не больше {follows.MAX_USERNAMES} имён за раз.'},
+            status=400,
+        )
+    return JsonResponse(
+        atomic_with_retry()(follows.update)(request.user, follow, unfollow)
+    )
+
+
 @login_required
 def follow_index(request):
     """View-функция страницы, куда будут выведены посты авторов,
     на которых подписан текущий пользователь"""
-    posts = Post.objects.filter(author__following__user=request.user)
-    count = Follow.objects.count()
+    posts = timeline_posts(request.user)
+    count = stats_for(request.user).following_count
     context = dict(
         posts=posts,
         count=count,
+        feed_version=feed_version(),
+        timeline_version=timeline_version(request.user.pk),
+        read_point=read_point(),
     )
     context.update(get_paginator(request, posts))
     return render(request, 'posts/follow.html', context)
@@ -35,6 +35,7 @@ INSTALLED_APPS = [
     'about.apps.AboutConfig',
     'posts.apps.PostsConfig',
     'users.apps.UsersConfig',
+    'api.apps.ApiConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -46,12 +47,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -79,12 +82,37 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# Сколько секунд держать соединение с базой между запросами.
+CONN_MAX_AGE = int(os.environ.get('CONN_MAX_AGE', 60))
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+    },
 }
+# Реплика только для чтения включается переменной REPLICA_DB — путём
+# ко второму файлу SQLite, который обновляет python manage.py
+# sync_replica. Без неё все запросы читают с основной базы.
+if os.environ.get('REPLICA_DB'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['REPLICA_DB'],
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    }
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Сколько секунд после записи пользователь читает с основной базы.
+REPLICA_STICKY_SECONDS = 10
+# PRAGMA для каждого соединения с SQLite поверх core.sqlite.PRAGMAS.
+SQLITE_PRAGMAS = {}
+# Сколько раз повторять транзакцию, если база занята, и первая пауза
+# в секундах (дальше она удваивается).
+SQLITE_WRITE_RETRIES = 5
+SQLITE_RETRY_DELAY = 0.05
 
 
 # Password validation
@@ -134,6 +162,56 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache.TwoTierCache',
+        'LOCATION': 'shared',
+        'OPTIONS': {
+            'L1_MAX_ENTRIES': 1000,
+            'L1_TIMEOUT': 60,
+            # Ключи, под которыми значение не меняется: фрагменты
+            # ключуются версиями данных, записи sorl — именами файлов,
+            # а те выдаются по содержимому (core.storage).
+            'IMMUTABLE_PREFIXES': ['template.cache.', 'sorl-thumbnail'],
+        },
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'yatube_cache',
+        # При переполнении DatabaseCache удаляет треть строк с меньшими
+        # ключами, а это версии данных (:1:posts:*). Со своей версией у
+        # каждого поста и каждой ленты подписок 300 строк по умолчанию
+        # кончаются сразу, поэтому предел поднят с запасом.
+        'OPTIONS': {'MAX_ENTRIES': 200000},
+    },
+}
+KEYSET_PAGINATION = False
+THUMBNAIL_BACKEND = 'posts.thumbnails.PregeneratedThumbnailBackend'
+# Приём картинок постов (posts.images): предел стороны в пикселях,
+# качество и формат; без IMAGE_FORMAT — WebP, если Pillow его умеет.
+IMAGE_MAX_SIDE = 2048
+IMAGE_QUALITY = 85
+IMAGE_FORMAT = None
+# Потоки веб-процесса для фоновых задач (core.taskqueue); при 0 задачи
+# выполняет только python manage.py run_tasks.
+TASKS_WORKERS = 2
+# Бюджеты страниц для core.middleware.ProfilingMiddleware: queries,
+# duplicates, sql_ms, render_ms, total_ms. 'log' пишет превышения
+# в лог core.profiling, 'raise' роняет запрос (для тестов).
+# Бюджет запросов рассчитан на холодный кеш: первое чтение каждой
+# версии из posts.versions создаёт её в кеше (около 6 запросов
+# к таблице кеша на ключ).
+PROFILING_BUDGETS = {
+    'posts:index': {'queries': 40, 'total_ms': 500},
+    'posts:group_list': {'queries': 40, 'total_ms': 500},
+    'posts:groups': {'queries': 10, 'total_ms': 300},
+    'posts:profile': {'queries': 40, 'total_ms': 500},
+    'posts:post_detail': {'queries': 30, 'total_ms': 300},
+    'posts:follow_index': {'queries': 40, 'total_ms': 500},
+    'posts:search': {'queries': 20, 'total_ms': 300},
+    'posts:popular': {'queries': 30, 'total_ms': 500},
+    'posts:trending': {'queries': 30, 'total_ms': 500},
+    'api:posts': {'queries': 30, 'total_ms': 300},
+    'api:comments': {'queries': 30, 'total_ms': 300},
+    'api:follow': {'queries': 30, 'total_ms': 300},
 }
+PROFILING_BUDGET_ACTION = 'log'
+PROFILING_WINDOW = 1000
@@ -18,11 +18,15 @@ from django.urls import include, path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from core.views import media
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('auth/', include('users.urls', namespace='auth')),
     path('auth/', include('django.contrib.auth.urls')),
     path('about/', include('about.urls', namespace='about')),
+    path('debug/', include('core.urls', namespace='core')),
+    path('api/v1/', include('api.urls', namespace='api')),
     path('', include('posts.urls', namespace='posts')),
 ]
 handler404 = 'core.views.page_not_found'
@@ -30,5 +34,5 @@ handler403 = 'core.views.permission_denied'
 handler500 = 'core.views.server_error'
 if settings.DEBUG:
     urlpatterns += static(
-        settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
+        settings.MEDIA_URL, view=media, document_root=settings.MEDIA_ROOT
     )